@@ -1,13 +1,17 @@
 from __future__ import annotations
 from typing import Dict, Any, List
-import json
 
 from langchain_core.runnables import Runnable
 from langchain_core.prompts import ChatPromptTemplate
 
-from agentic_ai_system.orchestration.llm_models import get_llm
+from agentic_ai_system.orchestration.llm_models import cached_llm, get_llm, invoke_llm, resolve_llm_target
+from agentic_ai_system.orchestration.deadline import DeadlineExceeded
+from agentic_ai_system.orchestration.llm_scheduler import LLMOverloaded
 from agentic_ai_system.utils.prompt_safety import escape_curly_braces, assert_prompt_vars
 from agentic_ai_system.agents.composer.prompt import SYSTEM_RULES
+from agentic_ai_system.agents.composer import templates
+from agentic_ai_system.memory.summary import format_summary, last_turn
+from agentic_ai_system.utils.fast_json import dumps, to_jsonable
 
 
 def _md_escape(s: Any) -> str:
@@ -36,6 +40,21 @@ def _rows_to_md_table(columns: List[str], rows: List[dict], max_rows: int = 10)
     return "\n".join([header, sep] + body_lines)
 
 
+def _frame_to_md_table(frame: Any, max_rows: int = 10) -> str:
+    """Same table as _rows_to_md_table, read straight from a ResultFrame."""
+    cols = frame.columns[:20]
+    if not cols:
+        return "_(no columns)_"
+    use_rows = frame.rows(0, max_rows)
+    if not use_rows:
+        return "_(no rows)_"
+
+    header = "| " + " | ".join(_md_escape(c) for c in cols) + " |"
+    sep = "| " + " | ".join("---" for _ in cols) + " |"
+    body_lines = ["| " + " | ".join(_md_escape(to_jsonable(v)) for v in r[: len(cols)]) + " |" for r in use_rows]
+    return "\n".join([header, sep] + body_lines)
+
+
 def _format_history_for_payload(history: Any, max_items: int = 10) -> List[dict]:
     """
     history expected as list[{"role": "...", "content": "...", ...}]
@@ -74,6 +93,7 @@ class ComposerAgent(Runnable):
 
     def __init__(self, provider: str | None = None, model: str | None = None, temperature: float | None = None):
         self.llm = get_llm(provider=provider, model=model, temperature=temperature)
+        self.provider, self.model = resolve_llm_target(provider, model)
 
         safe_system = escape_curly_braces(SYSTEM_RULES, allowed_vars=set())
         self.prompt = ChatPromptTemplate.from_messages([
@@ -98,28 +118,77 @@ class ComposerAgent(Runnable):
           {
             "user_prompt": str,
             "sql": str,
-            "result": { "columns": [...], "rows_sample":[...], "row_count": int, ... },
+            "result": { "frame": ResultFrame,                   # orchestration/result_frame.py
+                        # or "columns": [...], "rows_sample": [...]
+                        "row_count": int,
+                        "column_stats": {...} },               # optional, orchestration/result_stats.py
             "history": list[{"role": "...", "content": "..."}],   # optional
+            "summary": dict,                                    # optional rolling summary (memory/summary.py)
             "meta": {                                           # optional (NEW)
                 "attempt_count": int,
                 "is_sampled": bool,
                 "max_rows_limit": int,
-                "timeout_ms": int
-            }
+                "timeout_ms": int,
+                "refined_from_previous": bool
+            },
+            "deadline": Deadline,                               # optional, bounds the LLM call
+            "timings": StageTimings,                            # optional, per-request stage timings
+            "usage": RequestUsage,                              # optional, token/cost accounting
+            "span": Span,                                       # optional, parent tracing span
+            "cancel": CancelToken,                              # optional, client disconnect
+            "llm_limit": ConcurrencyLimit,                      # optional, batch LLM concurrency
+            "llm_priority": str,                                # optional, interactive | background | batch
+            "model_route": {"provider": str, "model": str},     # optional, routed model (orchestration/model_router.py)
           }
         """
         user_prompt = input.get("user_prompt", "")
         sql = input.get("sql", "")
         history = input.get("history")
+        summary = input.get("summary")
         meta = input.get("meta") or {}  # <-- NEW
+        deadline = input.get("deadline")  # optional orchestration.deadline.Deadline
 
         result = input.get("result") or {}
-        columns = result.get("columns") or []
-        rows_sample = result.get("rows_sample") or []
+        frame = result.get("frame")
         row_count = result.get("row_count")
+        column_stats = result.get("column_stats")
+        if frame is not None:
+            # only the rows the prompt / evidence table show become dicts
+            columns = list(frame.columns)
+            rows_sample = frame.records(10, jsonable=True)
+            n_rows = len(frame)
+            evidence_table = _frame_to_md_table(frame, max_rows=10)
+        else:
+            columns = result.get("columns") or []
+            rows_sample = result.get("rows_sample") or []
+            n_rows = len(rows_sample)
+            evidence_table = _rows_to_md_table(columns, rows_sample, max_rows=10)
 
-        evidence_table = _rows_to_md_table(columns, rows_sample, max_rows=10)
-        conversation_context = _format_history_for_payload(history, max_items=10)
+        # fast path: scalar / tiny / empty results need no LLM interpretation (COMPOSER_MODE)
+        if templates.qualifies(columns, n_rows, meta):
+            if input.get("span") is not None:
+                input["span"].set_attribute("composer.mode", "template")
+            md = templates.render(
+                sql=sql,
+                columns=columns,
+                rows=frame.records(jsonable=True) if frame is not None else rows_sample,
+                row_count=row_count,
+                meta=meta,
+                evidence_table=evidence_table,
+            )
+            return {
+                "agent_name": self.agent_name,
+                "agent_version": self.agent_version,
+                "status": "success",
+                "result": {"markdown": md, "evidence_table": evidence_table, "mode": "template"},
+            }
+        summary_text = format_summary(summary)
+        if summary_text:
+            # summary of earlier turns + the last turn instead of the raw transcript
+            conversation_context = [{"role": "system", "content": "Conversation summary:\n" + summary_text}]
+            conversation_context += _format_history_for_payload(last_turn(history), max_items=2)
+        else:
+            conversation_context = _format_history_for_payload(history, max_items=10)
 
         confidence_hints = {
             "sample_penalty": 0.15 if meta.get("is_sampled") else 0.0,
@@ -133,19 +202,58 @@ class ComposerAgent(Runnable):
             "sql": sql,
             "row_count": row_count,
             "columns": columns,
-            "rows_sample": rows_sample[:10],
+            # with full-result statistics a few rows are enough to show the shape
+            "rows_sample": rows_sample[: (5 if column_stats else 10)],
+            "column_stats": column_stats,
             "evidence_table_markdown": evidence_table,
             "meta": {  # <-- NEW: pass through and keep it compact
                 "attempt_count": meta.get("attempt_count"),
                 "is_sampled": meta.get("is_sampled"),
                 "max_rows_limit": meta.get("max_rows_limit"),
                 "timeout_ms": meta.get("timeout_ms"),
+                "refined_from_previous": meta.get("refined_from_previous"),
                 "confidence_hints": confidence_hints, 
             },
         }
 
-        chain = self.prompt | self.llm
-        resp = chain.invoke({"payload_json": json.dumps(payload, ensure_ascii=False)})
+        provider, model, llm = self.provider, self.model, self.llm
+        route = input.get("model_route")
+        if route:
+            provider, model = route["provider"], route["model"]
+            llm = cached_llm(provider, model)
+        chain = self.prompt | llm
+        try:
+            resp = invoke_llm(
+                chain,
+                {"payload_json": dumps(payload)},
+                deadline=deadline,
+                stage=self.agent_name,
+                timings=input.get("timings"),
+                usage=input.get("usage"),
+                provider=provider,
+                model=model,
+                span_parent=input.get("span"),
+                cancel=input.get("cancel"),
+                limit=input.get("llm_limit"),
+                priority=input.get("llm_priority") or "interactive",
+            )
+        except DeadlineExceeded as e:
+            return {
+                "agent_name": self.agent_name,
+                "agent_version": self.agent_version,
+                "status": "fail",
+                "error": {"error_code": "DEADLINE_EXCEEDED", "message": str(e), "retryable": False},
+                "result": {"markdown": "", "evidence_table": evidence_table},
+            }
+        except LLMOverloaded as e:
+            return {
+                "agent_name": self.agent_name,
+                "agent_version": self.agent_version,
+                "status": "fail",
+                "error": {"error_code": "LLM_OVERLOADED", "message": str(e), "retryable": True,
+                          "retry_after_ms": e.retry_after_ms},
+                "result": {"markdown": "", "evidence_table": evidence_table},
+            }
 
         md = getattr(resp, "content", "") or ""
         if not md.strip():
@@ -162,6 +270,7 @@ class ComposerAgent(Runnable):
             "status": "success",
             "result": {
                 "markdown": md,
-                "evidence_table": evidence_table
+                "evidence_table": evidence_table,
+                "mode": "llm",
             }
         }
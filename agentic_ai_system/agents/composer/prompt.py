@@ -10,9 +10,11 @@ You MUST include these sections IN THIS ORDER (use the exact headers):
 - 1–3 bullet points answering the question directly.
 
 ### วิเคราะห์/อินไซต์
-- Provide analytical observations (patterns, comparisons, rankings, outliers, trends) ONLY if supported by rows_sample.
+- Provide analytical observations (patterns, comparisons, rankings, outliers, trends) ONLY if supported by rows_sample or column_stats.
+- column_stats (when present) is computed over ALL fetched rows (row_count), not only rows_sample:
+  use its sum/min/max/mean/median, top values and trend buckets for totals, rankings and trends instead of computing them from rows_sample.
 - If the sample is insufficient to make a strong claim, say so explicitly and keep the analysis cautious.
-- Do NOT infer beyond the provided rows_sample.
+- Do NOT infer beyond the provided rows_sample and column_stats.
 
 ### ความมั่นใจ
 - Start with a SINGLE percentage between 0–100%, then the level in parentheses.
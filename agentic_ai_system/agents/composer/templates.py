@@ -0,0 +1,156 @@
+# agentic_ai_system/agents/composer/templates.py
+from __future__ import annotations
+
+"""
+Deterministic composer for results that need no interpretation.
+
+A single scalar (COUNT / SUM), one short row, a tiny table or an empty
+result is rendered straight into the five required sections (same headers
+and confidence heuristic as the LLM composer prompt) without an LLM call.
+
+COMPOSER_MODE:
+- auto (default): template when the result shape qualifies, LLM otherwise
+- llm: always the LLM composer
+- template: never call the LLM (every result is rendered from templates)
+
+A result qualifies in auto mode when it is not sampled and has at most
+COMPOSER_TEMPLATE_MAX_ROWS rows and COMPOSER_TEMPLATE_MAX_COLS columns.
+"""
+
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+import os
+import re
+
+
+# years / ids / codes are printed as-is (no thousands separator)
+_PLAIN_NUMBER_COL = re.compile(r"year|_id$|^id$|code|ปี|รหัส", re.IGNORECASE)
+
+
+def composer_mode() -> str:
+    mode = os.getenv("COMPOSER_MODE", "auto").strip().lower()
+    return mode if mode in ("auto", "llm", "template") else "auto"
+
+
+def _number(v: Any) -> Optional[Decimal]:
+    if isinstance(v, bool) or v is None:
+        return None
+    try:
+        if isinstance(v, (int, float, Decimal)):
+            n = Decimal(str(v))
+        elif isinstance(v, str):
+            n = Decimal(v.strip().replace(",", ""))
+        else:
+            return None
+    except (InvalidOperation, ValueError):
+        return None
+    return n if n.is_finite() else None
+
+
+def _fmt(v: Any, column: str = "") -> str:
+    n = _number(v)
+    if n is None:
+        return "-" if v is None or v == "" else str(v)
+    if _PLAIN_NUMBER_COL.search(column or ""):
+        return str(v)
+    if n == n.to_integral_value():
+        return f"{int(n):,}"
+    return f"{n:,.2f}"
+
+
+def qualifies(columns: List[str], row_count: int, meta: Dict[str, Any]) -> bool:
+    mode = composer_mode()
+    if mode == "template":
+        return True
+    if mode == "llm" or meta.get("is_sampled"):
+        return False
+    max_rows = int(os.getenv("COMPOSER_TEMPLATE_MAX_ROWS", "3"))
+    max_cols = int(os.getenv("COMPOSER_TEMPLATE_MAX_COLS", "3"))
+    return row_count <= max_rows and len(columns) <= max_cols
+
+
+def confidence(row_count: int, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Same factors as the composer prompt: sampling, retries, whether rows answer at all."""
+    pct = 90
+    reasons: List[str] = []
+    attempts = int(meta.get("attempt_count") or 1)
+    if meta.get("is_sampled"):
+        pct -= 15
+        reasons.append(f"ผลลัพธ์ถูกตัดที่ {meta.get('max_rows_limit')} แถว อาจไม่ครบทั้งหมด")
+    else:
+        reasons.append("ผลลัพธ์ครบถ้วน ไม่ได้ถูกตัดที่ขีดจำกัดจำนวนแถว")
+    if attempts > 1:
+        pct -= 10 * (attempts - 1)
+        reasons.append(f"ต้องแก้ไข SQL {attempts - 1} ครั้งก่อนรันสำเร็จ")
+    else:
+        reasons.append("SQL รันสำเร็จตั้งแต่ครั้งแรก")
+    if row_count == 0:
+        pct = min(pct, 50)
+        reasons.append("ไม่พบแถวข้อมูล อาจเป็นเพราะเงื่อนไขในคำถามไม่ตรงกับข้อมูลที่มี")
+    pct = max(0, min(100, pct))
+    level = "สูง" if pct >= 75 else ("กลาง" if pct >= 40 else "ต่ำ")
+    return {"pct": pct, "level": level, "reasons": reasons[:3]}
+
+
+def _answer_lines(columns: List[str], rows: List[dict]) -> List[str]:
+    if not rows:
+        return ["- ไม่พบข้อมูลที่ตรงกับเงื่อนไขของคำถาม"]
+    if len(rows) == 1:
+        return [f"- **{c}**: {_fmt(rows[0].get(c), c)}" for c in columns]
+    out = [f"- ผลลัพธ์ {len(rows)} แถว:"]
+    for r in rows[:10]:
+        out.append("  - " + ", ".join(f"{c}: {_fmt(r.get(c), c)}" for c in columns))
+    if len(rows) > 10:
+        out.append(f"  - …และอีก {len(rows) - 10} แถว (ดูหลักฐาน)")
+    return out
+
+
+def _insight_lines(columns: List[str], rows: List[dict]) -> List[str]:
+    if not rows:
+        return ["- ไม่มีข้อมูลให้วิเคราะห์"]
+    if len(rows) == 1:
+        return ["- ผลลัพธ์เป็นค่าสรุปแถวเดียว จึงไม่มีรูปแบบหรือแนวโน้มให้วิเคราะห์เพิ่มเติม"]
+
+    numeric = [c for c in columns if all(_number(r.get(c)) is not None for r in rows)]
+    labels = [c for c in columns if c not in numeric]
+    if len(numeric) == 1 and labels:
+        metric, label = numeric[0], labels[0]
+        ranked = sorted(rows, key=lambda r: _number(r.get(metric)), reverse=True)
+        total = sum(_number(r.get(metric)) for r in rows)
+        return [
+            f"- สูงสุด: {_fmt(ranked[0].get(label), label)} ({_fmt(ranked[0].get(metric), metric)})",
+            f"- ต่ำสุด: {_fmt(ranked[-1].get(label), label)} ({_fmt(ranked[-1].get(metric), metric)})",
+            f"- รวม {metric} ทั้ง {len(rows)} แถว: {_fmt(total)}",
+        ]
+    return [f"- ข้อมูลมีเพียง {len(rows)} แถว จึงไม่เพียงพอสำหรับการวิเคราะห์แนวโน้ม"]
+
+
+def render(
+    *,
+    sql: str,
+    columns: List[str],
+    rows: List[dict],
+    row_count: Optional[int],
+    meta: Dict[str, Any],
+    evidence_table: str,
+) -> str:
+    n = int(row_count if row_count is not None else len(rows))
+    conf = confidence(n, meta)
+
+    limits = ["- คำตอบนี้สร้างจากผลลัพธ์ SQL โดยตรง ไม่มีการตีความเพิ่มเติม"]
+    if meta.get("is_sampled"):
+        limits.append(f"- ผลลัพธ์ถูกจำกัดไว้ที่ {meta.get('max_rows_limit')} แถว ค่าที่แสดงอาจไม่ครบทั้งหมด")
+    if meta.get("refined_from_previous"):
+        limits.append("- คำนวณจากผลลัพธ์ของคำถามก่อนหน้า ไม่ได้ query ฐานข้อมูลใหม่")
+    if n == 0:
+        limits.append("- ถ้าคาดว่าควรมีข้อมูล ลองตรวจชื่อพื้นที่/ช่วงเวลาในคำถามอีกครั้ง")
+
+    sampled_note = " (ตัวอย่าง)" if meta.get("is_sampled") else ""
+    parts = [
+        "### คำตอบ\n" + "\n".join(_answer_lines(columns, rows)),
+        "### วิเคราะห์/อินไซต์\n" + "\n".join(_insight_lines(columns, rows)),
+        f"### ความมั่นใจ\n**{conf['pct']}% ({conf['level']})**\n" + "\n".join(f"- {r}" for r in conf["reasons"]),
+        f"### หลักฐาน\n**SQL**\n```sql\n{sql}\n```\n\n**ผลลัพธ์** {n} แถว{sampled_note}\n{evidence_table}",
+        "### ข้อจำกัด\n" + "\n".join(limits),
+    ]
+    return "\n\n".join(parts) + "\n"
@@ -8,12 +8,20 @@ import os, json
 from langchain_core.runnables import Runnable
 from langchain_core.prompts import ChatPromptTemplate
 
-from agentic_ai_system.orchestration.llm_models import get_llm
+from agentic_ai_system.orchestration.llm_models import cached_llm, get_llm, invoke_llm, resolve_llm_target
+from agentic_ai_system.orchestration.deadline import DeadlineExceeded
+from agentic_ai_system.orchestration.llm_scheduler import LLMOverloaded
+from agentic_ai_system.orchestration.metrics import RETRIES, StageTimings
+from agentic_ai_system.orchestration.model_router import model_router
 from agentic_ai_system.agents.text_to_sql.prompt import SYSTEM_RULES
 from agentic_ai_system.validators.sql_hygiene import extract_json_like, normalize_sql, validate_sql
 from agentic_ai_system.utils.prompt_safety import escape_curly_braces, assert_prompt_vars
+from agentic_ai_system.utils.fast_json import dumps
 # from agentic_ai_system.agents.text_to_sql.schema_retriever import PostgresSchemaRetriever
 from agentic_ai_system.agents.text_to_sql.schema_retriever import MariaDBSchemaRetriever
+from agentic_ai_system.memory.summary import format_summary, last_turn
+from agentic_ai_system.memory.result_cache import PREV_RESULT_TABLE
+from agentic_ai_system.memory.examples import example_store, fewshot_enabled, format_examples
 
 
 class TextToSQLAgent(Runnable):
@@ -22,6 +30,7 @@ class TextToSQLAgent(Runnable):
 
     def __init__(self, provider: str | None = None, model: str | None = None):
         self.llm = get_llm(provider=provider, model=model)
+        self.provider, self.model = resolve_llm_target(provider, model)
         # self.llm = get_llm()
 
         # self.schema_retriever = PostgresSchemaRetriever()
@@ -69,6 +78,7 @@ class TextToSQLAgent(Runnable):
         data.setdefault("params", {})
         data.setdefault("assumptions", [])
         data.setdefault("expected_columns", [])
+        data["refine_previous"] = bool(data.get("refine_previous"))
         return data
 
     def _format_history(self, history: Any, max_items: int = 10) -> str:
@@ -223,6 +233,17 @@ class TextToSQLAgent(Runnable):
     def invoke(self, input: Dict[str, Any], config=None) -> Dict[str, Any]:
         user_prompt = input.get("raw_user_prompt", "")
         history = input.get("history", None)  # list of dicts from memory store
+        summary = input.get("summary")  # optional rolling summary (memory/summary.py)
+        previous_result = input.get("previous_result")  # optional memory.result_cache.CachedResult
+        deadline = input.get("deadline")  # optional orchestration.deadline.Deadline
+        timings = input.get("timings") or StageTimings()
+        usage = input.get("usage")  # optional orchestration.usage.RequestUsage
+        span = input.get("span")  # optional orchestration.tracing.Span (parent for LLM calls)
+        cancel = input.get("cancel")  # optional orchestration.cancellation.CancelToken (client disconnect)
+        llm_limit = input.get("llm_limit")  # optional orchestration.limits.ConcurrencyLimit (batch runs)
+        llm_priority = input.get("llm_priority") or "interactive"  # admission priority (orchestration/llm_scheduler.py)
+        # no model named by the request: fast / strong model by complexity (orchestration/model_router.py)
+        route_models = bool(input.get("route_models")) and model_router.enabled()
         max_retries = int(os.getenv("TEXT2SQL_MAX_RETRIES", "3"))
 
         # --- external repair inputs (from SQL execution failure) ---
@@ -240,7 +261,7 @@ class TextToSQLAgent(Runnable):
             JSON dump with size cap to avoid prompt bloat.
             """
             try:
-                txt = json.dumps(obj, ensure_ascii=False, default=str)
+                txt = dumps(obj)
             except Exception:
                 txt = str(obj)
             return txt if len(txt) <= max_chars else (txt[:max_chars] + "…")
@@ -277,14 +298,64 @@ class TextToSQLAgent(Runnable):
 
         last_err = None
 
-        for _ in range(max_retries):
-            chain = self.prompt | self.llm
-            base_prompt = self._build_prompt(user_prompt, history=history)
+        # IMPORTANT: schema retrieval uses ONLY current question to avoid drift
+        with timings.stage("schema_retrieval"):
+            retrieved = self.schema_retriever.retrieve_relevant(
+                user_prompt,
+                top_k_tables=6,
+                expand_fk_hops=1,
+            )
+        complexity = model_router.estimate(user_prompt, retrieved, history=history, summary=summary) if route_models else None
+        routes: List[Dict[str, Any]] = []
+
+        for internal_attempt in range(max_retries):
+            provider, model, llm = self.provider, self.model, self.llm
+            if complexity is not None:
+                # repairs (execution / validation feedback) go to the strong model
+                route = model_router.route(complexity, repair=bool(repair_note))
+                provider, model, llm = route.provider, route.model, cached_llm(route.provider, route.model)
+                routes.append(route.report())
+                if span is not None:
+                    span.set_attribute("llm.route", route.name)
+            chain = self.prompt | llm
+            with timings.stage("prompt_build"):
+                base_prompt = self._build_prompt(user_prompt, history=history, timings=timings, summary=summary, previous_result=previous_result, retrieved=retrieved)
 
             # Include repair_note (execution feedback or last validation repair) if present
             msg = base_prompt if not repair_note else (base_prompt + "\n\n" + repair_note)
 
-            resp = chain.invoke({"q": msg})
+            try:
+                resp = invoke_llm(
+                    chain,
+                    {"q": msg},
+                    deadline=deadline,
+                    stage=self.agent_name,
+                    timings=timings,
+                    usage=usage,
+                    provider=provider,
+                    model=model,
+                    span_parent=span,
+                    cancel=cancel,
+                    limit=llm_limit,
+                    priority=llm_priority,
+                )
+            except DeadlineExceeded as e:
+                return {
+                    "agent_name": self.agent_name,
+                    "agent_version": self.agent_version,
+                    "status": "fail",
+                    "error": {"error_code": "DEADLINE_EXCEEDED", "message": str(e), "retryable": False},
+                    "model_routes": routes,
+                }
+            except LLMOverloaded as e:
+                return {
+                    "agent_name": self.agent_name,
+                    "agent_version": self.agent_version,
+                    "status": "fail",
+                    "error": {"error_code": "LLM_OVERLOADED", "message": str(e), "retryable": True,
+                              "retry_after_ms": e.retry_after_ms},
+                    "model_routes": routes,
+                }
             raw = getattr(resp, "content", "") or ""
 
             try:
@@ -302,11 +373,17 @@ class TextToSQLAgent(Runnable):
                         },
                         "assumptions": data.get("assumptions", []),
                         "expected_columns": data.get("expected_columns", []),
+                        # only meaningful when the previous result was offered
+                        "refine_previous": bool(previous_result is not None and data["refine_previous"]),
                     },
+                    "model_routes": routes,
                 }
             except Exception as e:
                 # Internal retry: JSON parse / SQL hygiene failed
                 last_err = str(e)
+                RETRIES.inc(kind="text2sql_internal")
+                if span is not None:
+                    span.set_attribute("text_to_sql.internal_retries", internal_attempt + 1)
 
                 # If we already had EXECUTION FEEDBACK, keep it and append formatting rules.
                 if "EXECUTION FEEDBACK" in (repair_note or ""):
@@ -332,27 +409,77 @@ class TextToSQLAgent(Runnable):
             "agent_version": self.agent_version,
             "status": "fail",
             "error": {"error_code": "TEXT2SQL_FAILED", "message": last_err or "Unknown", "retryable": False},
+            "model_routes": routes,
         }
 
-    def _build_prompt(self, user_prompt: str, history: Optional[Any] = None) -> str:
+    def _build_prompt(
+        self,
+        user_prompt: str,
+        history: Optional[Any] = None,
+        timings: Optional[StageTimings] = None,
+        summary: Optional[Dict[str, Any]] = None,
+        previous_result: Optional[Any] = None,
+        retrieved: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        timings = timings or StageTimings()
+
         # IMPORTANT: schema retrieval uses ONLY current question to avoid drift
-        retrieved = self.schema_retriever.retrieve_relevant(
-            user_prompt,
-            top_k_tables=6,
-            expand_fk_hops=1,
-        )
+        if retrieved is None:
+            with timings.stage("schema_retrieval"):
+                retrieved = self.schema_retriever.retrieve_relevant(
+                    user_prompt,
+                    top_k_tables=6,
+                    expand_fk_hops=1,
+                )
         schema_ctx = self.schema_retriever.format_context(retrieved)
 
-        history_text = self._format_history(history, max_items=10)
+        examples_text = ""
+        if fewshot_enabled():
+            with timings.stage("fewshot_retrieval"):
+                examples = example_store.search(
+                    user_prompt,
+                    k=int(os.getenv("FEWSHOT_TOP_K", "3")),
+                    min_score=float(os.getenv("FEWSHOT_MIN_SCORE", "0.2")),
+                )
+                examples_text = format_examples(examples, max_chars=int(os.getenv("FEWSHOT_MAX_CHARS", "3000")))
+
+        # with a rolling summary only the last turn is sent verbatim
+        summary_text = format_summary(summary)
+        history_text = self._format_history(last_turn(history) if summary_text else history, max_items=10)
 
         parts: List[str] = []
 
+        if summary_text:
+            parts.append(
+                "Conversation summary (earlier turns; use as background, do not invent schema):\n"
+                + summary_text
+            )
+
         if history_text:
             parts.append(
                 "Conversation context (most recent last; use as background, do not invent schema):\n"
                 + history_text
             )
 
+        if previous_result is not None:
+            preview = dumps(previous_result.preview(3))
+            parts.append(
+                f"Previous result (complete, {previous_result.row_count} rows) is available as table `{PREV_RESULT_TABLE}`:\n"
+                f"- Columns: {', '.join(previous_result.columns)}\n"
+                f"- First rows: {preview[:800]}\n"
+                "If the current question only refines this previous result (sort, filter, top-N, subset of its rows/columns, "
+                "or an aggregate over them) and every column it needs is listed above, write the SQL against "
+                f"`{PREV_RESULT_TABLE}` only and add \"refine_previous\": true to the JSON. "
+                "Otherwise query the database tables as usual and omit that key."
+            )
+
+        if examples_text:
+            parts.append(
+                "Similar past questions with SQL that executed successfully "
+                "(adapt them to the current question; do not copy filters/literals blindly):\n"
+                + examples_text
+            )
+
         parts.append("Current question:\n" + (user_prompt or ""))
 
         #schema_retriever
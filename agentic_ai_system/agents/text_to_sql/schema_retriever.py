@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from threading import RLock
 from typing import Any, Dict, List, Optional, Tuple
 import os
 import re
+import time
 
-from sqlalchemy import create_engine, text as sql_text, bindparam
+from sqlalchemy import create_engine, inspect as sa_inspect, text as sql_text, bindparam
+
+from agentic_ai_system.orchestration.metrics import CACHE_REQUESTS
 
 
 def _db_url() -> str:
+    # DATABASE_URL (if set) wins, e.g. sqlite:///bench.db for the local benchmark stand-in
+    if os.getenv("DATABASE_URL"):
+        return os.environ["DATABASE_URL"]
     # Keep env interface เดิม (POSTGRES_*) แต่ชี้ไป MariaDB
     return (
         
@@ -19,6 +26,17 @@ def _db_url() -> str:
         f"{os.getenv('DB_NAME','nocobase')}?charset=utf8mb4"
     )
 
+# schema snapshots are shared by every retriever in the process:
+# (db url, schemas) -> (taken_at, snapshot)
+_SNAPSHOTS: Dict[Tuple[str, Tuple[str, ...]], Tuple[float, Dict[str, Any]]] = {}
+_SNAPSHOTS_LOCK = RLock()
+
+
+def clear_schema_cache() -> None:
+    with _SNAPSHOTS_LOCK:
+        _SNAPSHOTS.clear()
+
+
 def _tokenize(s: str) -> List[str]:
     s = (s or "").lower()
     return re.findall(r"[a-z0-9_]+", s)
@@ -41,6 +59,17 @@ class ForeignKeyInfo:
     dst_col: str
 
 
+_ENGINES: Dict[str, Any] = {}
+
+
+def _get_engine(url: str):
+    # one engine per url (TextToSQLAgent is created per request)
+    with _SNAPSHOTS_LOCK:
+        if url not in _ENGINES:
+            _ENGINES[url] = create_engine(url, pool_pre_ping=True)
+        return _ENGINES[url]
+
+
 class MariaDBSchemaRetriever:
     """
     MariaDB schema retriever (MySQL-compatible)
@@ -55,7 +84,8 @@ class MariaDBSchemaRetriever:
         exclude_schemas: Optional[List[str]] = None,
         max_columns_per_table: int = 40,
     ) -> None:
-        self.engine = create_engine(_db_url())
+        self.db_url = _db_url()
+        self.engine = _get_engine(self.db_url)
         # MariaDB “schema” ใน information_schema = ชื่อ database
         self.include_schemas = include_schemas or [os.getenv("DB_NAME", "nocobase")]
         self.exclude_schemas = set(
@@ -63,6 +93,8 @@ class MariaDBSchemaRetriever:
             or ["information_schema", "mysql", "performance_schema", "sys"]
         )
         self.max_columns_per_table = max_columns_per_table
+        # information_schema is read once per TTL instead of 1 + N queries per question
+        self.snapshot_ttl_s = float(os.getenv("SCHEMA_CACHE_TTL_S", "300"))
 
     def list_tables(self) -> List[Tuple[str, str]]:
         q = (
@@ -151,6 +183,52 @@ class MariaDBSchemaRetriever:
         return fks
 
     def snapshot(self) -> Dict[str, Any]:
+        key = (self.db_url, tuple(self.include_schemas))
+        if self.snapshot_ttl_s > 0:
+            with _SNAPSHOTS_LOCK:
+                cached = _SNAPSHOTS.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.snapshot_ttl_s:
+                CACHE_REQUESTS.inc(cache="schema_snapshot", result="hit")
+                return cached[1]
+            CACHE_REQUESTS.inc(cache="schema_snapshot", result="miss")
+
+        if self.engine.dialect.name in ("mysql", "mariadb"):
+            snap = self._snapshot_information_schema()
+        else:
+            snap = self._snapshot_inspector()
+
+        if self.snapshot_ttl_s > 0:
+            with _SNAPSHOTS_LOCK:
+                _SNAPSHOTS[key] = (time.monotonic(), snap)
+        return snap
+
+    def _snapshot_inspector(self) -> Dict[str, Any]:
+        """Dialect-neutral snapshot (SQLite / DuckDB stand-ins have no information_schema)."""
+        insp = sa_inspect(self.engine)
+        schema = self.include_schemas[0]
+        table_infos: List[TableInfo] = []
+        fks: List[ForeignKeyInfo] = []
+        for t in insp.get_table_names():
+            cols = [
+                {"name": c["name"], "data_type": str(c["type"]).lower(), "nullable": bool(c.get("nullable", True))}
+                for c in insp.get_columns(t)[: self.max_columns_per_table]
+            ]
+            table_infos.append(TableInfo(schema=schema, name=t, columns=cols))
+            for fk in insp.get_foreign_keys(t):
+                for src_col, dst_col in zip(fk.get("constrained_columns") or [], fk.get("referred_columns") or []):
+                    fks.append(
+                        ForeignKeyInfo(
+                            src_schema=schema,
+                            src_table=t,
+                            src_col=src_col,
+                            dst_schema=schema,
+                            dst_table=fk["referred_table"],
+                            dst_col=dst_col,
+                        )
+                    )
+        return {"tables": table_infos, "foreign_keys": fks}
+
+    def _snapshot_information_schema(self) -> Dict[str, Any]:
         tables = self.list_tables()
         table_infos: List[TableInfo] = []
         for sch, t in tables:
@@ -183,7 +261,8 @@ class MariaDBSchemaRetriever:
             scored.append((score, t))
 
         scored.sort(key=lambda x: x[0], reverse=True)
-        picked = [t for s, t in scored if s > 0][:top_k_tables]
+        matched = [t for s, t in scored if s > 0][:top_k_tables]
+        picked = list(matched)
 
         if not picked:
             picked = [t for _, t in scored[: min(top_k_tables, len(scored))]]
@@ -209,7 +288,8 @@ class MariaDBSchemaRetriever:
             if (fk.src_schema, fk.src_table) in picked_set and (fk.dst_schema, fk.dst_table) in picked_set
         ]
 
-        return {"tables": picked_tables, "foreign_keys": picked_fk}
+        # matched: tables the question itself names (before the fallback / FK expansion)
+        return {"tables": picked_tables, "foreign_keys": picked_fk, "matched": matched}
 
     @staticmethod
     def format_context(retrieved: Dict[str, Any]) -> str:
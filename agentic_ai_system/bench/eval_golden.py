@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+"""
+Accuracy + latency evaluation over a golden question set.
+
+Each golden case (JSONL, one per line):
+
+    {"id": "q02", "question": "...", "reference_sql": "SELECT ...;"}
+    {"id": "q99", "question": "...", "expected": {"rows": [[12]]}, "ordered": false}
+
+Every question runs through stream_sse_pipeline (in parallel threads). The
+streamed `rows` are compared with the expected rows (or the result of the
+reference SQL on the same database):
+
+- execution accuracy: same multiset of rows; column order / names and row
+  order are ignored unless "ordered": true
+- numbers are compared after rounding (--float-digits), dates as ISO text
+- if the pipeline result hit SQL_MAX_ROWS, the sampled rows must be a
+  subset of the reference result ("sampled_subset")
+
+Per question: correct, attempts, LLM calls, tokens, cost, end-to-end and
+time-to-answer latency, SQL and error codes; plus accuracy / cost / latency
+totals. With the fake LLM this only checks plumbing — run it with a real
+provider (or a cassette recorded from one) to judge prompt/retrieval changes.
+
+    python -m agentic_ai_system.bench.eval_golden --provider openai --model gpt-4o-mini --parallel 4
+    python -m agentic_ai_system.bench.eval_golden --provider fake   # SQLite stand-in, plumbing check
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import sys
+import time
+
+from agentic_ai_system.bench.pipeline_bench import event_rows, parse_sse, summarize
+
+
+GOLDEN_PATH = Path(__file__).resolve().parent / "golden_set.jsonl"
+
+
+def load_golden(path: str) -> List[Dict[str, Any]]:
+    cases: List[Dict[str, Any]] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                cases.append(json.loads(line))
+    return cases
+
+
+def _norm_value(v: Any, digits: int) -> Any:
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return int(v)
+    if isinstance(v, (int, float, Decimal)):
+        f = round(float(v), digits)
+        return int(f) if f.is_integer() else f
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, str):
+        s = v.strip()
+        # numbers serialized as text (Decimal -> str in SSE)
+        if s and s.lstrip("-").replace(".", "", 1).isdigit():
+            return _norm_value(float(s), digits)
+        return s
+    return str(v)
+
+
+def _norm_row(row: Any, digits: int) -> Tuple[Any, ...]:
+    vals = list(row.values()) if isinstance(row, dict) else list(row)
+    # column order / aliases do not matter: compare the sorted value tuple
+    return tuple(sorted((_norm_value(v, digits) for v in vals), key=lambda x: (x is None, str(type(x)), str(x))))
+
+
+def compare_results(
+    got: List[Any],
+    expected: List[Any],
+    *,
+    ordered: bool = False,
+    sampled: bool = False,
+    digits: int = 4,
+) -> str:
+    """'match' | 'sampled_subset' | 'mismatch'"""
+    g = [_norm_row(r, digits) for r in got]
+    e = [_norm_row(r, digits) for r in expected]
+    if ordered:
+        if g == e:
+            return "match"
+        if sampled and g == e[: len(g)]:
+            return "sampled_subset"
+        return "mismatch"
+    if Counter(g) == Counter(e):
+        return "match"
+    if sampled and not (Counter(g) - Counter(e)):
+        return "sampled_subset"
+    return "mismatch"
+
+
+def reference_rows(sql: str) -> List[Dict[str, Any]]:
+    from sqlalchemy import text as sql_text
+    from agentic_ai_system.orchestration.executor_stream import _get_engine
+
+    with _get_engine().connect() as conn:
+        res = conn.execute(sql_text(sql))
+        return [dict(r._mapping) for r in res.fetchall()]
+
+
+def run_case(case: Dict[str, Any], *, provider: Optional[str], model: Optional[str], digits: int) -> Dict[str, Any]:
+    from agentic_ai_system.orchestration.executor_stream import stream_sse_pipeline
+
+    max_rows = int(os.getenv("SQL_MAX_ROWS", "200"))
+    rows: List[Dict[str, Any]] = []
+    sql = ""
+    status = "incomplete"
+    attempt = None
+    usage_total: Dict[str, Any] = {}
+    error_codes: List[str] = []
+    answer_ms = None
+
+    t0 = time.perf_counter()
+    for chunk in stream_sse_pipeline(case["question"], provider=provider, model=model):
+        for event, data in parse_sse(chunk):
+            if event == "sql":
+                sql = data.get("sql") or ""
+                rows = []  # a new attempt replaces rows of the failed one
+            elif event == "rows":
+                rows.extend(event_rows(data))
+            elif event == "answer":
+                answer_ms = (time.perf_counter() - t0) * 1000
+            elif event == "error":
+                error_codes.append(data.get("error_code") or "UNKNOWN")
+            elif event == "done":
+                status = data.get("status") or "unknown"
+                attempt = data.get("attempt")
+                usage_total = (data.get("usage") or {}).get("total") or {}
+    e2e_ms = (time.perf_counter() - t0) * 1000
+
+    if "expected" in case:
+        expected = (case["expected"] or {}).get("rows") or []
+    else:
+        expected = reference_rows(case["reference_sql"])
+
+    verdict = "mismatch"
+    if status == "success":
+        verdict = compare_results(
+            rows,
+            expected,
+            ordered=bool(case.get("ordered")),
+            sampled=len(rows) >= max_rows,
+            digits=digits,
+        )
+
+    return {
+        "id": case.get("id"),
+        "question": case["question"],
+        "status": status,
+        "verdict": verdict,
+        "correct": verdict in ("match", "sampled_subset"),
+        "attempts": (attempt + 1) if attempt is not None else None,
+        "llm_calls": usage_total.get("calls", 0),
+        "input_tokens": usage_total.get("input_tokens", 0),
+        "output_tokens": usage_total.get("output_tokens", 0),
+        "cost_usd": usage_total.get("cost_usd", 0.0),
+        "e2e_ms": round(e2e_ms, 1),
+        "answer_ms": round(answer_ms, 1) if answer_ms is not None else None,
+        "rows": len(rows),
+        "expected_rows": len(expected),
+        "sql": sql,
+        "error_codes": error_codes,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Golden-set accuracy + latency evaluation")
+    ap.add_argument("--golden", default=str(GOLDEN_PATH))
+    ap.add_argument("--provider", default=None)
+    ap.add_argument("--model", default=None)
+    ap.add_argument("--parallel", type=int, default=4)
+    ap.add_argument("--float-digits", type=int, default=4)
+    ap.add_argument("--only", default=None, help="comma list of case ids")
+    ap.add_argument("--database-url", default=None, help="default: SQLite stand-in seeded under --workdir")
+    ap.add_argument("--workdir", default="./bench")
+    ap.add_argument("--areas", type=int, default=2000)
+    ap.add_argument("--out", default=None, help="result JSON path (default <workdir>/results/eval-<ts>.json)")
+    ap.add_argument(
+        "--fewshot-path",
+        default=None,
+        help="few-shot example index to evaluate with (default: a new empty one per run, so golden answers do not leak in)",
+    )
+    args = ap.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    elif not os.getenv("DATABASE_URL"):
+        from agentic_ai_system.bench.local_db import seed_sqlite
+
+        db_path = os.path.join(args.workdir, "bench.db")
+        seed_sqlite(db_path, areas=args.areas)
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+
+    fewshot_path = args.fewshot_path or os.path.join(args.workdir, f"fewshot-eval-{time.strftime('%Y%m%d-%H%M%S')}.db")
+    os.environ["FEWSHOT_PATH"] = fewshot_path
+
+    cases = load_golden(args.golden)
+    if args.only:
+        wanted = {x.strip() for x in args.only.split(",")}
+        cases = [c for c in cases if c.get("id") in wanted]
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as pool:
+        results = list(
+            pool.map(lambda c: run_case(c, provider=args.provider, model=args.model, digits=args.float_digits), cases)
+        )
+    wall_s = time.perf_counter() - t_start
+
+    n = max(1, len(results))
+    summary = {
+        "cases": len(results),
+        "accuracy": round(sum(r["correct"] for r in results) / n, 4),
+        "success_rate": round(sum(r["status"] == "success" for r in results) / n, 4),
+        "attempts_mean": round(sum(r["attempts"] or 0 for r in results) / n, 3),
+        "first_try_rate": round(sum(r["attempts"] == 1 for r in results) / n, 4),
+        "llm_calls_total": sum(r["llm_calls"] for r in results),
+        "input_tokens_total": sum(r["input_tokens"] for r in results),
+        "output_tokens_total": sum(r["output_tokens"] for r in results),
+        "cost_usd_total": round(sum(r["cost_usd"] for r in results), 6),
+        "latency_ms": {
+            "e2e": summarize([r["e2e_ms"] for r in results]),
+            "answer": summarize([r["answer_ms"] for r in results]),
+        },
+        "wall_s": round(wall_s, 3),
+    }
+    result = {
+        "meta": {
+            "golden": args.golden,
+            "provider": args.provider or os.getenv("LLM_PROVIDER", "openai"),
+            "model": args.model or os.getenv("MODEL"),
+            "parallel": args.parallel,
+            "fewshot_path": fewshot_path if os.getenv("FEWSHOT_ENABLED", "1") != "0" else None,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "summary": summary,
+        "questions": results,
+    }
+
+    out = args.out or os.path.join(args.workdir, "results", f"eval-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+
+    print(f"{'id':26s} {'verdict':15s} {'att':>3s} {'llm':>4s} {'tokens':>8s} {'e2e ms':>9s}")
+    for r in results:
+        print(
+            f"{str(r['id']):26s} {r['verdict']:15s} {r['attempts'] or 0:3d} {r['llm_calls']:4d} "
+            f"{r['input_tokens'] + r['output_tokens']:8d} {r['e2e_ms']:9.1f}"
+        )
+    print(
+        f"\naccuracy {summary['accuracy']:.1%}  attempts/q {summary['attempts_mean']}  "
+        f"llm calls {summary['llm_calls_total']}  cost ${summary['cost_usd_total']}  "
+        f"e2e p50 {summary['latency_ms']['e2e'].get('p50')} ms"
+    )
+    print(f"results: {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+"""
+Micro-benchmark for JSON encoding of SSE rows events and payloads.
+
+Builds realistic row chunks (shape of the large_result JOIN: id, Thai
+province / disaster type, dates, a Decimal measure) and times:
+
+- legacy       json.dumps(default=...) as _sse used to encode every event
+- stdlib       utils.fast_json.dumps_stdlib (pure-Python fallback)
+- orjson       utils.fast_json.dumps_bytes with orjson installed
+
+for both rows event shapes (records / columnar), plus the payload
+conversion (legacy dumps+loads round-trip vs to_jsonable).
+
+    python -m agentic_ai_system.bench.json_bench --chunk-rows 50 --repeat 2000
+"""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Tuple
+from uuid import UUID
+import argparse
+import json
+import sys
+import time
+
+from agentic_ai_system.bench.pipeline_bench import summarize
+from agentic_ai_system.utils import fast_json
+
+
+_PROVINCES = ["เชียงใหม่", "เชียงราย", "ลำพูน", "น่าน", "อุบลราชธานี", "นครราชสีมา", "สุราษฎร์ธานี", "กรุงเทพมหานคร"]
+_DISASTERS = ["อุทกภัย", "ภัยแล้ง", "วาตภัย", "ดินโคลนถล่ม", "ไฟป่า"]
+_COLUMNS = ["id", "province_name", "disaster_type", "annonced_date", "end_annonced", "budget", "ref"]
+
+
+def make_rows(n: int) -> List[Tuple[Any, ...]]:
+    d0 = date(2024, 1, 1)
+    out = []
+    for i in range(n):
+        d = d0 + timedelta(days=i % 365)
+        out.append(
+            (
+                i + 1,
+                _PROVINCES[i % len(_PROVINCES)],
+                _DISASTERS[i % len(_DISASTERS)],
+                d,
+                datetime(d.year, d.month, d.day, 17, 30) + timedelta(days=30),
+                Decimal(f"{(i * 7919) % 1000000}.{i % 100:02d}"),
+                UUID(int=i),
+            )
+        )
+    return out
+
+
+def _legacy_default(o: Any):
+    # executor_stream._json_default before fast_json
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, UUID):
+        return str(o)
+    if isinstance(o, (bytes, bytearray)):
+        return o.decode("utf-8", errors="replace")
+    return str(o)
+
+
+def _legacy_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, default=_legacy_default).encode("utf-8")
+
+
+def _legacy_to_jsonable(obj: Any) -> Any:
+    return json.loads(json.dumps(obj, ensure_ascii=False, default=_legacy_default))
+
+
+def _time_us(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return summarize(samples)
+
+
+def run(chunk_rows: int, payload_rows: int, repeat: int) -> Dict[str, Any]:
+    rows = make_rows(chunk_rows)
+    events = {
+        "records": {"trace_id": "t", "attempt": 0, "columns": _COLUMNS,
+                    "rows": [dict(zip(_COLUMNS, r)) for r in rows],
+                    "chunk_index": 0, "row_count": len(rows), "rows_sent_total": len(rows), "elapsed_ms": 3},
+        "columnar": {"trace_id": "t", "attempt": 0, "columns": _COLUMNS,
+                     "types": ["int", "str", "str", "date", "datetime", "decimal", "uuid"], "data": rows,
+                     "chunk_index": 0, "row_count": len(rows), "rows_sent_total": len(rows), "elapsed_ms": 3},
+    }
+    encoders: Dict[str, Callable[[Any], bytes]] = {"legacy": _legacy_dumps, "stdlib": fast_json.dumps_stdlib}
+    if fast_json.orjson is not None:
+        encoders["orjson"] = fast_json.dumps_bytes
+
+    out: Dict[str, Any] = {"backend": fast_json.BACKEND, "chunk_rows": chunk_rows, "encode": {}, "payload": {}}
+    for shape, ev in events.items():
+        for name, enc in encoders.items():
+            if shape == "columnar" and name == "legacy":
+                continue  # the legacy encoder never saw tuples
+            out["encode"][f"{shape}/{name}"] = {"bytes": len(enc(ev)), "us": _time_us(lambda: enc(ev), repeat)}
+
+    payload = {"params": {"year": 2024}, "rows_sample": [dict(zip(_COLUMNS, r)) for r in make_rows(payload_rows)]}
+    out["payload"]["legacy_round_trip"] = {"us": _time_us(lambda: _legacy_to_jsonable(payload), max(1, repeat // 10))}
+    out["payload"]["to_jsonable"] = {"us": _time_us(lambda: fast_json.to_jsonable(payload), max(1, repeat // 10))}
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="JSON encoding micro-benchmark (SSE rows events / payloads)")
+    ap.add_argument("--chunk-rows", type=int, default=50, help="rows per SSE rows event")
+    ap.add_argument("--payload-rows", type=int, default=200, help="rows converted by the payload benchmark")
+    ap.add_argument("--repeat", type=int, default=2000)
+    ap.add_argument("--out", default=None, help="optional result JSON path")
+    args = ap.parse_args()
+
+    res = run(args.chunk_rows, args.payload_rows, args.repeat)
+    print(f"backend: {res['backend']}   chunk: {res['chunk_rows']} rows", file=sys.stderr)
+    print(f"{'case':24s} {'bytes':>8s} {'p50 us':>9s} {'p95 us':>9s}")
+    for name, r in res["encode"].items():
+        print(f"{name:24s} {r['bytes']:8d} {r['us']['p50']:9.1f} {r['us']['p95']:9.1f}")
+    for name, r in res["payload"].items():
+        print(f"{'payload/' + name:24s} {'':>8s} {r['us']['p50']:9.1f} {r['us']['p95']:9.1f}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+"""
+Concurrent SSE load generator for POST /query/stream.
+
+Closed-loop load: for every concurrency level N, N client threads keep one
+streaming request open each until --requests-per-level requests finished.
+Every response is parsed as SSE; per level we report
+
+- time-to-first-byte, time-to-first-`rows`, time-to-`answer`, end-to-end (p50/p95/p99)
+- requests/s and SSE events/s
+- error events by error_code, HTTP / connection failures, runs without `done`
+
+The per-level rows form a saturation curve; `knee` is the first level where
+throughput stops growing (< --knee-gain) while p95 latency keeps rising,
+which is where adding clients only adds queueing (size workers / DB pool
+below it).
+
+Against a running app (provider must be allowed, e.g. ENABLE_FAKE_LLM=1):
+
+    python -m agentic_ai_system.bench.load_sse --url http://localhost:8000 --levels 1,2,4,8,16,32
+
+Or let the tool start uvicorn with the fake LLM and the SQLite stand-in:
+
+    python -m agentic_ai_system.bench.load_sse --spawn --workers 1 --llm-latency-ms 800
+
+Only the standard library is used on the client side.
+"""
+
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from agentic_ai_system.bench.pipeline_bench import summarize
+
+
+DEFAULT_QUESTION = "ในปี 2024 มีการประกาศพื้นที่ภัยพิบัติไปกี่ครั้ง"
+
+
+def stream_once(
+    url: str,
+    body: Dict[str, Any],
+    *,
+    timeout_s: float = 120.0,
+) -> Dict[str, Any]:
+    """One POST /query/stream; reads the SSE body incrementally and times the milestones."""
+    u = urlparse(url)
+    conn_cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(u.hostname, u.port or (443 if u.scheme == "https" else 80), timeout=timeout_s)
+
+    out: Dict[str, Any] = {
+        "http_status": None,
+        "ttfb_ms": None,
+        "first_rows_ms": None,
+        "answer_ms": None,
+        "e2e_ms": None,
+        "status": "incomplete",
+        "events": 0,
+        "error_codes": [],
+        "exception": None,
+    }
+    t0 = time.perf_counter()
+    try:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        conn.request(
+            "POST",
+            (u.path.rstrip("/") or "") + "/query/stream",
+            body=payload,
+            headers={"Content-Type": "application/json", "Accept": "text/event-stream"},
+        )
+        resp = conn.getresponse()
+        out["http_status"] = resp.status
+        if resp.status != 200:
+            resp.read()
+            return out
+
+        event, data_lines = "message", []
+        while True:
+            line = resp.readline()
+            if not line:
+                break
+            now_ms = (time.perf_counter() - t0) * 1000
+            if out["ttfb_ms"] is None:
+                out["ttfb_ms"] = now_ms
+            line_s = line.decode("utf-8").rstrip("\r\n")
+            if line_s.startswith("event:"):
+                event = line_s[6:].strip()
+            elif line_s.startswith("data:"):
+                data_lines.append(line_s[5:].lstrip())
+            elif line_s == "" and data_lines:
+                out["events"] += 1
+                data = json.loads("\n".join(data_lines))
+                if event == "rows" and out["first_rows_ms"] is None:
+                    out["first_rows_ms"] = now_ms
+                elif event == "answer":
+                    out["answer_ms"] = now_ms
+                elif event == "error":
+                    out["error_codes"].append(data.get("error_code") or "UNKNOWN")
+                elif event == "done":
+                    out["status"] = data.get("status") or "unknown"
+                event, data_lines = "message", []
+    except Exception as e:
+        out["exception"] = type(e).__name__
+    finally:
+        out["e2e_ms"] = (time.perf_counter() - t0) * 1000
+        conn.close()
+    return out
+
+
+def run_level(
+    url: str,
+    body: Dict[str, Any],
+    *,
+    concurrency: int,
+    total_requests: int,
+    timeout_s: float,
+) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    remaining = [total_requests]
+
+    def worker() -> None:
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            r = stream_once(url, body, timeout_s=timeout_s)
+            with lock:
+                results.append(r)
+
+    t_start = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - t_start
+
+    errors: Dict[str, int] = {}
+    for r in results:
+        for code in r["error_codes"]:
+            errors[code] = errors.get(code, 0) + 1
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    failed = [r for r in results if r["exception"] or r["http_status"] != 200]
+    n = max(1, len(results))
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(results) / wall_s, 3) if wall_s > 0 else None,
+        "events_per_s": round(sum(r["events"] for r in results) / wall_s, 1) if wall_s > 0 else None,
+        "status": statuses,
+        "transport_failures": len(failed),
+        "transport_failure_kinds": sorted({r["exception"] or f"HTTP {r['http_status']}" for r in failed}),
+        "error_events": errors,
+        "error_event_rate": round(sum(errors.values()) / n, 4),
+        "incomplete_rate": round(statuses.get("incomplete", 0) / n, 4),
+        "latency_ms": {
+            "ttfb": summarize([r["ttfb_ms"] for r in results]),
+            "first_rows": summarize([r["first_rows_ms"] for r in results]),
+            "answer": summarize([r["answer_ms"] for r in results]),
+            "e2e": summarize([r["e2e_ms"] for r in results]),
+        },
+    }
+
+
+def find_knee(levels: List[Dict[str, Any]], min_gain: float = 0.10) -> Optional[int]:
+    """First concurrency whose throughput gain over the previous level is < min_gain."""
+    for prev, cur in zip(levels, levels[1:]):
+        p_rps, c_rps = prev.get("throughput_rps") or 0, cur.get("throughput_rps") or 0
+        if p_rps <= 0:
+            continue
+        p95_prev = (prev["latency_ms"]["e2e"].get("p95") or 0)
+        p95_cur = (cur["latency_ms"]["e2e"].get("p95") or 0)
+        if (c_rps - p_rps) / p_rps < min_gain and p95_cur > p95_prev:
+            return prev["concurrency"]
+    return None
+
+
+def _wait_healthy(url: str, timeout_s: float = 60.0) -> None:
+    t_end = time.monotonic() + timeout_s
+    while time.monotonic() < t_end:
+        try:
+            with urllib.request.urlopen(url.rstrip("/") + "/health", timeout=2) as r:
+                if r.status == 200:
+                    return
+        except Exception:
+            time.sleep(0.3)
+    raise RuntimeError(f"app at {url} did not become healthy in {timeout_s}s")
+
+
+def spawn_app(args: argparse.Namespace) -> subprocess.Popen:
+    """Start uvicorn with the fake LLM and the SQLite stand-in (bench/local_db.py)."""
+    from agentic_ai_system.bench.local_db import seed_sqlite
+
+    db_path = os.path.join(args.workdir, "bench.db")
+    seed_sqlite(db_path, areas=args.areas)
+
+    env = dict(os.environ)
+    env.update(
+        {
+            "ENABLE_FAKE_LLM": "1",
+            "DATABASE_URL": f"sqlite:///{os.path.abspath(db_path)}",
+            "FEWSHOT_PATH": os.path.join(os.path.abspath(args.workdir), "fewshot.db"),
+            "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+            "FAKE_LLM_TOKENS_PER_S": str(args.llm_tokens_per_s),
+            "FAKE_LLM_SQL": (
+                "SELECT COUNT(*) AS total FROM b100_disaster_area "
+                "WHERE annonced_date BETWEEN '2024-01-01' AND '2024-12-31';"
+            ),
+        }
+    )
+    u = urlparse(args.url)
+    cmd = [
+        sys.executable, "-m", "uvicorn", "agentic_ai_system.main:app",
+        "--host", u.hostname or "127.0.0.1",
+        "--port", str(u.port or 8000),
+        "--workers", str(args.workers),
+        "--log-level", "warning",
+    ]
+    proc = subprocess.Popen(cmd, env=env)
+    try:
+        _wait_healthy(args.url)
+    except Exception:
+        proc.terminate()
+        raise
+    return proc
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Concurrent SSE load generator for /query/stream")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--levels", default="1,2,4,8,16,32", help="comma list of concurrency levels")
+    ap.add_argument("--requests-per-level", type=int, default=64)
+    ap.add_argument("--question", default=DEFAULT_QUESTION)
+    ap.add_argument("--provider", default="fake")
+    ap.add_argument("--model", default=None)
+    ap.add_argument("--deadline-ms", type=int, default=None)
+    ap.add_argument("--timeout-s", type=float, default=180.0)
+    ap.add_argument("--knee-gain", type=float, default=0.10, help="min relative throughput gain per level")
+    ap.add_argument("--spawn", action="store_true", help="start uvicorn locally with the fake LLM + SQLite")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    ap.add_argument("--workdir", default="./bench")
+    ap.add_argument("--areas", type=int, default=2000)
+    ap.add_argument("--llm-latency-ms", type=float, default=0.0)
+    ap.add_argument("--llm-tokens-per-s", type=float, default=0.0)
+    ap.add_argument("--out", default=None, help="result JSON path (default <workdir>/results/load-<ts>.json)")
+    args = ap.parse_args()
+
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    body: Dict[str, Any] = {"user_prompt": args.question, "provider": args.provider}
+    if args.model:
+        body["model"] = args.model
+    if args.deadline_ms:
+        body["deadline_ms"] = args.deadline_ms
+
+    proc = spawn_app(args) if args.spawn else None
+    try:
+        # one warm-up request (engine / pool / imports)
+        stream_once(args.url, body, timeout_s=args.timeout_s)
+
+        rows: List[Dict[str, Any]] = []
+        for c in levels:
+            print(f"[load] concurrency={c} ...", file=sys.stderr)
+            rows.append(
+                run_level(
+                    args.url,
+                    body,
+                    concurrency=c,
+                    total_requests=max(c, args.requests_per_level),
+                    timeout_s=args.timeout_s,
+                )
+            )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=15)
+
+    result = {
+        "meta": {
+            "url": args.url,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "question": args.question,
+            "provider": args.provider,
+            "spawned": bool(args.spawn),
+            "workers": args.workers if args.spawn else None,
+            "llm_latency_ms": args.llm_latency_ms if args.spawn else None,
+        },
+        "levels": rows,
+        "knee_concurrency": find_knee(rows, args.knee_gain),
+    }
+
+    out = args.out or os.path.join(args.workdir, "results", f"load-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"{'conc':>5s} {'rps':>8s} {'ev/s':>8s} {'ttfb p95':>9s} {'rows p95':>9s} {'answer p95':>10s} {'e2e p99':>9s} {'err/req':>8s} {'fail':>5s}")
+    for r in rows:
+        lat = r["latency_ms"]
+        print(
+            f"{r['concurrency']:5d} {r['throughput_rps'] or 0:8.2f} {r['events_per_s'] or 0:8.1f} "
+            f"{lat['ttfb'].get('p95', 0):9.1f} {lat['first_rows'].get('p95', 0):9.1f} "
+            f"{lat['answer'].get('p95', 0):10.1f} {lat['e2e'].get('p99', 0):9.1f} "
+            f"{r['error_event_rate']:8.3f} {r['transport_failures']:5d}"
+        )
+    print(f"knee (saturation) at concurrency: {result['knee_concurrency']}")
+    print(f"results: {out}")
+
+
+if __name__ == "__main__":
+    main()
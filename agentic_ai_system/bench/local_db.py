@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+"""
+Local database stand-in for benchmarks.
+
+Seeds an SQLite file with synthetic data shaped like the production
+MariaDB tables the agents query most (m_province / m_amphur / ... ,
+b100_disaster_area, b20_init_help, b21_feed_count, tbl_sps01/02/03).
+Point the pipeline at it with DATABASE_URL=sqlite:///<path>.
+
+    python -m agentic_ai_system.bench.local_db --path ./bench/bench.db --areas 5000
+
+Column names follow knowlages/data_dictionary_*_th.md so SQL written for
+the real schema (simple SELECT / JOIN / GROUP BY) runs unchanged.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List
+import argparse
+import os
+import random
+import sqlite3
+
+
+SCHEMA = """
+CREATE TABLE m_province (
+    id INTEGER PRIMARY KEY,
+    province_id INTEGER,
+    province_name TEXT NOT NULL
+);
+CREATE TABLE m_amphur (
+    id INTEGER PRIMARY KEY,
+    province_id INTEGER REFERENCES m_province(id),
+    amphur_name TEXT NOT NULL
+);
+CREATE TABLE m_tambon (
+    id INTEGER PRIMARY KEY,
+    amphur_id INTEGER REFERENCES m_amphur(id),
+    tambon_name TEXT NOT NULL
+);
+CREATE TABLE m_village (
+    id INTEGER PRIMARY KEY,
+    tambon_id INTEGER REFERENCES m_tambon(id),
+    village_name TEXT NOT NULL,
+    moo INTEGER
+);
+CREATE TABLE m_disaster_type (
+    id INTEGER PRIMARY KEY,
+    disaster_type TEXT NOT NULL,
+    status INTEGER DEFAULT 1
+);
+CREATE TABLE m_feed_type (
+    id INTEGER PRIMARY KEY,
+    feed_type TEXT NOT NULL
+);
+CREATE TABLE b100_disaster_area (
+    id INTEGER PRIMARY KEY,
+    province_id INTEGER REFERENCES m_province(id),
+    amphur_id INTEGER REFERENCES m_amphur(id),
+    tambon_id INTEGER REFERENCES m_tambon(id),
+    village_id INTEGER REFERENCES m_village(id),
+    disaster_type_id INTEGER REFERENCES m_disaster_type(id),
+    annonced_date DATE,
+    end_annonced DATE,
+    status_id INTEGER,
+    flg_remove INTEGER DEFAULT 0
+);
+CREATE TABLE b20_init_help (
+    id INTEGER PRIMARY KEY,
+    disaster_area_id INTEGER REFERENCES b100_disaster_area(id),
+    total_feed_count INTEGER,
+    total_relief_bags INTEGER,
+    created_at DATE
+);
+CREATE TABLE b21_feed_count (
+    id INTEGER PRIMARY KEY,
+    b20_init_help_id INTEGER REFERENCES b20_init_help(id),
+    feed_type_id INTEGER REFERENCES m_feed_type(id),
+    amount NUMERIC
+);
+CREATE TABLE tbl_sps01 (
+    id INTEGER PRIMARY KEY,
+    b10_sps01_id INTEGER REFERENCES b100_disaster_area(id),
+    m01 INTEGER REFERENCES m_province(id),
+    m08 INTEGER REFERENCES m_disaster_type(id),
+    annonced_date DATE,
+    total_animals INTEGER,
+    total_farmers INTEGER,
+    grand_total NUMERIC,
+    grand_help_total NUMERIC,
+    sps01_status INTEGER
+);
+CREATE TABLE tbl_sps02 (
+    id INTEGER PRIMARY KEY,
+    b10_sps02_id INTEGER REFERENCES b100_disaster_area(id),
+    m01 INTEGER REFERENCES m_province(id),
+    sps02_round_date DATE,
+    total_relief_bags INTEGER,
+    total_farmers INTEGER,
+    total_animals INTEGER,
+    sps02_status INTEGER
+);
+CREATE TABLE tbl_sps03 (
+    id INTEGER PRIMARY KEY,
+    b10_sps03_id INTEGER REFERENCES b100_disaster_area(id),
+    m01 INTEGER REFERENCES m_province(id),
+    sps03_round_date DATE,
+    total_farmers INTEGER,
+    total_animals INTEGER,
+    collect_animals INTEGER,
+    sps03_status INTEGER
+);
+CREATE INDEX ix_b100_province ON b100_disaster_area(province_id);
+CREATE INDEX ix_b100_date ON b100_disaster_area(annonced_date);
+CREATE INDEX ix_b21_help ON b21_feed_count(b20_init_help_id);
+"""
+
+PROVINCES = [
+    "เชียงใหม่", "เชียงราย", "ลำปาง", "น่าน", "พิษณุโลก", "นครสวรรค์", "ขอนแก่น", "อุดรธานี",
+    "นครราชสีมา", "อุบลราชธานี", "สุรินทร์", "ร้อยเอ็ด", "พระนครศรีอยุธยา", "สุพรรณบุรี", "กาญจนบุรี",
+    "ชลบุรี", "จันทบุรี", "สุราษฎร์ธานี", "นครศรีธรรมราช", "สงขลา",
+]
+DISASTER_TYPES = ["อุทกภัย", "ภัยแล้ง", "วาตภัย", "ดินถล่ม", "อัคคีภัย", "โรคระบาดสัตว์"]
+FEED_TYPES = ["หญ้าแห้ง", "อาหารข้น", "ฟางข้าว", "หญ้าสด", "แร่ธาตุก้อน"]
+
+
+def seed_sqlite(path: str, *, areas: int = 2000, seed: int = 42) -> Dict[str, int]:
+    """(Re)create `path` and fill it; returns row counts per table."""
+    if os.path.exists(path):
+        os.remove(path)
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SCHEMA)
+
+        provinces = [(i, i, name) for i, name in enumerate(PROVINCES, start=1)]
+        amphurs: List[tuple] = []
+        tambons: List[tuple] = []
+        villages: List[tuple] = []
+        for pid, _, pname in provinces:
+            for a in range(1, 6):
+                aid = len(amphurs) + 1
+                amphurs.append((aid, pid, f"อำเภอ{a} {pname}"))
+                for t in range(1, 4):
+                    tid = len(tambons) + 1
+                    tambons.append((tid, aid, f"ตำบล{t} อ.{aid}"))
+                    for v in range(1, 4):
+                        villages.append((len(villages) + 1, tid, f"บ้าน{v} ต.{tid}", v))
+
+        tambon_to_amphur = {t[0]: t[1] for t in tambons}
+        amphur_to_province = {a[0]: a[1] for a in amphurs}
+
+        start = date(2023, 1, 1)
+        area_rows: List[tuple] = []
+        for i in range(1, areas + 1):
+            vid, tid, _, _ = rnd.choice(villages)
+            aid = tambon_to_amphur[tid]
+            announced = start + timedelta(days=rnd.randrange(0, 900))
+            ended = announced + timedelta(days=rnd.randrange(7, 90)) if rnd.random() < 0.7 else None
+            area_rows.append(
+                (
+                    i,
+                    amphur_to_province[aid],
+                    aid,
+                    tid,
+                    vid,
+                    rnd.randrange(1, len(DISASTER_TYPES) + 1),
+                    announced.isoformat(),
+                    ended.isoformat() if ended else None,
+                    rnd.choice([1, 2, 3]),
+                    1 if rnd.random() < 0.03 else 0,
+                )
+            )
+
+        help_rows: List[tuple] = []
+        feed_rows: List[tuple] = []
+        for area in area_rows:
+            for _ in range(rnd.randrange(0, 3)):
+                hid = len(help_rows) + 1
+                help_rows.append((hid, area[0], 0, rnd.randrange(0, 200), area[6]))
+                for _ in range(rnd.randrange(1, 4)):
+                    feed_rows.append(
+                        (len(feed_rows) + 1, hid, rnd.randrange(1, len(FEED_TYPES) + 1), round(rnd.uniform(10, 5000), 2))
+                    )
+
+        sps01 = [
+            (
+                i, a[0], a[1], a[5], a[6],
+                rnd.randrange(10, 5000), rnd.randrange(1, 300),
+                round(rnd.uniform(1e4, 5e6), 2), round(rnd.uniform(1e3, 1e6), 2), rnd.choice([1, 2, 3]),
+            )
+            for i, a in enumerate(area_rows, start=1)
+        ]
+        sps02 = [
+            (i, a[0], a[1], a[6], rnd.randrange(0, 500), rnd.randrange(1, 300), rnd.randrange(10, 5000), rnd.choice([1, 2, 3]))
+            for i, a in enumerate(area_rows, start=1)
+        ]
+        sps03 = [
+            (i, a[0], a[1], a[6], rnd.randrange(1, 300), rnd.randrange(0, 800), rnd.randrange(0, 4000), rnd.choice([1, 2, 3]))
+            for i, a in enumerate(area_rows, start=1)
+        ]
+
+        conn.executemany("INSERT INTO m_province VALUES (?,?,?)", provinces)
+        conn.executemany("INSERT INTO m_amphur VALUES (?,?,?)", amphurs)
+        conn.executemany("INSERT INTO m_tambon VALUES (?,?,?)", tambons)
+        conn.executemany("INSERT INTO m_village VALUES (?,?,?,?)", villages)
+        conn.executemany("INSERT INTO m_disaster_type VALUES (?,?,1)", list(enumerate(DISASTER_TYPES, start=1)))
+        conn.executemany("INSERT INTO m_feed_type VALUES (?,?)", list(enumerate(FEED_TYPES, start=1)))
+        conn.executemany("INSERT INTO b100_disaster_area VALUES (?,?,?,?,?,?,?,?,?,?)", area_rows)
+        conn.executemany("INSERT INTO b20_init_help VALUES (?,?,?,?,?)", help_rows)
+        conn.executemany("INSERT INTO b21_feed_count VALUES (?,?,?,?)", feed_rows)
+        conn.executemany("INSERT INTO tbl_sps01 VALUES (?,?,?,?,?,?,?,?,?,?)", sps01)
+        conn.executemany("INSERT INTO tbl_sps02 VALUES (?,?,?,?,?,?,?,?)", sps02)
+        conn.executemany("INSERT INTO tbl_sps03 VALUES (?,?,?,?,?,?,?,?)", sps03)
+        conn.commit()
+
+        counts: Dict[str, int] = {}
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"):
+            counts[name] = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+        return counts
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Seed an SQLite stand-in for the text-to-SQL benchmark")
+    ap.add_argument("--path", default="./bench/bench.db")
+    ap.add_argument("--areas", type=int, default=2000, help="rows in b100_disaster_area (other tables scale with it)")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    counts = seed_sqlite(args.path, areas=args.areas, seed=args.seed)
+    for name, n in counts.items():
+        print(f"{name:24s} {n}")
+    print(f"\nDATABASE_URL=sqlite:///{os.path.abspath(args.path)}")
+
+
+if __name__ == "__main__":
+    main()
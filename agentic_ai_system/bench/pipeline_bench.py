@@ -0,0 +1,437 @@
+from __future__ import annotations
+
+"""
+End-to-end benchmark for stream_sse_pipeline.
+
+Runs the real pipeline (domain guard -> text-to-SQL -> validate -> execute ->
+compose) against the local SQLite stand-in (bench/local_db.py) with the
+offline "fake" LLM provider. Each scenario scripts the LLM through wildcard
+cassette entries, so runs are deterministic and comparable across commits.
+
+Scenarios:
+- cache_hit          schema snapshot cache warm (steady state)
+- first_try          schema snapshot cache cleared before every run (cold)
+- validation_repair  1st SQL fails hygiene (DML) -> text-to-SQL repairs it
+- execution_repair   1st SQL hits an unknown column -> execution repair attempt
+- large_result       JOIN returning SQL_MAX_ROWS=2000 rows (many rows chunks)
+- result_200         the same JOIN cut at 200 rows, dict rows on the wire
+- result_200_columnar  the same 200 rows with SSE_ROW_FORMAT=columnar
+
+Reported per scenario: end-to-end / time-to-first-byte / time-to-first-rows
+p50/p95/p99, per-stage p50/p95/p99 (from the done event's timings_ms),
+throughput, SSE bytes, tracemalloc peak / retained bytes per run and peak RSS.
+
+    python -m agentic_ai_system.bench.pipeline_bench --iterations 30 --out bench/results/head.json
+    python -m agentic_ai_system.bench.pipeline_bench --compare bench/results/base.json
+
+Use --llm-latency-ms / --llm-tokens-per-s to model provider latency, or
+--database-url to run against a seeded MariaDB container instead of SQLite.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+@dataclass
+class Scenario:
+    name: str
+    question: str
+    # text-to-SQL LLM outputs in call order (the last one repeats)
+    text_to_sql: List[str]
+    env: Dict[str, str] = field(default_factory=dict)
+    cold_schema_cache: bool = False
+
+
+def _sql_json(sql: str) -> str:
+    return json.dumps(
+        {"sql": sql, "params": {}, "assumptions": ["benchmark"], "expected_columns": []},
+        ensure_ascii=False,
+    )
+
+
+_COUNT_SQL = (
+    "SELECT COUNT(*) AS total FROM b100_disaster_area "
+    "WHERE annonced_date BETWEEN '2024-01-01' AND '2024-12-31' AND flg_remove = 0;"
+)
+_LARGE_SQL = (
+    "SELECT a.id, p.province_name, d.disaster_type, a.annonced_date, a.end_annonced "
+    "FROM b100_disaster_area a "
+    "JOIN m_province p ON p.id = a.province_id "
+    "JOIN m_disaster_type d ON d.id = a.disaster_type_id "
+    "ORDER BY a.annonced_date DESC;"
+)
+_COUNT_Q = "ในปี 2024 มีการประกาศพื้นที่ภัยพิบัติไปกี่ครั้ง"
+
+SCENARIOS: Dict[str, Scenario] = {
+    s.name: s
+    for s in [
+        Scenario("cache_hit", _COUNT_Q, [_sql_json(_COUNT_SQL)]),
+        Scenario("first_try", _COUNT_Q, [_sql_json(_COUNT_SQL)], cold_schema_cache=True),
+        Scenario(
+            "validation_repair",
+            _COUNT_Q,
+            [_sql_json("DELETE FROM b100_disaster_area;"), _sql_json(_COUNT_SQL)],
+        ),
+        Scenario(
+            "execution_repair",
+            _COUNT_Q,
+            [_sql_json("SELECT COUNT(*) AS total FROM b100_disaster_area WHERE annonced_year = 2024;"), _sql_json(_COUNT_SQL)],
+        ),
+        Scenario(
+            "large_result",
+            "ขอรายการประกาศเขตภัยพิบัติทั้งหมด พร้อมชื่อจังหวัดและประเภทภัย",
+            [_sql_json(_LARGE_SQL)],
+            env={"SQL_MAX_ROWS": "2000"},
+        ),
+        Scenario(
+            "result_200",
+            "ขอรายการประกาศเขตภัยพิบัติทั้งหมด พร้อมชื่อจังหวัดและประเภทภัย",
+            [_sql_json(_LARGE_SQL)],
+            env={"SQL_MAX_ROWS": "200", "SSE_ROW_FORMAT": "records"},
+        ),
+        Scenario(
+            "result_200_columnar",
+            "ขอรายการประกาศเขตภัยพิบัติทั้งหมด พร้อมชื่อจังหวัดและประเภทภัย",
+            [_sql_json(_LARGE_SQL)],
+            env={"SQL_MAX_ROWS": "200", "SSE_ROW_FORMAT": "columnar"},
+        ),
+    ]
+}
+
+
+# ---------------- SSE client side ----------------
+
+def parse_sse(buf: bytes) -> Iterator[Tuple[str, Any]]:
+    """Yield (event, data) from complete SSE frames in buf."""
+    for frame in buf.decode("utf-8").split("\n\n"):
+        event, data_lines = "message", []
+        for line in frame.split("\n"):
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+        if data_lines:
+            yield event, json.loads("\n".join(data_lines))
+
+
+def event_rows(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rows of a rows event as dicts, for either row_format."""
+    if "data" in data:
+        cols = data.get("columns") or []
+        return [dict(zip(cols, r)) for r in data["data"]]
+    return data.get("rows") or []
+
+
+def run_once(question: str, *, provider: str) -> Dict[str, Any]:
+    """Drive one pipeline run like an SSE client and collect client-side timings."""
+    from agentic_ai_system.orchestration.executor_stream import stream_sse_pipeline
+
+    t0 = time.perf_counter()
+    out: Dict[str, Any] = {
+        "ttfb_ms": None,
+        "first_rows_ms": None,
+        "answer_ms": None,
+        "status": "incomplete",
+        "events": {},
+        "bytes": 0,
+        "rows": 0,
+        "timings_ms": {},
+        "attempt": None,
+        "llm_calls": 0,
+        "error_codes": [],
+    }
+    for chunk in stream_sse_pipeline(question, provider=provider):
+        now_ms = (time.perf_counter() - t0) * 1000
+        if out["ttfb_ms"] is None:
+            out["ttfb_ms"] = now_ms
+        out["bytes"] += len(chunk)
+        for event, data in parse_sse(chunk):
+            out["events"][event] = out["events"].get(event, 0) + 1
+            if event == "rows":
+                if out["first_rows_ms"] is None:
+                    out["first_rows_ms"] = now_ms
+                out["rows"] += int(data.get("row_count") or 0)
+            elif event == "answer":
+                out["answer_ms"] = now_ms
+            elif event == "error":
+                out["error_codes"].append(data.get("error_code"))
+            elif event == "done":
+                out["status"] = data.get("status")
+                out["attempt"] = data.get("attempt")
+                out["timings_ms"] = data.get("timings_ms") or {}
+                out["llm_calls"] = ((data.get("usage") or {}).get("total") or {}).get("calls", 0)
+    out["e2e_ms"] = (time.perf_counter() - t0) * 1000
+    return out
+
+
+# ---------------- stats ----------------
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Linear-interpolated percentile (p in 0..100)."""
+    vals = sorted(v for v in values if v is not None)
+    if not vals:
+        return None
+    if len(vals) == 1:
+        return vals[0]
+    k = (len(vals) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(vals) - 1)
+    return vals[lo] + (vals[hi] - vals[lo]) * (k - lo)
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    vals = [v for v in values if v is not None]
+    if not vals:
+        return {"n": 0}
+    return {
+        "n": len(vals),
+        "mean": round(sum(vals) / len(vals), 3),
+        "min": round(min(vals), 3),
+        "p50": round(percentile(vals, 50), 3),
+        "p95": round(percentile(vals, 95), 3),
+        "p99": round(percentile(vals, 99), 3),
+        "max": round(max(vals), 3),
+    }
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(rss if sys.platform == "darwin" else rss * 1024)
+
+
+# ---------------- scenario runner ----------------
+
+class _EnvPatch:
+    def __init__(self, env: Dict[str, str]) -> None:
+        self.env = env
+        self._old: Dict[str, Optional[str]] = {}
+
+    def __enter__(self) -> "_EnvPatch":
+        for k, v in self.env.items():
+            self._old[k] = os.environ.get(k)
+            os.environ[k] = v
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        for k, v in self._old.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def write_cassette(path: str, scenario: Scenario) -> None:
+    from agentic_ai_system.orchestration.fake_llm import get_cassette
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for resp in scenario.text_to_sql:
+            rec = {
+                "key": "*:text_to_sql",
+                "provider": "fake",
+                "model": "fake-model",
+                "response": resp,
+                "usage": {"input_tokens": 6000, "output_tokens": max(1, len(resp) // 4)},
+            }
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    get_cassette(path).load()
+
+
+def run_scenario(
+    scenario: Scenario,
+    *,
+    cassette_dir: str,
+    iterations: int,
+    warmup: int,
+    alloc_runs: int,
+    provider: str = "fake",
+) -> Dict[str, Any]:
+    from agentic_ai_system.agents.text_to_sql.schema_retriever import clear_schema_cache
+    from agentic_ai_system.orchestration.fake_llm import get_cassette
+
+    cassette_path = os.path.join(cassette_dir, f"{scenario.name}.jsonl")
+    write_cassette(cassette_path, scenario)
+    cassette = get_cassette(cassette_path)
+
+    def one() -> Dict[str, Any]:
+        cassette.rewind()
+        if scenario.cold_schema_cache:
+            clear_schema_cache()
+        return run_once(scenario.question, provider=provider)
+
+    with _EnvPatch({**scenario.env, "FAKE_LLM_CASSETTE": cassette_path}):
+        for _ in range(warmup):
+            one()
+
+        runs: List[Dict[str, Any]] = []
+        t_start = time.perf_counter()
+        for _ in range(iterations):
+            runs.append(one())
+        wall_s = time.perf_counter() - t_start
+
+        allocs: List[Dict[str, int]] = []
+        for _ in range(alloc_runs):
+            tracemalloc.start()
+            try:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                one()
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            allocs.append({"peak_bytes": peak - before, "retained_bytes": current - before})
+
+    stage_names = sorted({k for r in runs for k in r["timings_ms"]})
+    statuses: Dict[str, int] = {}
+    for r in runs:
+        statuses[r["status"] or "none"] = statuses.get(r["status"] or "none", 0) + 1
+
+    return {
+        "question": scenario.question,
+        "iterations": iterations,
+        "status": statuses,
+        "attempts_mean": round(sum((r["attempt"] or 0) + 1 for r in runs) / max(1, len(runs)), 3),
+        "llm_calls_mean": round(sum(r["llm_calls"] for r in runs) / max(1, len(runs)), 3),
+        "rows_mean": round(sum(r["rows"] for r in runs) / max(1, len(runs)), 1),
+        "sse_bytes_mean": round(sum(r["bytes"] for r in runs) / max(1, len(runs)), 1),
+        "throughput_rps": round(iterations / wall_s, 3) if wall_s > 0 else None,
+        "latency_ms": {
+            "e2e": summarize([r["e2e_ms"] for r in runs]),
+            "ttfb": summarize([r["ttfb_ms"] for r in runs]),
+            "first_rows": summarize([r["first_rows_ms"] for r in runs]),
+            "answer": summarize([r["answer_ms"] for r in runs]),
+        },
+        "stages_ms": {s: summarize([r["timings_ms"].get(s) for r in runs]) for s in stage_names},
+        "allocations": {
+            "runs": len(allocs),
+            "peak_bytes_mean": int(sum(a["peak_bytes"] for a in allocs) / len(allocs)) if allocs else None,
+            "retained_bytes_mean": int(sum(a["retained_bytes"] for a in allocs) / len(allocs)) if allocs else None,
+        },
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any]) -> List[str]:
+    """Human-readable p50/p95 deltas between two result files."""
+    lines = [f"{'scenario':20s} {'metric':12s} {'base':>10s} {'head':>10s} {'delta':>8s}"]
+    for name, h in head.get("scenarios", {}).items():
+        b = base.get("scenarios", {}).get(name)
+        if not b:
+            continue
+        for metric in ("e2e", "first_rows"):
+            for p in ("p50", "p95"):
+                bv = (b["latency_ms"].get(metric) or {}).get(p)
+                hv = (h["latency_ms"].get(metric) or {}).get(p)
+                if bv is None or hv is None:
+                    continue
+                delta = f"{(hv - bv) / bv * 100:+.1f}%" if bv else "n/a"
+                lines.append(f"{name:20s} {metric + '.' + p:12s} {bv:10.2f} {hv:10.2f} {delta:>8s}")
+    return lines
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="End-to-end benchmark for stream_sse_pipeline")
+    ap.add_argument("--scenarios", default="all", help=f"comma list of {', '.join(SCENARIOS)} (default all)")
+    ap.add_argument("--iterations", type=int, default=20)
+    ap.add_argument("--warmup", type=int, default=2)
+    ap.add_argument("--alloc-runs", type=int, default=3, help="extra runs per scenario under tracemalloc")
+    ap.add_argument("--workdir", default="./bench", help="SQLite file, cassettes and results live here")
+    ap.add_argument("--areas", type=int, default=2000, help="b100_disaster_area rows in the SQLite stand-in")
+    ap.add_argument("--database-url", default=None, help="use an existing (seeded) database instead of SQLite")
+    ap.add_argument("--llm-latency-ms", type=float, default=0.0)
+    ap.add_argument("--llm-tokens-per-s", type=float, default=0.0)
+    ap.add_argument("--out", default=None, help="result JSON path (default <workdir>/results/pipeline-<commit>.json)")
+    ap.add_argument("--compare", default=None, help="baseline result JSON to diff against")
+    args = ap.parse_args()
+
+    names = list(SCENARIOS) if args.scenarios == "all" else [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        ap.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    db_counts: Dict[str, int] = {}
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        from agentic_ai_system.bench.local_db import seed_sqlite
+
+        db_path = os.path.join(args.workdir, "bench.db")
+        db_counts = seed_sqlite(db_path, areas=args.areas)
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+
+    # must be set before the pipeline modules create their engines / models
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["FAKE_LLM_TOKENS_PER_S"] = str(args.llm_tokens_per_s)
+    os.environ.setdefault("TRACE_SQL_COMMENT", "1")
+    # keep benchmark examples out of the deployment's few-shot index
+    os.environ.setdefault("FEWSHOT_PATH", os.path.join(args.workdir, "fewshot.db"))
+
+    commit = _git_commit()
+    result: Dict[str, Any] = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": "external" if args.database_url else "sqlite",
+            "db_rows": db_counts,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_tokens_per_s": args.llm_tokens_per_s,
+        },
+        "scenarios": {},
+    }
+
+    cassette_dir = os.path.join(args.workdir, "cassettes")
+    for name in names:
+        print(f"[bench] {name} ...", file=sys.stderr)
+        result["scenarios"][name] = run_scenario(
+            SCENARIOS[name],
+            cassette_dir=cassette_dir,
+            iterations=args.iterations,
+            warmup=args.warmup,
+            alloc_runs=args.alloc_runs,
+        )
+
+    out = args.out or os.path.join(args.workdir, "results", f"pipeline-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(f"{'scenario':20s} {'status':24s} {'e2e p50':>9s} {'p95':>9s} {'p99':>9s} {'rps':>8s} {'alloc peak':>11s}")
+    for name, r in result["scenarios"].items():
+        e2e = r["latency_ms"]["e2e"]
+        print(
+            f"{name:20s} {json.dumps(r['status']):24s} {e2e.get('p50', 0):9.2f} {e2e.get('p95', 0):9.2f} "
+            f"{e2e.get('p99', 0):9.2f} {r['throughput_rps'] or 0:8.2f} {r['allocations']['peak_bytes_mean'] or 0:11d}"
+        )
+    print(f"peak RSS: {peak_rss_bytes() / 1e6:.1f} MB")
+    print(f"results: {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        print()
+        print("\n".join(compare(base, result)))
+
+
+if __name__ == "__main__":
+    main()
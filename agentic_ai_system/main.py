@@ -1,43 +1,104 @@
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from pathlib import Path
-from typing import Optional
+import os
+from typing import AsyncIterator, List, Optional, Union
+import uuid
 
+import anyio
+
+from agentic_ai_system.orchestration.batch import BatchRun, batch_limits, max_batch_questions
+from agentic_ai_system.orchestration.cancellation import CancelToken
 from agentic_ai_system.orchestration.executor_stream import stream_sse_pipeline
+from agentic_ai_system.orchestration.jobs import JobQueueFull, job_runner
+from agentic_ai_system.orchestration.llm_models import ALLOWED
+from agentic_ai_system.orchestration.stream_runs import Follower, StreamCapacityFull, follow, start_run
+from agentic_ai_system.orchestration.metrics import registry as metrics_registry
+from agentic_ai_system.orchestration.result_frame import ROW_FORMATS
+from agentic_ai_system.orchestration.usage import usage_ledger
 import markdown
 
 GITHUB_MD_CSS = "https://cdnjs.cloudflare.com/ajax/libs/github-markdown-css/5.8.1/github-markdown.min.css"
 
 load_dotenv()
 app = FastAPI(title="Agentic AI System (Gemini)", version="2.0.1")
-ALLOWED = {
-    "openai": {"gpt-4o", "gpt-4o-mini"},
-    "openrouter": {
-      "openai/gpt-4o",
-      "openai/gpt-4o-mini",
-      "openai/gpt-4.1-nano",
-      "openai/gpt-5-mini",
-      "openai/gpt-5.1-codex-mini",
-      "anthropic/claude-3.5-sonnet",
-      "google/gemini-2.5-flash"
-    },
-    "gemini": {"gemini-1.5-pro", "gemini-1.5-flash"},
-}
-
 DEFAULTS = {
     "openai": "gpt-4o-mini",
     "openrouter": "openai/gpt-4o-mini",
     "gemini": "gemini-1.5-flash",
 }
 
+# offline providers for benchmarks / load tests (never enable in production)
+if os.getenv("ENABLE_FAKE_LLM", "0") == "1":
+    ALLOWED["fake"] = {"fake-model"}
+    ALLOWED["replay"] = {"replay"}
+    DEFAULTS["fake"] = "fake-model"
+    DEFAULTS["replay"] = "replay"
+
 class Query(BaseModel):
     user_prompt: str
     conversation_id: Optional[str] = None
-    provider: Optional[str] = None   # openai | openrouter | gemini
+    provider: Optional[str] = None   # openai | openrouter | gemini (| fake | replay with ENABLE_FAKE_LLM=1)
     model: Optional[str] = None      # เช่น gpt-4o-mini / gemini-1.5-pro / openai/gpt-4o-mini
+    deadline_ms: Optional[int] = None  # override REQUEST_DEADLINE_MS (capped by REQUEST_DEADLINE_MAX_MS)
+    row_format: Optional[str] = None  # records (default, SSE_ROW_FORMAT) | columnar
+
+
+class BatchQuestion(BaseModel):
+    user_prompt: str
+    conversation_id: Optional[str] = None
+    deadline_ms: Optional[int] = None
+
+
+class BatchQuery(BaseModel):
+    questions: List[Union[str, BatchQuestion]]
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    deadline_ms: Optional[int] = None     # per question (REQUEST_DEADLINE_MS)
+    concurrency: Optional[int] = None     # lower than BATCH_CONCURRENCY only
+    llm_concurrency: Optional[int] = None  # lower than BATCH_LLM_CONCURRENCY only
+    db_concurrency: Optional[int] = None   # lower than BATCH_DB_CONCURRENCY only
+
+
+async def _follow(follower: Follower) -> AsyncIterator[bytes]:
+    """
+    Send a run's events to one client (orchestration/stream_runs.py).
+    Starlette cancels this iteration when the client disconnects; the
+    follower then detaches and the run waits SSE_RESUME_GRACE_MS for a
+    reconnect before it is cancelled.
+    """
+    try:
+        while True:
+            chunk = await anyio.to_thread.run_sync(follower.next, abandon_on_cancel=True)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        follower.close()
+
+
+async def _lines(batch: BatchRun) -> AsyncIterator[bytes]:
+    """NDJSON lines of a batch as its questions complete; a disconnect cancels the rest."""
+    try:
+        while True:
+            line = await anyio.to_thread.run_sync(batch.next, abandon_on_cancel=True)
+            if line is None:
+                return
+            yield line
+    finally:
+        batch.close()
+
+
+def _sse_response(follower: Follower) -> StreamingResponse:
+    return StreamingResponse(
+        _follow(follower),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Trace-Id": follower.trace_id},
+    )
+
 
 WEB_DIR = Path(__file__).parent / "web"
 app.mount("/static", StaticFiles(directory=str(WEB_DIR)), name="static")
@@ -57,11 +118,25 @@ def home():
 def health():
     return {"ok": True}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+@app.get("/usage/report")
+def usage_report(conversation_id: Optional[str] = None, trace_id: Optional[str] = None):
+    if trace_id:
+        return {"trace_id": trace_id, **usage_ledger.trace_summary(trace_id)}
+    if conversation_id:
+        return {"conversation_id": conversation_id, "total": usage_ledger.conversation_summary(conversation_id)}
+    return usage_ledger.report()
 
-@app.post("/query/stream")
-def query_stream(q: Query):
-    provider = (q.provider or os.getenv("LLM_PROVIDER", "openai")).lower()
-    model = q.model or os.getenv("MODEL") or DEFAULTS.get(provider)
+
+def _resolve_model(provider: Optional[str], model: Optional[str], row_format: Optional[str] = None) -> tuple[str, str]:
+    provider = (provider or os.getenv("LLM_PROVIDER", "openai")).lower()
+    model = model or os.getenv("MODEL") or DEFAULTS.get(provider)
 
     if provider not in ALLOWED:
         raise HTTPException(status_code=400, detail=f"provider not allowed: {provider}")
@@ -69,18 +144,115 @@ def query_stream(q: Query):
     if not model or model not in ALLOWED[provider]:
         raise HTTPException(status_code=400, detail=f"model not allowed for {provider}: {model}")
 
+    if row_format and row_format not in ROW_FORMATS:
+        raise HTTPException(status_code=400, detail=f"row_format must be one of {', '.join(ROW_FORMATS)}")
+    return provider, model
+
+
+def _routable(provider: Optional[str], model: Optional[str]) -> bool:
+    """Nothing pinned by the request: LLM_ROUTE_FAST / LLM_ROUTE_STRONG may pick the model (orchestration/model_router.py)."""
+    return provider is None and model is None
+
+
+def _last_event_id(request: Request, last_event_id: Optional[int]) -> int:
+    raw = request.headers.get("last-event-id")
+    try:
+        return int(raw) if raw else int(last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Last-Event-ID must be an integer event id")
+
+
+@app.post("/query/stream")
+def query_stream(q: Query):
+    provider, model = _resolve_model(q.provider, q.model, q.row_format)
+
+    trace_id = str(uuid.uuid4())
+    cancel = CancelToken()
     generator = stream_sse_pipeline(
         user_prompt=q.user_prompt,
         conversation_id=q.conversation_id,
         provider=provider,
         model=model,
+        deadline_ms=q.deadline_ms,
+        row_format=q.row_format,
+        cancel=cancel,
+        trace_id=trace_id,
+        route_models=_routable(q.provider, q.model),
     )
+    try:
+        follower = start_run(trace_id, generator, cancel)
+    except StreamCapacityFull as e:
+        generator.close()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return _sse_response(follower)
+
+@app.get("/query/stream/{trace_id}")
+def query_stream_resume(trace_id: str, request: Request, last_event_id: Optional[int] = None):
+    """Resume a dropped stream: buffered events after Last-Event-ID, then live ones."""
+    follower = follow(trace_id, _last_event_id(request, last_event_id))
+    if follower is None:
+        raise HTTPException(status_code=404, detail=f"stream not found or expired: {trace_id}")
+    return _sse_response(follower)
+
+@app.post("/query/batch")
+def query_batch(b: BatchQuery):
+    """Run many questions in parallel (bounded); one NDJSON line per question as it completes, then a summary."""
+    provider, model = _resolve_model(b.provider, b.model)
+    if not b.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty")
+    if len(b.questions) > max_batch_questions():
+        raise HTTPException(status_code=400, detail=f"at most {max_batch_questions()} questions per batch")
+
+    questions = [{"user_prompt": q} if isinstance(q, str) else q.model_dump() for q in b.questions]
+    batch = BatchRun(
+        questions,
+        provider=provider,
+        model=model,
+        deadline_ms=b.deadline_ms,
+        route_models=_routable(b.provider, b.model),
+        **batch_limits(b.concurrency, b.llm_concurrency, b.db_concurrency),
+    ).start()
     return StreamingResponse(
-        generator,
-        media_type="text/event-stream",
-        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
+        _lines(batch),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Batch-Id": batch.batch_id},
     )
 
+@app.post("/query/jobs", status_code=202)
+def query_job_submit(q: Query):
+    """Queue a pipeline run on the job workers; poll /query/jobs/{id} or follow /query/jobs/{id}/events."""
+    provider, model = _resolve_model(q.provider, q.model, q.row_format)
+    try:
+        return job_runner.submit(
+            {**q.model_dump(), "provider": provider, "model": model, "route_models": _routable(q.provider, q.model)}
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+@app.get("/query/jobs/{job_id}")
+def query_job(job_id: str):
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job not found or expired: {job_id}")
+    return job
+
+@app.delete("/query/jobs/{job_id}")
+def query_job_cancel(job_id: str):
+    job = job_runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job not found or expired: {job_id}")
+    return job
+
+@app.get("/query/jobs/{job_id}/events")
+def query_job_events(job_id: str, request: Request, last_event_id: Optional[int] = None):
+    """Progress events of a job (replayed from Last-Event-ID, then live while it runs)."""
+    follower = job_runner.events(job_id, _last_event_id(request, last_event_id))
+    if follower is None:
+        if job_runner.get(job_id) is None:
+            raise HTTPException(status_code=404, detail=f"job not found or expired: {job_id}")
+        raise HTTPException(status_code=404, detail=f"events of job {job_id} expired or kept by another worker; see GET /query/jobs/{job_id}")
+    return _sse_response(follower)
+
 @app.get("/index_steam.html", response_class=HTMLResponse)
 def index_steam():
     return (WEB_DIR / "index_steam.html").read_text(encoding="utf-8")
@@ -0,0 +1,380 @@
+# agentic_ai_system/memory/event_replay.py
+from __future__ import annotations
+
+"""
+Replay buffer of SSE events per trace, for resuming dropped streams.
+
+Every entry of a pipeline run is stored under its trace_id with a
+monotonically increasing sequence number, which is also the SSE `id:` of
+the event. A client that reconnects with `Last-Event-ID: n` is sent the
+entries after n, then follows the live run (orchestration/stream_runs.py).
+
+- InMemoryReplayBuffer (default): one process; followers of a live run
+  wake on a per-trace condition
+- SqliteReplayBuffer: WAL file shared by the workers on one host, so a
+  reconnect that lands on another worker can still replay; followers of a
+  run on another worker poll every `poll_ms`
+- bounded per trace (`max_bytes`, oldest entries dropped first), by trace
+  count (least recently used evicted) and by TTL since the last append
+
+    replay_buffer.append(trace_id, seq, data)
+    replay_buffer.close(trace_id)                 # run finished
+    read = replay_buffer.read(trace_id, after_seq)  # None: unknown / expired
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Condition, RLock, local
+from time import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import os
+import sqlite3
+
+from agentic_ai_system.orchestration.metrics import registry
+
+
+REPLAY_BUFFER = registry.gauge(
+    "text2sql_sse_replay_buffer", "SSE replay buffer size (traces / bytes, in-memory backend)."
+)
+REPLAY_EVICTIONS = registry.counter(
+    "text2sql_sse_replay_evictions_total", "Replay buffer evictions by reason (lru / ttl / trim)."
+)
+
+
+@dataclass
+class ReplayRead:
+    entries: List[Tuple[int, bytes]] = field(default_factory=list)  # (seq, data), oldest first
+    closed: bool = False
+    first_seq: int = 0  # oldest seq still buffered (0 when empty)
+
+
+class ReplayBuffer(ABC):
+    """
+    Interface shared by the replay buffer backends.
+
+    - append(): store one entry (seq increasing per trace)
+    - close(): the run ended; readers stop once they have everything
+    - read(): entries after after_seq, or None for an unknown / expired trace
+    - wait(): block until an entry after after_seq may exist, stop() is
+      true (after wake()), or timeout_s; callers re-read afterwards
+    """
+
+    @abstractmethod
+    def append(self, trace_id: str, seq: int, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def close(self, trace_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def read(self, trace_id: str, after_seq: int) -> Optional[ReplayRead]:
+        ...
+
+    @abstractmethod
+    def wait(self, trace_id: str, after_seq: int, timeout_s: float, stop: Callable[[], bool] = lambda: False) -> None:
+        ...
+
+    @abstractmethod
+    def wake(self, trace_id: str) -> None:
+        """Wake the waiters of trace_id (e.g. a follower that detaches)."""
+
+
+class _Conditions:
+    """Per-trace conditions for followers in this process."""
+
+    def __init__(self) -> None:
+        self._lock = RLock()
+        self._conds: Dict[str, Tuple[Condition, int]] = {}  # trace_id -> (condition, waiters)
+
+    def wait(self, trace_id: str, ready: Callable[[], bool], timeout_s: float) -> None:
+        """One wait (checked under the lock, so a notify is never lost); spurious wake-ups are fine."""
+        with self._lock:
+            if ready():
+                return
+            cond, n = self._conds.get(trace_id) or (Condition(self._lock), 0)
+            self._conds[trace_id] = (cond, n + 1)
+            try:
+                cond.wait(timeout_s)
+            finally:
+                cond, n = self._conds[trace_id]
+                if n <= 1:
+                    del self._conds[trace_id]
+                else:
+                    self._conds[trace_id] = (cond, n - 1)
+
+    def notify(self, trace_id: str) -> None:
+        with self._lock:
+            entry = self._conds.get(trace_id)
+            if entry is not None:
+                entry[0].notify_all()
+
+
+class _Trace:
+    __slots__ = ("entries", "nbytes", "first_seq", "last_seq", "closed", "updated")
+
+    def __init__(self, now: float) -> None:
+        self.entries: List[Tuple[int, bytes]] = []
+        self.nbytes = 0
+        self.first_seq = 0
+        self.last_seq = 0
+        self.closed = False
+        self.updated = now
+
+
+class InMemoryReplayBuffer(ReplayBuffer):
+    def __init__(self, max_traces: int = 1000, max_bytes: int = 2_000_000, ttl_s: float = 600.0) -> None:
+        if max_traces <= 0 or max_bytes <= 0:
+            raise ValueError("max_traces and max_bytes must be > 0")
+        self.max_traces = max_traces
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._lock = RLock()
+        self._traces: "OrderedDict[str, _Trace]" = OrderedDict()
+        self._conds = _Conditions()
+        REPLAY_BUFFER.set_function(self._metric_values)
+
+    def _metric_values(self) -> Dict[Any, float]:
+        with self._lock:
+            return {
+                (("state", "traces"),): len(self._traces),
+                (("state", "bytes"),): sum(t.nbytes for t in self._traces.values()),
+            }
+
+    def _sweep(self, now: float) -> None:
+        # oldest-updated first: stop at the first live one
+        while self._traces:
+            trace_id, t = next(iter(self._traces.items()))
+            if now - t.updated <= self.ttl_s:
+                break
+            del self._traces[trace_id]
+            REPLAY_EVICTIONS.inc(reason="ttl")
+        while len(self._traces) > self.max_traces:
+            self._traces.popitem(last=False)
+            REPLAY_EVICTIONS.inc(reason="lru")
+
+    def append(self, trace_id: str, seq: int, data: bytes) -> None:
+        now = time()
+        with self._lock:
+            t = self._traces.get(trace_id)
+            if t is None:
+                t = self._traces[trace_id] = _Trace(now)
+                t.first_seq = seq
+            t.entries.append((seq, data))
+            t.nbytes += len(data)
+            t.last_seq = seq
+            t.updated = now
+            self._traces.move_to_end(trace_id)
+            dropped = 0
+            while t.nbytes > self.max_bytes and len(t.entries) - dropped > 1:  # keep the newest entry
+                t.nbytes -= len(t.entries[dropped][1])
+                dropped += 1
+            if dropped:
+                del t.entries[:dropped]
+                t.first_seq = t.entries[0][0]
+                REPLAY_EVICTIONS.inc(dropped, reason="trim")
+            self._sweep(now)
+        self._conds.notify(trace_id)
+
+    def close(self, trace_id: str) -> None:
+        with self._lock:
+            t = self._traces.get(trace_id)
+            if t is None:
+                t = self._traces[trace_id] = _Trace(time())
+            t.closed = True
+            t.updated = time()
+        self._conds.notify(trace_id)
+
+    def read(self, trace_id: str, after_seq: int) -> Optional[ReplayRead]:
+        with self._lock:
+            t = self._traces.get(trace_id)
+            if t is None:
+                return None
+            if after_seq >= t.last_seq:
+                entries = []
+            elif after_seq < t.first_seq:
+                entries = list(t.entries)
+            else:
+                # seqs are contiguous inside the buffer
+                entries = t.entries[after_seq - t.first_seq + 1 :]
+            return ReplayRead(entries=entries, closed=t.closed, first_seq=t.first_seq)
+
+    def _ready(self, trace_id: str, after_seq: int) -> bool:
+        t = self._traces.get(trace_id)
+        return t is not None and (t.closed or t.last_seq > after_seq)
+
+    def wait(self, trace_id: str, after_seq: int, timeout_s: float, stop: Callable[[], bool] = lambda: False) -> None:
+        self._conds.wait(trace_id, lambda: stop() or self._ready(trace_id, after_seq), timeout_s)
+
+    def wake(self, trace_id: str) -> None:
+        self._conds.notify(trace_id)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sse_traces (
+    trace_id TEXT PRIMARY KEY,
+    closed INTEGER NOT NULL DEFAULT 0,
+    nbytes INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sse_traces_updated ON sse_traces(updated);
+CREATE TABLE IF NOT EXISTS sse_events (
+    trace_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (trace_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class SqliteReplayBuffer(ReplayBuffer):
+    def __init__(
+        self,
+        path: str,
+        max_traces: int = 1000,
+        max_bytes: int = 2_000_000,
+        ttl_s: float = 600.0,
+        poll_ms: int = 200,
+        sweep_every: int = 500,
+        busy_timeout_ms: int = 5000,
+    ) -> None:
+        if max_traces <= 0 or max_bytes <= 0:
+            raise ValueError("max_traces and max_bytes must be > 0")
+        self.path = path
+        self.max_traces = max_traces
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.poll_ms = poll_ms
+        self.sweep_every = max(1, sweep_every)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = local()
+        self._appends = 0
+        self._conds = _Conditions()
+
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    def append(self, trace_id: str, seq: int, data: bytes) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO sse_events (trace_id, seq, data) VALUES (?, ?, ?)", (trace_id, seq, data))
+            conn.execute(
+                "INSERT INTO sse_traces (trace_id, nbytes, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(trace_id) DO UPDATE SET nbytes = nbytes + excluded.nbytes, updated = excluded.updated",
+                (trace_id, len(data), time()),
+            )
+            (nbytes,) = conn.execute("SELECT nbytes FROM sse_traces WHERE trace_id = ?", (trace_id,)).fetchone()
+            if nbytes > self.max_bytes:
+                self._trim(conn, trace_id, nbytes)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._conds.notify(trace_id)
+
+        self._appends += 1
+        if self._appends % self.sweep_every == 0:
+            self.sweep()
+
+    def _trim(self, conn: sqlite3.Connection, trace_id: str, nbytes: int) -> None:
+        rows = conn.execute(
+            "SELECT seq, length(data) FROM sse_events WHERE trace_id = ? ORDER BY seq", (trace_id,)
+        ).fetchall()
+        cut, dropped = None, 0
+        for seq, n in rows[:-1]:  # keep the newest entry
+            if nbytes <= self.max_bytes:
+                break
+            nbytes -= n
+            cut, dropped = seq, dropped + 1
+        if cut is not None:
+            conn.execute("DELETE FROM sse_events WHERE trace_id = ? AND seq <= ?", (trace_id, cut))
+            conn.execute("UPDATE sse_traces SET nbytes = ? WHERE trace_id = ?", (nbytes, trace_id))
+            REPLAY_EVICTIONS.inc(dropped, reason="trim")
+
+    def close(self, trace_id: str) -> None:
+        self._conn().execute(
+            "INSERT INTO sse_traces (trace_id, closed, updated) VALUES (?, 1, ?) "
+            "ON CONFLICT(trace_id) DO UPDATE SET closed = 1, updated = excluded.updated",
+            (trace_id, time()),
+        )
+        self._conds.notify(trace_id)
+
+    def read(self, trace_id: str, after_seq: int) -> Optional[ReplayRead]:
+        conn = self._conn()
+        row = conn.execute("SELECT closed, updated FROM sse_traces WHERE trace_id = ?", (trace_id,)).fetchone()
+        if row is None or (self.ttl_s > 0 and time() - row[1] > self.ttl_s):
+            return None
+        (first_seq,) = conn.execute("SELECT MIN(seq) FROM sse_events WHERE trace_id = ?", (trace_id,)).fetchone()
+        entries = conn.execute(
+            "SELECT seq, data FROM sse_events WHERE trace_id = ? AND seq > ? ORDER BY seq", (trace_id, after_seq)
+        ).fetchall()
+        return ReplayRead(entries=[(s, bytes(d)) for s, d in entries], closed=bool(row[0]), first_seq=first_seq or 0)
+
+    def wait(self, trace_id: str, after_seq: int, timeout_s: float, stop: Callable[[], bool] = lambda: False) -> None:
+        # woken at once by appends from this process; runs on other workers are polled
+        self._conds.wait(trace_id, stop, min(timeout_s, self.poll_ms / 1000))
+
+    def wake(self, trace_id: str) -> None:
+        self._conds.notify(trace_id)
+
+    def sweep(self) -> int:
+        """Drop traces idle past the TTL and trim to max_traces (LRU); returns how many were removed."""
+        conn = self._conn()
+        stale = [r[0] for r in conn.execute("SELECT trace_id FROM sse_traces WHERE updated < ?", (time() - self.ttl_s,))]
+        (count,) = conn.execute("SELECT COUNT(*) FROM sse_traces").fetchone()
+        lru: List[str] = []
+        if count - len(stale) > self.max_traces:
+            lru = [r[0] for r in conn.execute(
+                "SELECT trace_id FROM sse_traces WHERE updated >= ? ORDER BY updated LIMIT ?",
+                (time() - self.ttl_s, count - len(stale) - self.max_traces),
+            )]
+        ids = stale + lru
+        if ids:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM sse_events WHERE trace_id = ?", [(t,) for t in ids])
+                conn.executemany("DELETE FROM sse_traces WHERE trace_id = ?", [(t,) for t in ids])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if stale:
+                REPLAY_EVICTIONS.inc(len(stale), reason="ttl")
+            if lru:
+                REPLAY_EVICTIONS.inc(len(lru), reason="lru")
+        return len(ids)
+
+
+def create_replay_buffer_from_env() -> ReplayBuffer:
+    max_traces = int(os.getenv("SSE_REPLAY_MAX_TRACES", "1000"))
+    max_bytes = int(os.getenv("SSE_REPLAY_MAX_BYTES", "2000000"))
+    ttl_s = float(os.getenv("SSE_REPLAY_TTL_S", "600"))
+    backend = os.getenv("SSE_REPLAY_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SqliteReplayBuffer(
+            os.getenv("SSE_REPLAY_SQLITE_PATH", "./data/sse_replay.db"),
+            max_traces=max_traces,
+            max_bytes=max_bytes,
+            ttl_s=ttl_s,
+            poll_ms=int(os.getenv("SSE_REPLAY_POLL_MS", "200")),
+        )
+    if backend != "memory":
+        raise ValueError(f"Unsupported SSE_REPLAY_BACKEND: {backend}")
+    return InMemoryReplayBuffer(max_traces=max_traces, max_bytes=max_bytes, ttl_s=ttl_s)
+
+
+# Simple singleton for easy import everywhere
+replay_buffer = create_replay_buffer_from_env()
@@ -0,0 +1,312 @@
+# agentic_ai_system/memory/examples.py
+from __future__ import annotations
+
+"""
+Few-shot example store: verified (question, SQL, tables) triples.
+
+Every successful pipeline run adds its question and the SQL that executed
+(from one background thread, off the request path: `example_store.submit`);
+the text-to-SQL prompt then gets the top-k most similar past examples.
+
+- persistence: one SQLite (WAL) file shared by the workers on a host;
+  each process keeps an in-memory index and picks up rows written by other
+  workers every `sync_interval_s`
+- similarity: IDF-weighted cosine over question tokens. Thai has no spaces
+  between words, so Thai runs become character trigrams; Latin words and
+  numbers stay whole, and Buddhist-era years also index their CE year
+  (2567 <-> 2024)
+- dedup: one example per SQL fingerprint (literals ignored), newest wins
+- caps: max_examples kept (oldest dropped), question/SQL length, top_k and
+  a total character budget for the prompt section
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from math import log, sqrt
+from threading import Lock, RLock, local
+from time import monotonic, time
+from typing import Dict, List, Optional, Set
+import json
+import logging
+import os
+import re
+import sqlite3
+
+import sqlglot
+from sqlglot import exp
+
+from agentic_ai_system.validators.sql_hygiene import sql_fingerprint
+
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS examples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT NOT NULL UNIQUE,
+    question TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    tables TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+_WORD = re.compile(r"[a-z0-9_]+")
+_THAI = re.compile(r"[\u0e00-\u0e7f]+")
+_THAI_MARKS = re.compile(r"[\u0e47-\u0e4e\u200b]")  # tone marks / zero-width space
+_BE_YEAR = re.compile(r"25\d{2}")
+
+
+def fewshot_enabled() -> bool:
+    return os.getenv("FEWSHOT_ENABLED", "1") != "0"
+
+
+def tokenize_question(text: str) -> Set[str]:
+    s = _THAI_MARKS.sub("", (text or "").lower())
+    tokens: Set[str] = set()
+    for w in _WORD.findall(s):
+        tokens.add(w)
+        if _BE_YEAR.fullmatch(w):
+            tokens.add(str(int(w) - 543))
+    for run in _THAI.findall(s):
+        if len(run) <= 3:
+            tokens.add(run)
+        else:
+            tokens.update(run[i : i + 3] for i in range(len(run) - 2))
+    return tokens
+
+
+def sql_tables(sql: str) -> List[str]:
+    try:
+        tree = sqlglot.parse_one(sql, dialect="mysql")
+    except Exception:
+        return []
+    if tree is None:
+        return []
+    ctes = {c.alias_or_name for c in tree.find_all(exp.CTE)}
+    out: List[str] = []
+    for t in tree.find_all(exp.Table):
+        if t.name and t.name not in ctes and t.name not in out:
+            out.append(t.name)
+    return out
+
+
+@dataclass(frozen=True)
+class Example:
+    id: int
+    question: str
+    sql: str
+    tables: List[str]
+    tokens: frozenset
+
+
+class ExampleStore:
+    def __init__(
+        self,
+        path: str,
+        max_examples: int = 2000,
+        max_question_chars: int = 300,
+        max_sql_chars: int = 1500,
+        sync_interval_s: float = 30.0,
+        busy_timeout_ms: int = 5000,
+    ) -> None:
+        if max_examples <= 0:
+            raise ValueError("max_examples must be > 0")
+        self.path = path
+        self.max_examples = max_examples
+        self.max_question_chars = max_question_chars
+        self.max_sql_chars = max_sql_chars
+        self.sync_interval_s = sync_interval_s
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._local = local()
+        self._lock = RLock()
+        self._loaded = False
+        self._examples: Dict[int, Example] = {}
+        self._by_fp: Dict[str, int] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._norms: Optional[Dict[int, float]] = None  # per-example IDF norms, rebuilt after changes
+        self._max_id = 0
+        self._synced_at = 0.0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # --- in-memory index ---
+
+    def _index(self, ex: Example, fp: str) -> None:
+        old = self._by_fp.get(fp)
+        if old is not None:
+            self._unindex(old)
+        self._examples[ex.id] = ex
+        self._by_fp[fp] = ex.id
+        for t in ex.tokens:
+            self._postings.setdefault(t, set()).add(ex.id)
+        self._max_id = max(self._max_id, ex.id)
+        self._norms = None
+
+    def _unindex(self, ex_id: int) -> None:
+        ex = self._examples.pop(ex_id, None)
+        if ex is None:
+            return
+        for t in ex.tokens:
+            ids = self._postings.get(t)
+            if ids is not None:
+                ids.discard(ex_id)
+                if not ids:
+                    del self._postings[t]
+        self._norms = None
+
+    def _sync(self, force: bool = False) -> None:
+        """Load rows added since the last sync (by this or another process)."""
+        now = monotonic()
+        with self._lock:
+            if not force and self._loaded and now - self._synced_at < self.sync_interval_s:
+                return
+            rows = self._conn().execute(
+                "SELECT id, fingerprint, question, sql, tables FROM examples WHERE id > ? ORDER BY id",
+                (self._max_id,),
+            ).fetchall()
+            for ex_id, fp, q, sql, tables in rows:
+                self._index(Example(ex_id, q, sql, json.loads(tables), frozenset(tokenize_question(q))), fp)
+            if len(self._examples) > self.max_examples:
+                # trimmed by another process (or the cap was lowered): keep the newest
+                for ex_id in sorted(self._examples)[: len(self._examples) - self.max_examples]:
+                    self._unindex(ex_id)
+                self._by_fp = {fp: i for fp, i in self._by_fp.items() if i in self._examples}
+            self._loaded = True
+            self._synced_at = now
+
+    # --- public API ---
+
+    def add(self, question: str, sql: str) -> Optional[int]:
+        question = " ".join((question or "").split())[: self.max_question_chars]
+        sql = (sql or "").strip()
+        if not question or not sql or len(sql) > self.max_sql_chars:
+            return None
+        fp = sql_fingerprint(sql)
+        tables = sql_tables(sql)
+
+        conn = self._conn()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # newest question/SQL for the same query shape wins (new id, so other workers see it)
+                conn.execute("DELETE FROM examples WHERE fingerprint = ?", (fp,))
+                cur = conn.execute(
+                    "INSERT INTO examples (fingerprint, question, sql, tables, created) VALUES (?, ?, ?, ?, ?)",
+                    (fp, question, sql, json.dumps(tables), time()),
+                )
+                ex_id = int(cur.lastrowid)
+                conn.execute(
+                    "DELETE FROM examples WHERE id <= (SELECT id FROM examples ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_examples,),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            # picks up this row and anything other workers inserted meanwhile
+            self._sync(force=True)
+            return ex_id
+
+    def submit(self, question: str, sql: str) -> Future:
+        """add() on one background thread: the parse, the write lock wait and the reload stay off the request path."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fewshot-add")
+            return self._pool.submit(self._add_logged, question, sql)
+
+    def _add_logged(self, question: str, sql: str) -> Optional[int]:
+        try:
+            return self.add(question, sql)
+        except Exception:
+            # a lost example only means one fewer candidate for later prompts
+            logger.exception("few-shot example store: add failed (%s)", self.path)
+            return None
+
+    def flush(self) -> None:
+        """Wait for queued adds (tests / shutdown)."""
+        if self._pool is not None:
+            self._pool.submit(lambda: None).result()
+
+    def search(self, question: str, k: int = 3, min_score: float = 0.2) -> List[Dict[str, object]]:
+        """Top-k examples by IDF-weighted cosine similarity of question tokens."""
+        q_tokens = tokenize_question(question)
+        if not q_tokens or k <= 0:
+            return []
+        self._sync()
+        with self._lock:
+            n_docs = len(self._examples)
+            if not n_docs:
+                return []
+
+            def idf(t: str) -> float:
+                return log(1 + n_docs / (1 + len(self._postings.get(t, ()))))
+
+            if self._norms is None:
+                self._norms = {
+                    ex.id: sqrt(sum(idf(t) ** 2 for t in ex.tokens)) for ex in self._examples.values()
+                }
+            # accumulate dot products over the postings of the question tokens only
+            dots: Dict[int, float] = {}
+            q_norm2 = 0.0
+            for t in q_tokens:
+                w2 = idf(t) ** 2
+                q_norm2 += w2
+                for ex_id in self._postings.get(t, ()):
+                    dots[ex_id] = dots.get(ex_id, 0.0) + w2
+            q_norm = sqrt(q_norm2)
+            scored = []
+            for ex_id, dot in dots.items():
+                d_norm = self._norms.get(ex_id) or 0.0
+                score = dot / (q_norm * d_norm) if q_norm and d_norm else 0.0
+                if score >= min_score:
+                    scored.append((score, self._examples[ex_id]))
+
+        scored.sort(key=lambda x: (-x[0], -x[1].id))
+        out: List[Dict[str, object]] = []
+        seen_sql: Set[str] = set()
+        for score, ex in scored:
+            if ex.sql in seen_sql:
+                continue
+            seen_sql.add(ex.sql)
+            out.append({"question": ex.question, "sql": ex.sql, "tables": ex.tables, "score": round(score, 3)})
+            if len(out) >= k:
+                break
+        return out
+
+    def __len__(self) -> int:
+        self._sync()
+        with self._lock:
+            return len(self._examples)
+
+
+def format_examples(examples: List[Dict[str, object]], max_chars: int = 3000) -> str:
+    """Prompt section body; stops before exceeding max_chars."""
+    blocks: List[str] = []
+    used = 0
+    for ex in examples:
+        block = f"Q: {ex['question']}\nSQL: {ex['sql']}"
+        if used + len(block) > max_chars:
+            break
+        blocks.append(block)
+        used += len(block)
+    return "\n\n".join(blocks)
+
+
+# Simple singleton for easy import everywhere
+example_store = ExampleStore(
+    os.getenv("FEWSHOT_PATH", "./data/fewshot.db"),
+    max_examples=int(os.getenv("FEWSHOT_MAX_EXAMPLES", "2000")),
+)
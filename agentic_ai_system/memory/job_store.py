@@ -0,0 +1,143 @@
+# agentic_ai_system/memory/job_store.py
+from __future__ import annotations
+
+"""
+SQLite (WAL) store of background query jobs (orchestration/jobs.py).
+
+A job row holds the request, its status (queued -> running -> succeeded |
+failed | cancelled) and, once finished, the result (SQL, rows, answer,
+timings). Finished jobs are kept for `ttl_s` and then removed by an
+amortized sweep, so a client can fetch the result long after the run.
+
+- WAL file shared by the workers of one host: any worker answers
+  `GET /query/jobs/{id}`, whichever one runs the job
+- `owner_pid` records the process running the job; a queued / running job
+  whose process is gone is reported as failed (WORKER_LOST)
+- one connection per thread (sqlite3 connections are not shared across threads)
+"""
+
+from threading import local
+from time import time
+from typing import Any, Dict, Optional
+import json
+import os
+import sqlite3
+
+from agentic_ai_system.utils.fast_json import dumps
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT,
+    owner_pid INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_expires_at ON jobs(expires_at);
+"""
+
+ACTIVE = ("queued", "running")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by someone else
+    return True
+
+
+class SqliteJobStore:
+    def __init__(self, path: str, ttl_s: float = 86400.0, sweep_every: int = 100, busy_timeout_ms: int = 5000) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.sweep_every = max(1, sweep_every)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = local()
+        self._creates = 0
+
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    def create(self, job_id: str, request: Dict[str, Any]) -> None:
+        self._conn().execute(
+            "INSERT INTO jobs (job_id, status, request, owner_pid, created_at) VALUES (?, 'queued', ?, ?, ?)",
+            (job_id, dumps(request), os.getpid(), time()),
+        )
+        self._creates += 1
+        if self._creates % self.sweep_every == 0:
+            self.sweep()
+
+    def mark_running(self, job_id: str) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = 'running', started_at = ? WHERE job_id = ? AND status = 'queued'",
+            (time(), job_id),
+        )
+
+    def finish(self, job_id: str, status: str, result: Dict[str, Any]) -> None:
+        now = time()
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, finished_at = ?, expires_at = ? WHERE job_id = ?",
+            (status, dumps(result), now, now + self.ttl_s, job_id),
+        )
+
+    def delete(self, job_id: str) -> None:
+        self._conn().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT job_id, status, request, result, owner_pid, created_at, started_at, finished_at, expires_at "
+            "FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row[0],
+            "status": row[1],
+            "request": json.loads(row[2]),
+            "result": json.loads(row[3]) if row[3] else None,
+            "owner_pid": row[4],
+            "created_at": row[5],
+            "started_at": row[6],
+            "finished_at": row[7],
+            "expires_at": row[8],
+        }
+        if job["expires_at"] is not None and job["expires_at"] < time():
+            return None  # not swept yet
+        if job["status"] in ACTIVE and job["owner_pid"] != os.getpid() and not _pid_alive(job["owner_pid"]):
+            # the worker that took the job died (restart / crash): it will never finish
+            result = {"status": "fail", "error": {"error_code": "WORKER_LOST", "message": "The worker running this job exited", "retryable": True}}
+            self.finish(job_id, "failed", result)
+            return self.get(job_id)
+        return job
+
+    def sweep(self) -> int:
+        """Remove finished jobs past their expiry; returns how many were removed."""
+        cur = self._conn().execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (time(),))
+        return cur.rowcount
+
+
+def create_job_store_from_env() -> SqliteJobStore:
+    return SqliteJobStore(
+        os.getenv("JOB_SQLITE_PATH", "./data/jobs.db"),
+        ttl_s=float(os.getenv("JOB_RESULT_TTL_S", "86400")),
+    )
@@ -0,0 +1,136 @@
+# agentic_ai_system/memory/kv_store.py
+from __future__ import annotations
+
+"""
+Conversation store on top of any Redis-style list server.
+
+The server only needs the handful of list commands below, so a
+`redis.Redis` client works as-is and other servers (KeyDB, Dragonfly,
+Valkey, an in-house cache) only need a thin adapter:
+
+    class ListBackend(Protocol):
+        def rpush(self, key, *values): ...
+        def ltrim(self, key, start, stop): ...
+        def lrange(self, key, start, stop) -> list[bytes | str]: ...
+        def expire(self, key, seconds): ...
+        def delete(self, key): ...
+        def llen(self, key) -> int: ...
+        def get(self, key) -> bytes | str | None: ...
+        def set(self, key, value, ex=None): ...
+
+Each conversation is one list of JSON messages under `<prefix><cid>`:
+append = RPUSH + LTRIM (keep max_messages) + EXPIRE (idle TTL), read =
+LRANGE. The rolling summary is one JSON string under `<summary_prefix><cid>`
+with the same TTL. The conversation count is bounded by the server's eviction policy
+(e.g. maxmemory-policy volatile-lru) together with the per-key TTL.
+"""
+
+from time import time
+from typing import Any, Dict, List, Optional, Protocol
+import json
+
+from agentic_ai_system.memory.store import ConversationStore, Message, Role
+
+
+class ListBackend(Protocol):
+    """Minimal Redis-style list API used by KeyValueConversationStore."""
+
+    def rpush(self, key: str, *values: str) -> Any:
+        ...
+
+    def ltrim(self, key: str, start: int, stop: int) -> Any:
+        ...
+
+    def lrange(self, key: str, start: int, stop: int) -> List[Any]:
+        ...
+
+    def expire(self, key: str, seconds: int) -> Any:
+        ...
+
+    def delete(self, key: str) -> Any:
+        ...
+
+    def llen(self, key: str) -> int:
+        ...
+
+    def get(self, key: str) -> Any:
+        ...
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> Any:
+        ...
+
+
+class KeyValueConversationStore(ConversationStore):
+    def __init__(
+        self,
+        client: ListBackend,
+        max_messages: int = 10,
+        max_chars_per_message: int = 1500,
+        default_conversation_id: str = "default",
+        idle_ttl_s: float = 3600.0,
+        key_prefix: str = "text2sql:conv:",
+        summary_prefix: str = "text2sql:summary:",
+    ) -> None:
+        if max_messages <= 0:
+            raise ValueError("max_messages must be > 0")
+        if max_chars_per_message <= 0:
+            raise ValueError("max_chars_per_message must be > 0")
+
+        self.client = client  # ListBackend or redis.Redis
+        self.max_messages = max_messages
+        self.max_chars_per_message = max_chars_per_message
+        self.default_conversation_id = default_conversation_id
+        self.idle_ttl_s = idle_ttl_s  # <= 0: keys never expire
+        self.key_prefix = key_prefix
+        self.summary_prefix = summary_prefix
+
+    def _key(self, conversation_id: Optional[str]) -> str:
+        return self.key_prefix + self._normalize_cid(conversation_id)
+
+    def get_history(self, conversation_id: Optional[str]) -> List[Message]:
+        """
+        Returns messages oldest->newest.
+        """
+        out: List[Message] = []
+        for raw in self.client.lrange(self._key(conversation_id), -self.max_messages, -1):
+            d = json.loads(raw)
+            out.append(Message(role=d["role"], content=d["content"], ts=d["ts"]))
+        return out
+
+    def append(self, conversation_id: Optional[str], role: Role, content: str) -> None:
+        key = self._key(conversation_id)
+        msg = json.dumps({"role": role, "content": self._trim(content), "ts": time()}, ensure_ascii=False)
+        pipe = self.client.pipeline() if hasattr(self.client, "pipeline") else self.client
+        pipe.rpush(key, msg)
+        pipe.ltrim(key, -self.max_messages, -1)
+        if self.idle_ttl_s > 0:
+            pipe.expire(key, int(self.idle_ttl_s))
+        if pipe is not self.client:
+            pipe.execute()
+
+    def clear(self, conversation_id: Optional[str]) -> None:
+        self.client.delete(self._key(conversation_id))
+        self.client.delete(self.summary_prefix + self._normalize_cid(conversation_id))
+
+    def get_summary(self, conversation_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(self.summary_prefix + self._normalize_cid(conversation_id))
+        return json.loads(raw) if raw else None
+
+    def set_summary(self, conversation_id: Optional[str], summary: Dict[str, Any]) -> None:
+        if not self.size(conversation_id):
+            # only for live conversations, so expired ones do not leave summaries behind
+            return
+        ex = int(self.idle_ttl_s) if self.idle_ttl_s > 0 else None
+        self.client.set(self.summary_prefix + self._normalize_cid(conversation_id), json.dumps(summary, ensure_ascii=False), ex=ex)
+
+    def size(self, conversation_id: Optional[str]) -> int:
+        return int(self.client.llen(self._key(conversation_id)))
+
+    def stats(self) -> Dict[str, Any]:
+        # counting keys would need a SCAN over the keyspace; report config only
+        return {
+            "backend": "kv",
+            "key_prefix": self.key_prefix,
+            "idle_ttl_s": self.idle_ttl_s,
+            "max_messages": self.max_messages,
+        }
@@ -0,0 +1,187 @@
+# agentic_ai_system/memory/result_cache.py
+from __future__ import annotations
+
+"""
+Last result set per conversation, for answering refinements locally.
+
+Follow-ups such as "sort that by province", "only Chiang Mai" or "top 5 of
+those" only reshape the previous answer. When the previous result was
+complete (not cut at SQL_MAX_ROWS), the text-to-SQL prompt offers it as
+table `prev_result`; if the LLM marks its SQL with "refine_previous", the
+pipeline runs it on an in-process SQLite copy of the cached rows instead of
+querying MariaDB. Sampled results are never offered, and a refinement that
+fails locally (e.g. needs a column the cached set does not have) falls
+back to the database on the next attempt.
+
+- the executor's ResultFrame is kept as is (column names once per result,
+  values per column); it is not modified after `put`
+- per process, LRU-bounded by conversation count, with idle expiry;
+  another worker simply has no cached result and queries the database
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from threading import RLock
+from time import monotonic
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+import os
+import sqlite3
+
+import sqlglot
+
+from agentic_ai_system.orchestration.cancellation import CANCELLED_WORK, CancelToken
+from agentic_ai_system.orchestration.result_frame import ResultFrame
+from agentic_ai_system.orchestration.row_stream import ChunkPolicy, RowSink, stream_rows
+
+
+PREV_RESULT_TABLE = "prev_result"
+
+
+def refine_enabled() -> bool:
+    return os.getenv("RESULT_REFINE", "1") != "0"
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    sql: str
+    frame: ResultFrame
+    is_sampled: bool
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return tuple(self.frame.columns)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.frame)
+
+    def preview(self, n: int = 3) -> List[Dict[str, Any]]:
+        return self.frame.records(n)
+
+
+class ResultSetCache:
+    def __init__(self, max_conversations: int = 1000, idle_ttl_s: float = 1800.0) -> None:
+        if max_conversations <= 0:
+            raise ValueError("max_conversations must be > 0")
+        self.max_conversations = max_conversations
+        self.idle_ttl_s = idle_ttl_s  # <= 0 disables idle expiry
+
+        self._lock = RLock()
+        self._data: "OrderedDict[str, Tuple[float, CachedResult]]" = OrderedDict()
+
+    def put(
+        self,
+        conversation_id: str,
+        *,
+        sql: str,
+        frame: ResultFrame,
+        is_sampled: bool,
+    ) -> CachedResult:
+        entry = CachedResult(sql=sql, frame=frame, is_sampled=is_sampled)
+        with self._lock:
+            self._data.pop(conversation_id, None)
+            self._data[conversation_id] = (monotonic(), entry)
+            while len(self._data) > self.max_conversations:
+                self._data.popitem(last=False)
+        return entry
+
+    def get(self, conversation_id: str) -> Optional[CachedResult]:
+        now = monotonic()
+        with self._lock:
+            item = self._data.get(conversation_id)
+            if item is None:
+                return None
+            ts, entry = item
+            if self.idle_ttl_s > 0 and now - ts > self.idle_ttl_s:
+                del self._data[conversation_id]
+                return None
+            self._data.move_to_end(conversation_id)
+            self._data[conversation_id] = (now, entry)
+            return entry
+
+    def clear(self, conversation_id: str) -> None:
+        with self._lock:
+            self._data.pop(conversation_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+def _sqlite_value(v: Any) -> Any:
+    if v is None or isinstance(v, (int, float, str)):  # bool is an int
+        return v
+    if isinstance(v, Decimal):
+        return int(v) if v == v.to_integral_value() else float(v)
+    if isinstance(v, (datetime, date, dt_time)):
+        return v.isoformat()
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", errors="replace")
+    if isinstance(v, UUID):
+        return str(v)
+    return str(v)
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def run_refinement(
+    cached: CachedResult,
+    sql: str,
+    *,
+    policy: Optional[ChunkPolicy] = None,
+    max_rows: int = 200,
+    cancel: Optional[CancelToken] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run a MariaDB-dialect SELECT over `prev_result` on an in-memory SQLite
+    copy of the cached rows; yields chunks like executor_stream._run_sql_stream.
+    A cancelled request interrupts the running SQLite statement.
+    """
+    local_sql = sqlglot.transpile(sql, read="mysql", write="sqlite")[0]
+    policy = policy or ChunkPolicy.from_env()
+
+    def produce(sink: RowSink) -> None:
+        # sqlite3 connections are bound to their thread: created on the worker
+        conn = sqlite3.connect(":memory:")
+
+        def _interrupt(reason: str) -> None:
+            conn.interrupt()  # thread-safe; the running statement raises OperationalError
+            CANCELLED_WORK.inc(kind="refine_interrupt")
+
+        remove_cancel = cancel.on_cancel(_interrupt) if cancel is not None else (lambda: None)
+        try:
+            conn.execute(f"CREATE TABLE {PREV_RESULT_TABLE} ({', '.join(_quote(c) for c in cached.columns)})")
+            if cached.row_count:
+                marks = ", ".join("?" for _ in cached.columns)
+                conn.executemany(
+                    f"INSERT INTO {PREV_RESULT_TABLE} VALUES ({marks})",
+                    ([_sqlite_value(v) for v in r] for r in cached.frame.rows()),
+                )
+            cur = conn.execute(local_sql)
+            sink.columns([d[0] for d in cur.description or []])
+
+            fetched = 0
+            while fetched < max_rows:
+                rows = cur.fetchmany(min(policy.fetch_rows, max_rows - fetched))
+                if not rows:
+                    break
+                fetched += len(rows)
+                if not sink.rows(rows):
+                    break
+        finally:
+            remove_cancel()
+            conn.close()
+
+    return stream_rows(produce, policy, thread_name="refine-stream", cancel=cancel)
+
+
+# Simple singleton for easy import everywhere
+result_cache = ResultSetCache(
+    max_conversations=int(os.getenv("RESULT_CACHE_MAX_CONVERSATIONS", "1000")),
+    idle_ttl_s=float(os.getenv("RESULT_CACHE_IDLE_TTL_S", "1800")),
+)
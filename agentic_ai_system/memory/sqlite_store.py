@@ -0,0 +1,219 @@
+# agentic_ai_system/memory/sqlite_store.py
+from __future__ import annotations
+
+"""
+SQLite (WAL) conversation store shared by every worker process on one host.
+
+- WAL mode: readers never block the writer, so concurrent uvicorn workers
+  can read history while another worker appends
+- one connection per thread (sqlite3 connections are not shared across threads)
+- reads are a single indexed range query (well under 1 ms on a local file)
+- same bounds as InMemoryConversationStore: max_messages per conversation,
+  max_conversations (least recently used evicted) and idle TTL, enforced by
+  an amortized sweep every `sweep_every` appends
+"""
+
+from itertools import count
+from threading import local
+from time import time
+from typing import Any, Dict, List, Optional
+import json
+import os
+import sqlite3
+
+from agentic_ai_system.memory.store import ConversationStore, Message, Role, MEMORY_EVICTIONS
+
+
+_TOUCH_INTERVAL_S = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    cid TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_conversations_last_access ON conversations(last_access);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cid TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_messages_cid_id ON messages(cid, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    cid TEXT PRIMARY KEY,
+    summary TEXT NOT NULL
+);
+"""
+
+
+class SqliteConversationStore(ConversationStore):
+    def __init__(
+        self,
+        path: str,
+        max_messages: int = 10,
+        max_chars_per_message: int = 1500,
+        default_conversation_id: str = "default",
+        max_conversations: int = 10000,
+        idle_ttl_s: float = 3600.0,
+        sweep_every: int = 200,
+        busy_timeout_ms: int = 5000,
+    ) -> None:
+        if max_messages <= 0:
+            raise ValueError("max_messages must be > 0")
+        if max_chars_per_message <= 0:
+            raise ValueError("max_chars_per_message must be > 0")
+        if max_conversations <= 0:
+            raise ValueError("max_conversations must be > 0")
+
+        self.path = path
+        self.max_messages = max_messages
+        self.max_chars_per_message = max_chars_per_message
+        self.default_conversation_id = default_conversation_id
+        self.max_conversations = max_conversations
+        self.idle_ttl_s = idle_ttl_s  # <= 0 disables idle expiry
+        self.sweep_every = max(1, sweep_every)
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._local = local()
+        self._appends = count(1)  # next() is atomic, unlike += from many request threads
+
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit mode; explicit BEGIN IMMEDIATE for multi-statement writes
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    def get_history(self, conversation_id: Optional[str]) -> List[Message]:
+        """
+        Returns messages oldest->newest.
+        """
+        cid = self._normalize_cid(conversation_id)
+        conn = self._conn()
+        row = conn.execute("SELECT last_access FROM conversations WHERE cid = ?", (cid,)).fetchone()
+        if row is None:
+            return []
+        now = time()
+        if self.idle_ttl_s > 0 and now - row[0] > self.idle_ttl_s:
+            self._delete(conn, [cid], "idle_ttl")
+            return []
+        rows = conn.execute(
+            "SELECT role, content, ts FROM messages WHERE cid = ? ORDER BY id DESC LIMIT ?",
+            (cid, self.max_messages),
+        ).fetchall()
+        if now - row[0] > _TOUCH_INTERVAL_S:
+            # reads stay read-only most of the time; LRU order only needs coarse access times
+            conn.execute("UPDATE conversations SET last_access = ? WHERE cid = ?", (now, cid))
+        return [Message(role=r, content=c, ts=t) for r, c, t in reversed(rows)]
+
+    def append(self, conversation_id: Optional[str], role: Role, content: str) -> None:
+        cid = self._normalize_cid(conversation_id)
+        now = time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO conversations (cid, last_access) VALUES (?, ?) "
+                "ON CONFLICT(cid) DO UPDATE SET last_access = excluded.last_access",
+                (cid, now),
+            )
+            conn.execute(
+                "INSERT INTO messages (cid, role, content, ts) VALUES (?, ?, ?, ?)",
+                (cid, role, self._trim(content), time()),
+            )
+            # keep only the newest max_messages for this conversation
+            conn.execute(
+                "DELETE FROM messages WHERE cid = ? AND id <= ("
+                "  SELECT id FROM messages WHERE cid = ? ORDER BY id DESC LIMIT 1 OFFSET ?"
+                ")",
+                (cid, cid, self.max_messages),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        if next(self._appends) % self.sweep_every == 0:
+            self.sweep()
+
+    def _delete(self, conn: sqlite3.Connection, cids: List[str], reason: Optional[str]) -> None:
+        if not cids:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("DELETE FROM messages WHERE cid = ?", [(c,) for c in cids])
+            conn.executemany("DELETE FROM summaries WHERE cid = ?", [(c,) for c in cids])
+            conn.executemany("DELETE FROM conversations WHERE cid = ?", [(c,) for c in cids])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if reason:
+            MEMORY_EVICTIONS.inc(len(cids), reason=reason)
+
+    def sweep(self) -> int:
+        """Expire idle conversations and trim to max_conversations (LRU); returns how many were removed."""
+        conn = self._conn()
+        removed = 0
+        if self.idle_ttl_s > 0:
+            idle = [r[0] for r in conn.execute(
+                "SELECT cid FROM conversations WHERE last_access < ?", (time() - self.idle_ttl_s,)
+            )]
+            self._delete(conn, idle, "idle_ttl")
+            removed += len(idle)
+
+        (count,) = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()
+        if count > self.max_conversations:
+            lru = [r[0] for r in conn.execute(
+                "SELECT cid FROM conversations ORDER BY last_access LIMIT ?", (count - self.max_conversations,)
+            )]
+            self._delete(conn, lru, "lru")
+            removed += len(lru)
+        return removed
+
+    def clear(self, conversation_id: Optional[str]) -> None:
+        self._delete(self._conn(), [self._normalize_cid(conversation_id)], None)
+
+    def size(self, conversation_id: Optional[str]) -> int:
+        cid = self._normalize_cid(conversation_id)
+        (n,) = self._conn().execute("SELECT COUNT(*) FROM messages WHERE cid = ?", (cid,)).fetchone()
+        return int(n)
+
+    def get_summary(self, conversation_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        cid = self._normalize_cid(conversation_id)
+        row = self._conn().execute("SELECT summary FROM summaries WHERE cid = ?", (cid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_summary(self, conversation_id: Optional[str], summary: Dict[str, Any]) -> None:
+        cid = self._normalize_cid(conversation_id)
+        # only for live conversations, so evicted ones do not leave summaries behind
+        self._conn().execute(
+            "INSERT INTO summaries (cid, summary) "
+            "SELECT ?, ? WHERE EXISTS (SELECT 1 FROM conversations WHERE cid = ?) "
+            "ON CONFLICT(cid) DO UPDATE SET summary = excluded.summary",
+            (cid, json.dumps(summary, ensure_ascii=False), cid),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        (conversations,) = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()
+        messages, content_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM messages").fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "conversations": conversations,
+            "messages": messages,
+            "content_bytes": content_bytes,
+            "max_conversations": self.max_conversations,
+            "idle_ttl_s": self.idle_ttl_s,
+        }
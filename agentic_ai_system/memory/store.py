@@ -1,11 +1,24 @@
 # agentic_ai_system/memory/store.py
 from __future__ import annotations
 
+from abc import ABC, abstractmethod
 from dataclasses import dataclass, asdict
-from collections import deque
+from collections import OrderedDict, deque
 from threading import RLock
-from time import time
-from typing import Deque, Dict, List, Literal, Optional
+from time import monotonic, time
+from typing import Any, Deque, Dict, List, Literal, Optional
+import os
+import sys
+
+from agentic_ai_system.orchestration.metrics import registry
+
+
+MEMORY_CONVERSATIONS = registry.gauge(
+    "text2sql_memory_conversations", "Conversations / messages / bytes held by the conversation store."
+)
+MEMORY_EVICTIONS = registry.counter(
+    "text2sql_memory_evictions_total", "Conversations evicted from the store by reason (lru / idle_ttl)."
+)
 
 
 Role = Literal["user", "assistant", "system"]
@@ -21,12 +34,84 @@ class Message:
         return asdict(self)
 
 
-class InMemoryConversationStore:
+class ConversationStore(ABC):
+    """
+    Interface shared by all conversation store backends.
+
+    - get_history(): messages oldest->newest (at most max_messages)
+    - append(): add one message; the oldest is dropped beyond max_messages
+    - get_summary() / set_summary(): rolling summary dict (memory/summary.py),
+      dropped together with the conversation
+    - backends: InMemoryConversationStore (one process),
+      SqliteConversationStore (WAL file shared by processes on one host),
+      KeyValueConversationStore (any Redis-style list server)
+    """
+
+    max_messages: int
+    max_chars_per_message: int
+    default_conversation_id: str
+
+    def _normalize_cid(self, conversation_id: Optional[str]) -> str:
+        cid = (conversation_id or "").strip()
+        return cid if cid else self.default_conversation_id
+
+    def _trim(self, content: str) -> str:
+        content = content or ""
+        if len(content) <= self.max_chars_per_message:
+            return content
+        # keep it simple: hard cut
+        return content[: self.max_chars_per_message]
+
+    @abstractmethod
+    def get_history(self, conversation_id: Optional[str]) -> List[Message]:
+        ...
+
+    def get_history_dicts(self, conversation_id: Optional[str]) -> List[dict]:
+        """
+        Convenience helper if you want JSON-serializable history.
+        """
+        return [m.to_dict() for m in self.get_history(conversation_id)]
+
+    @abstractmethod
+    def append(self, conversation_id: Optional[str], role: Role, content: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self, conversation_id: Optional[str]) -> None:
+        ...
+
+    def size(self, conversation_id: Optional[str]) -> int:
+        return len(self.get_history(conversation_id))
+
+    def get_summary(self, conversation_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        # backends without summaries: the agents fall back to the raw transcript
+        return None
+
+    def set_summary(self, conversation_id: Optional[str], summary: Dict[str, Any]) -> None:
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def _metric_values(self) -> Dict[Any, float]:
+        st = self.stats()
+        return {
+            (("kind", k),): st[k]
+            for k in ("conversations", "messages", "content_bytes")
+            if isinstance(st.get(k), (int, float))
+        }
+
+
+class InMemoryConversationStore(ConversationStore):
     """
     MVP memory store:
     - In-memory only (restart server = memory gone)
     - Per conversation_id keeps last N messages (role/content/timestamp)
     - Thread-safe enough for typical FastAPI usage
+    - Bounded: at most max_conversations (least recently used evicted first)
+      and conversations idle longer than idle_ttl_s expire
+    - Expiry is amortized: each append/get sweeps at most `sweep_batch`
+      idle conversations from the LRU end, so there is no sweeper thread
     """
 
     def __init__(
@@ -34,60 +119,128 @@ class InMemoryConversationStore:
         max_messages: int = 10,
         max_chars_per_message: int = 1500,
         default_conversation_id: str = "default",
+        max_conversations: int = 10000,
+        idle_ttl_s: float = 3600.0,
+        sweep_batch: int = 64,
     ) -> None:
         if max_messages <= 0:
             raise ValueError("max_messages must be > 0")
         if max_chars_per_message <= 0:
             raise ValueError("max_chars_per_message must be > 0")
+        if max_conversations <= 0:
+            raise ValueError("max_conversations must be > 0")
 
         self.max_messages = max_messages
         self.max_chars_per_message = max_chars_per_message
         self.default_conversation_id = default_conversation_id
+        self.max_conversations = max_conversations
+        self.idle_ttl_s = idle_ttl_s  # <= 0 disables idle expiry
+        self.sweep_batch = sweep_batch
 
         self._lock = RLock()
-        self._data: Dict[str, Deque[Message]] = {}
+        # LRU order: oldest access first; values: messages + last access (monotonic)
+        self._data: "OrderedDict[str, Deque[Message]]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._bytes = 0
+        self._messages = 0
+        self._evicted = {"lru": 0, "idle_ttl": 0}
 
-    def _normalize_cid(self, conversation_id: Optional[str]) -> str:
-        cid = (conversation_id or "").strip()
-        return cid if cid else self.default_conversation_id
+    @staticmethod
+    def _msg_bytes(m: Message) -> int:
+        return sys.getsizeof(m.content)
 
-    def _trim(self, content: str) -> str:
-        content = content or ""
-        if len(content) <= self.max_chars_per_message:
-            return content
-        # keep it simple: hard cut
-        return content[: self.max_chars_per_message]
+    def _drop(self, cid: str, reason: Optional[str] = None) -> None:
+        q = self._data.pop(cid, None)
+        self._touched.pop(cid, None)
+        self._summaries.pop(cid, None)
+        if q is None:
+            return
+        self._messages -= len(q)
+        self._bytes -= sum(self._msg_bytes(m) for m in q)
+        if reason:
+            self._evicted[reason] += 1
+            MEMORY_EVICTIONS.inc(reason=reason)
+
+    def _expired(self, cid: str, now: float) -> bool:
+        return self.idle_ttl_s > 0 and now - self._touched.get(cid, now) > self.idle_ttl_s
+
+    def _sweep(self, now: float, limit: int) -> None:
+        # LRU order == last-access order, so idle conversations sit at the front
+        for _ in range(limit):
+            if not self._data:
+                return
+            cid = next(iter(self._data))
+            if not self._expired(cid, now):
+                return
+            self._drop(cid, "idle_ttl")
+
+    def sweep(self) -> int:
+        """Expire every idle conversation now; returns how many were removed."""
+        with self._lock:
+            before = self._evicted["idle_ttl"]
+            self._sweep(monotonic(), len(self._data))
+            return self._evicted["idle_ttl"] - before
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "conversations": len(self._data),
+                "messages": self._messages,
+                "content_bytes": self._bytes,
+                "max_conversations": self.max_conversations,
+                "idle_ttl_s": self.idle_ttl_s,
+                "evicted": dict(self._evicted),
+            }
 
     def get_history(self, conversation_id: Optional[str]) -> List[Message]:
         """
         Returns messages oldest->newest.
         """
         cid = self._normalize_cid(conversation_id)
+        now = monotonic()
         with self._lock:
+            self._sweep(now, self.sweep_batch)
             q = self._data.get(cid)
             if not q:
                 return []
+            if self._expired(cid, now):
+                self._drop(cid, "idle_ttl")
+                return []
+            self._data.move_to_end(cid)
+            self._touched[cid] = now
             return list(q)
 
-    def get_history_dicts(self, conversation_id: Optional[str]) -> List[dict]:
-        """
-        Convenience helper if you want JSON-serializable history.
-        """
-        return [m.to_dict() for m in self.get_history(conversation_id)]
-
     def append(self, conversation_id: Optional[str], role: Role, content: str) -> None:
         cid = self._normalize_cid(conversation_id)
         msg = Message(role=role, content=self._trim(content), ts=time())
 
+        now = monotonic()
         with self._lock:
-            if cid not in self._data:
-                self._data[cid] = deque(maxlen=self.max_messages)
-            self._data[cid].append(msg)
+            self._sweep(now, self.sweep_batch)
+            q = self._data.get(cid)
+            if q is not None and self._expired(cid, now):
+                self._drop(cid, "idle_ttl")
+                q = None
+            if q is None:
+                q = self._data[cid] = deque(maxlen=self.max_messages)
+                while len(self._data) > self.max_conversations:
+                    self._drop(next(iter(self._data)), "lru")
+            else:
+                self._data.move_to_end(cid)
+            if len(q) == q.maxlen:
+                # deque drops the oldest message on append
+                self._messages -= 1
+                self._bytes -= self._msg_bytes(q[0])
+            q.append(msg)
+            self._messages += 1
+            self._bytes += self._msg_bytes(msg)
+            self._touched[cid] = now
 
     def clear(self, conversation_id: Optional[str]) -> None:
         cid = self._normalize_cid(conversation_id)
         with self._lock:
-            self._data.pop(cid, None)
+            self._drop(cid)
 
     def size(self, conversation_id: Optional[str]) -> int:
         cid = self._normalize_cid(conversation_id)
@@ -95,10 +248,50 @@ class InMemoryConversationStore:
             q = self._data.get(cid)
             return len(q) if q else 0
 
+    def get_summary(self, conversation_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        cid = self._normalize_cid(conversation_id)
+        with self._lock:
+            s = self._summaries.get(cid)
+            return dict(s) if s is not None else None
+
+    def set_summary(self, conversation_id: Optional[str], summary: Dict[str, Any]) -> None:
+        cid = self._normalize_cid(conversation_id)
+        with self._lock:
+            # only for live conversations, so evicted ones do not leave summaries behind
+            if cid in self._data:
+                self._summaries[cid] = dict(summary)
+
+
+def create_store_from_env() -> ConversationStore:
+    """
+    MEMORY_BACKEND=memory (default) | sqlite | redis
+    - sqlite: MEMORY_SQLITE_PATH (one WAL file shared by all workers on the host)
+    - redis:  MEMORY_REDIS_URL (needs the `redis` package)
+    """
+    backend = os.getenv("MEMORY_BACKEND", "memory").strip().lower()
+    common = dict(
+        max_messages=10,           # change to 20 if you want 10 turns (user+assistant)
+        max_chars_per_message=1500,
+        default_conversation_id="default",
+        max_conversations=int(os.getenv("MEMORY_MAX_CONVERSATIONS", "10000")),
+        idle_ttl_s=float(os.getenv("MEMORY_IDLE_TTL_S", "3600")),
+    )
+
+    if backend == "sqlite":
+        from agentic_ai_system.memory.sqlite_store import SqliteConversationStore
+        return SqliteConversationStore(os.getenv("MEMORY_SQLITE_PATH", "./data/conversations.db"), **common)
+
+    if backend == "redis":
+        import redis  # optional dependency, only needed for this backend
+        from agentic_ai_system.memory.kv_store import KeyValueConversationStore
+        common.pop("max_conversations")  # bounded by the server's maxmemory policy + per-key TTL
+        return KeyValueConversationStore(redis.Redis.from_url(os.environ["MEMORY_REDIS_URL"]), **common)
+
+    if backend != "memory":
+        raise ValueError(f"Unsupported MEMORY_BACKEND: {backend}")
+    return InMemoryConversationStore(**common)
+
 
 # Simple singleton for easy import everywhere
-store = InMemoryConversationStore(
-    max_messages=10,           # change to 20 if you want 10 turns (user+assistant)
-    max_chars_per_message=1500,
-    default_conversation_id="default",
-)
+store = create_store_from_env()
+MEMORY_CONVERSATIONS.set_function(store._metric_values)
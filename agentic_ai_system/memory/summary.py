@@ -0,0 +1,241 @@
+# agentic_ai_system/memory/summary.py
+from __future__ import annotations
+
+"""
+Rolling per-conversation summary.
+
+Instead of the last 10 raw messages (assistant answers are long markdown
+with tables), the agents get
+
+- a compact summary of the whole conversation: tables, entities (literal
+  values the user filtered on), filters, time ranges, last successful SQL
+- the last turn only (user question + assistant answer without tables)
+
+The summary is extracted from the successful SQL with sqlglot (no LLM call)
+and is updated off the request path by one background thread after each
+answer. A follow-up that arrives before the update finished still sees
+the previous summary plus the raw last turn, so nothing is lost.
+
+CONVERSATION_SUMMARY=0 restores the raw transcript.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from time import time
+from typing import Any, Dict, Iterable, List, Optional
+import os
+import re
+
+import sqlglot
+from sqlglot import exp
+
+from agentic_ai_system.memory.result_cache import PREV_RESULT_TABLE
+from agentic_ai_system.orchestration.metrics import registry
+
+
+SUMMARY_UPDATES = registry.counter(
+    "text2sql_memory_summary_updates_total", "Rolling conversation summary updates by result (ok / error)."
+)
+
+MAX_TABLES = 8
+MAX_ENTITIES = 12
+MAX_FILTERS = 8
+MAX_TIME_RANGES = 6
+MAX_ITEM_CHARS = 160
+MAX_SQL_CHARS = 1200
+MAX_LAST_TURN_CHARS = 500
+
+_TIME_COL = re.compile(r"date|time|year|month|round|_at$", re.IGNORECASE)
+_TIME_FUNC = (exp.Year, exp.Month, exp.Day, exp.TsOrDsToDate, exp.StrToDate, exp.DateTrunc)
+# 2024, 2567 (Buddhist era), 2024-01-31
+_YEAR_IN_TEXT = re.compile(r"(?<!\d)((?:19|20|25)\d{2})(?:-(\d{2})(?:-(\d{2}))?)?(?!\d)")
+
+
+def summary_enabled() -> bool:
+    return os.getenv("CONVERSATION_SUMMARY", "1") != "0"
+
+
+def _clip(s: str, n: int = MAX_ITEM_CHARS) -> str:
+    s = " ".join((s or "").split())
+    return s if len(s) <= n else s[:n] + "…"
+
+
+def _merge(new: Iterable[str], old: Iterable[str], cap: int) -> List[str]:
+    # most recent first, de-duplicated, bounded
+    out: List[str] = []
+    for x in list(new) + list(old or []):
+        if x and x not in out:
+            out.append(x)
+        if len(out) >= cap:
+            break
+    return out
+
+
+def _conjuncts(node: Optional[exp.Expression]) -> List[exp.Expression]:
+    if node is None:
+        return []
+    if isinstance(node, exp.And):
+        return list(node.flatten())
+    return [node]
+
+
+def _is_time_predicate(pred: exp.Expression) -> bool:
+    if any(True for _ in pred.find_all(*_TIME_FUNC)):
+        return True
+    return any(_TIME_COL.search(c.name or "") for c in pred.find_all(exp.Column))
+
+
+def extract_sql_facts(sql: str) -> Dict[str, List[str]]:
+    """Tables, literal entities, filters and time-range predicates of one SELECT."""
+    facts: Dict[str, List[str]] = {"tables": [], "entities": [], "filters": [], "time_ranges": []}
+    try:
+        tree = sqlglot.parse_one(sql, dialect="mysql")
+    except Exception:
+        return facts
+    if tree is None:
+        return facts
+
+    # refinements of the cached result (memory/result_cache.py) keep the earlier tables
+    skip = {c.alias_or_name for c in tree.find_all(exp.CTE)} | {PREV_RESULT_TABLE}
+    for t in tree.find_all(exp.Table):
+        if t.name and t.name not in skip and t.name not in facts["tables"]:
+            facts["tables"].append(t.name)
+
+    preds: List[exp.Expression] = []
+    for clause in list(tree.find_all(exp.Where)) + list(tree.find_all(exp.Having)):
+        preds.extend(_conjuncts(clause.this))
+
+    for p in preds:
+        text = _clip(p.sql(dialect="mysql"))
+        if _is_time_predicate(p):
+            facts["time_ranges"].append(text)
+        else:
+            facts["filters"].append(text)
+        for lit in p.find_all(exp.Literal):
+            if lit.is_string:
+                v = _clip(str(lit.this).strip("%"), 80)
+                if v and not _YEAR_IN_TEXT.fullmatch(v) and v not in facts["entities"]:
+                    facts["entities"].append(v)
+    return facts
+
+
+def build_summary(
+    prev: Optional[Dict[str, Any]],
+    *,
+    question: str,
+    sql: str,
+    columns: Optional[List[str]] = None,
+    row_count: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Fold one successful turn into the previous summary (pure function)."""
+    prev = prev or {}
+    facts = extract_sql_facts(sql) if sql else {"tables": [], "entities": [], "filters": [], "time_ranges": []}
+    years = [m.group(0) for m in _YEAR_IN_TEXT.finditer(question or "")]
+
+    return {
+        "turns": int(prev.get("turns") or 0) + 1,
+        "tables": _merge(facts["tables"], prev.get("tables"), MAX_TABLES),
+        "entities": _merge(facts["entities"], prev.get("entities"), MAX_ENTITIES),
+        "filters": _merge(facts["filters"], prev.get("filters"), MAX_FILTERS),
+        "time_ranges": _merge(facts["time_ranges"] + years, prev.get("time_ranges"), MAX_TIME_RANGES),
+        "last_question": _clip(question, 300),
+        "last_sql": (sql or "").strip()[:MAX_SQL_CHARS] or prev.get("last_sql", ""),
+        "last_columns": list(columns or [])[:20],
+        "last_row_count": row_count,
+        "updated_at": time(),
+    }
+
+
+def format_summary(summary: Optional[Dict[str, Any]]) -> str:
+    """Plain-text rendering for prompts; empty string when there is nothing to say."""
+    if not summary:
+        return ""
+    lines = [f"- Turns so far: {summary.get('turns', 0)}"]
+    for key, label in (
+        ("tables", "Tables used"),
+        ("entities", "Entities / values"),
+        ("filters", "Filters (recent first)"),
+        ("time_ranges", "Time ranges (recent first)"),
+        ("last_columns", "Last result columns"),
+    ):
+        vals = summary.get(key) or []
+        if vals:
+            lines.append(f"- {label}: " + "; ".join(str(v) for v in vals))
+    if summary.get("last_row_count") is not None:
+        lines.append(f"- Last result rows: {summary['last_row_count']}")
+    if summary.get("last_sql"):
+        lines.append(f"- Last successful SQL: {summary['last_sql']}")
+    return "\n".join(lines)
+
+
+def _clip_block(s: str, n: int) -> str:
+    s = (s or "").strip()
+    return s if len(s) <= n else s[:n] + "…"
+
+
+def _strip_tables(text: str) -> str:
+    kept = [ln for ln in (text or "").splitlines() if not ln.lstrip().startswith("|")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+
+
+def last_turn(history: Any) -> List[dict]:
+    """The last user message and the answer after it, markdown tables removed."""
+    if not history or not isinstance(history, list):
+        return []
+    msgs = [m for m in history if isinstance(m, dict)]
+    start = max((i for i, m in enumerate(msgs) if m.get("role") == "user"), default=len(msgs) - 1)
+    out: List[dict] = []
+    for m in msgs[max(0, start):]:
+        content = m.get("content") or ""
+        if m.get("role") == "assistant":
+            content = _strip_tables(content)
+        out.append({"role": m.get("role") or "user", "content": _clip_block(content, MAX_LAST_TURN_CHARS)})
+    return out
+
+
+def update_summary(conv_store: Any, conversation_id: str, **turn: Any) -> Dict[str, Any]:
+    summary = build_summary(conv_store.get_summary(conversation_id), **turn)
+    conv_store.set_summary(conversation_id, summary)
+    return summary
+
+
+class SummaryUpdater:
+    """
+    Applies summary updates on one background thread.
+
+    One worker keeps updates of the same conversation in order (no lost
+    read-modify-write within a process) and keeps the work off the SSE
+    request path.
+    """
+
+    def __init__(self) -> None:
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conv-summary")
+            return self._pool
+
+    def submit(self, conv_store: Any, conversation_id: str, **turn: Any) -> Future:
+        return self._executor().submit(self._run, conv_store, conversation_id, turn)
+
+    @staticmethod
+    def _run(conv_store: Any, conversation_id: str, turn: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            summary = update_summary(conv_store, conversation_id, **turn)
+        except Exception:
+            # a missing summary only means the next prompt falls back to the last turn
+            SUMMARY_UPDATES.inc(result="error")
+            return None
+        SUMMARY_UPDATES.inc(result="ok")
+        return summary
+
+    def flush(self) -> None:
+        """Wait for queued updates (benchmarks / shutdown)."""
+        if self._pool is not None:
+            self._pool.submit(lambda: None).result()
+
+
+summary_updater = SummaryUpdater()
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+"""
+Batch questions with bounded parallelism.
+
+Daily reports ask 30-50 questions; one /query/stream call per question,
+run one after another by a script, takes as long as all of them added up.
+`POST /query/batch` runs them through the same pipeline in parallel:
+
+- BATCH_CONCURRENCY questions in flight; inside them at most
+  BATCH_LLM_CONCURRENCY LLM calls and BATCH_DB_CONCURRENCY database
+  executions at a time (orchestration/limits.py), so a batch does not
+  flood the provider or MariaDB; a request may lower each bound
+- agents (LLM clients, knowledge files) are built once per batch and the
+  schema snapshot is loaded before the first question, so concurrent
+  questions do not all miss the schema cache together
+- one NDJSON line per question as it completes (`"type": "result"`, with
+  its index in the request), then a `"type": "summary"` line
+- the client going away cancels every question still running
+
+    batch = BatchRun(questions, provider=..., model=...).start()
+    while (line := batch.next()) is not None: ...
+    batch.close()
+"""
+
+from queue import Queue
+from threading import Lock, Thread
+from time import monotonic
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import uuid
+
+from agentic_ai_system.orchestration.cancellation import CancelToken
+from agentic_ai_system.orchestration.executor_stream import PipelineAgents, stream_sse_pipeline
+from agentic_ai_system.orchestration.limits import ConcurrencyLimit
+from agentic_ai_system.orchestration.metrics import registry
+from agentic_ai_system.orchestration.outcome import PipelineOutcome, parse_sse_event
+from agentic_ai_system.utils.fast_json import dumps_bytes
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_QUESTIONS = registry.counter(
+    "text2sql_batch_questions_total", "Questions run by /query/batch, by result status (success / fail / cancelled)."
+)
+BATCH_SECONDS = registry.histogram(
+    "text2sql_batch_duration_seconds",
+    "Wall time of whole batches.",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800),
+)
+
+
+def batch_limits(
+    concurrency: Optional[int] = None,
+    llm_concurrency: Optional[int] = None,
+    db_concurrency: Optional[int] = None,
+) -> Dict[str, int]:
+    """Bounds for one batch: the env values are the defaults and the caps; a request may only lower them."""
+    def bound(asked: Optional[int], env: str, default: str) -> int:
+        cap = max(1, int(os.getenv(env, default)))
+        return min(cap, asked) if asked and asked > 0 else cap
+
+    return {
+        "concurrency": bound(concurrency, "BATCH_CONCURRENCY", "4"),
+        "llm_concurrency": bound(llm_concurrency, "BATCH_LLM_CONCURRENCY", "4"),
+        "db_concurrency": bound(db_concurrency, "BATCH_DB_CONCURRENCY", "2"),
+    }
+
+
+def max_batch_questions() -> int:
+    return int(os.getenv("BATCH_MAX_QUESTIONS", "100"))
+
+
+class BatchRun:
+    def __init__(
+        self,
+        questions: List[Dict[str, Any]],
+        *,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        deadline_ms: Optional[int] = None,
+        route_models: bool = False,
+        concurrency: int = 4,
+        llm_concurrency: int = 4,
+        db_concurrency: int = 2,
+    ) -> None:
+        self.batch_id = str(uuid.uuid4())
+        self.questions = questions
+        self.provider = provider
+        self.model = model
+        self.deadline_ms = deadline_ms
+        self.route_models = route_models
+        self.concurrency = max(1, min(concurrency, len(questions) or 1))
+        self.cancel = CancelToken()
+        self._llm_limit = ConcurrencyLimit("batch_llm", llm_concurrency)
+        self._db_limit = ConcurrencyLimit("batch_db", db_concurrency)
+        self._agents: Optional[PipelineAgents] = None
+        self._lines: "Queue[Optional[bytes]]" = Queue()
+        self._lock = Lock()
+        self._next_index = 0
+        self._workers_left = self.concurrency
+        self._counts = {"success": 0, "fail": 0, "cancelled": 0}
+        self._usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+        self._t0 = monotonic()
+        self.finished = False
+
+    def start(self) -> "BatchRun":
+        Thread(target=self._prepare, name="batch-prepare", daemon=True).start()
+        return self
+
+    def _prepare(self) -> None:
+        try:
+            self._agents = PipelineAgents.build(self.provider, self.model)
+            # one schema read for the whole batch (process-wide snapshot cache, SCHEMA_CACHE_TTL_S)
+            self._agents.text_to_sql.schema_retriever.snapshot()
+        except Exception:
+            # each question then builds its own agents and reports the error itself
+            logger.exception("batch %s: shared agents / schema warm-up failed", self.batch_id)
+            self._agents = None
+        for i in range(self.concurrency):
+            Thread(target=self._work, name=f"batch-q-{i}", daemon=True).start()
+
+    def _take(self) -> Optional[int]:
+        with self._lock:
+            if self._next_index >= len(self.questions) or self.cancel.cancelled:
+                return None
+            i = self._next_index
+            self._next_index += 1
+            return i
+
+    def _work(self) -> None:
+        try:
+            while (i := self._take()) is not None:
+                self._lines.put(dumps_bytes(self._run_one(i)) + b"\n")
+        finally:
+            with self._lock:
+                self._workers_left -= 1
+                last = self._workers_left == 0
+            if last:
+                self._lines.put(dumps_bytes(self._summary()) + b"\n")
+                self._lines.put(None)
+
+    def _run_one(self, index: int) -> Dict[str, Any]:
+        q = self.questions[index]
+        trace_id = str(uuid.uuid4())
+        outcome = PipelineOutcome()
+        t0 = monotonic()
+        try:
+            for chunk in stream_sse_pipeline(
+                user_prompt=q["user_prompt"],
+                conversation_id=q.get("conversation_id"),
+                provider=self.provider,
+                model=self.model,
+                deadline_ms=q.get("deadline_ms") or self.deadline_ms,
+                row_format="columnar",
+                cancel=self.cancel,
+                trace_id=trace_id,
+                agents=self._agents,
+                llm_limit=self._llm_limit,
+                db_limit=self._db_limit,
+                llm_priority="batch",
+                route_models=self.route_models,
+            ):
+                parsed = parse_sse_event(chunk)
+                if parsed is not None:
+                    outcome.feed(*parsed)
+            result = outcome.result()
+        except Exception as e:
+            logger.exception("batch %s: question %d failed", self.batch_id, index)
+            result = outcome.result()
+            result["error"] = {"error_code": "INTERNAL_SERVER_ERROR", "message": str(e), "retryable": False}
+
+        status = "cancelled" if self.cancel.cancelled and outcome.status is None else result["status"]
+        BATCH_QUESTIONS.inc(status=status)
+        total = (result.get("usage") or {}).get("total") or {}
+        with self._lock:
+            self._counts[status] = self._counts.get(status, 0) + 1
+            for k in self._usage:
+                self._usage[k] += total.get(k) or 0
+        return {
+            "type": "result",
+            "index": index,
+            "trace_id": trace_id,
+            "user_prompt": q["user_prompt"],
+            "elapsed_ms": int((monotonic() - t0) * 1000),
+            **result,
+            "status": status,
+        }
+
+    def _summary(self) -> Dict[str, Any]:
+        elapsed = monotonic() - self._t0
+        BATCH_SECONDS.observe(elapsed)
+        self.finished = True
+        with self._lock:
+            return {
+                "type": "summary",
+                "batch_id": self.batch_id,
+                "questions": len(self.questions),
+                "succeeded": self._counts.get("success", 0),
+                "failed": self._counts.get("fail", 0),
+                "cancelled": self._counts.get("cancelled", 0),
+                "not_run": len(self.questions) - sum(self._counts.values()),
+                "elapsed_ms": int(elapsed * 1000),
+                "usage": {**self._usage, "cost_usd": round(self._usage["cost_usd"], 8)},
+            }
+
+    def next(self, timeout_s: Optional[float] = None) -> Optional[bytes]:
+        """Next NDJSON line (one question / the summary); None once the batch is over."""
+        return self._lines.get(timeout=timeout_s)
+
+    def close(self) -> None:
+        """Response ended: questions still running are cancelled (no-op after the summary)."""
+        if not self.finished:
+            self.cancel.cancel("client_disconnect")
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+"""
+Request cancellation (client disconnect).
+
+When the browser tab closes, the SSE generator used to keep running: the
+pipeline step blocked in the threadpool (an LLM call, a MariaDB query)
+finished first, and only then did anyone notice that nobody was
+listening. Now one CancelToken per request is cancelled as soon as
+Starlette sees the disconnect (main.py), and the blocking work reacts:
+
+- invoke_llm stops waiting and cancels the provider call (the async
+  client closes the HTTP request; see LLM_ASYNC_CANCEL)
+- a running MariaDB statement gets `KILL QUERY <connection_id>` over a
+  separate pooled connection, so its own connection returns to the pool
+- row streaming stops fetching; a local prev_result refinement is
+  interrupted
+- the pipeline raises RequestCancelled, counted as abandoned per stage
+
+    cancel = CancelToken()
+    remove = cancel.on_cancel(lambda reason: ...)   # runs on the cancelling thread
+    ...
+    remove()                                          # work finished, nothing to cancel
+    cancel.check("text_to_sql")                       # raises RequestCancelled once cancelled
+"""
+
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+from agentic_ai_system.orchestration.metrics import registry
+
+
+ABANDONED = registry.counter(
+    "text2sql_requests_abandoned_total",
+    "Requests whose client disconnected before the done event, by the stage that was cancelled.",
+)
+CANCELLED_WORK = registry.counter(
+    "text2sql_cancelled_work_total",
+    "Work stopped for abandoned requests (llm_call / llm_call_abandoned / sql_kill / sql_kill_failed / refine_interrupt).",
+)
+
+
+class RequestCancelled(BaseException):
+    """
+    The client of this request went away. A BaseException (like
+    asyncio.CancelledError), so the `except Exception` blocks around SQL
+    errors and agent failures do not turn it into a retry or an error event.
+    """
+
+    def __init__(self, stage: str = "", reason: str = "") -> None:
+        self.stage = stage
+        self.reason = reason
+        super().__init__(f"Request cancelled during {stage or 'stream'} ({reason or 'cancelled'})")
+
+
+class CancelToken:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._callbacks: Dict[int, Callable[[str], None]] = {}
+        self._next_id = 0
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel once and run the registered callbacks; False when already cancelled."""
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for fn in callbacks:
+            try:
+                fn(reason)
+            except Exception:
+                pass  # best effort: one failing hook must not stop the others
+        return True
+
+    def on_cancel(self, fn: Callable[[str], None]) -> Callable[[], None]:
+        """Register fn(reason); runs at once when already cancelled. Returns a remover."""
+        with self._lock:
+            if self.reason is None:
+                key = self._next_id
+                self._next_id += 1
+                self._callbacks[key] = fn
+                return lambda: self._callbacks.pop(key, None)
+            reason = self.reason
+        fn(reason)
+        return lambda: None
+
+    def check(self, stage: str) -> None:
+        if self.reason is not None:
+            raise RequestCancelled(stage, self.reason)
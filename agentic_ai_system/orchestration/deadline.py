@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+"""
+Per-request time budget.
+
+One Deadline is created per pipeline run and handed to every stage
+(domain guard, text-to-SQL, SQL execution, composer). Each stage asks how
+much time is left before starting expensive work:
+
+    deadline = Deadline.from_env(override_ms=q.deadline_ms)
+    if not deadline.has_budget(deadline.min_llm_ms):
+        deadline.exhaust("text_to_sql")
+        ...
+
+The first stage that runs out of budget is remembered in
+`exhausted_stage` so the final `done` event can report it.
+"""
+
+from typing import Any, Dict, Optional
+import os
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage cannot finish inside the remaining request budget."""
+
+    def __init__(self, stage: str, message: str = "") -> None:
+        self.stage = stage
+        super().__init__(message or f"Request deadline exceeded during {stage}")
+
+
+class Deadline:
+    """
+    Monotonic deadline for one request.
+    - budget_ms: total budget for the request
+    - min_llm_ms / min_sql_ms: do not start an LLM call / query with less than this left
+    """
+
+    def __init__(
+        self,
+        budget_ms: int,
+        *,
+        min_llm_ms: int = 1500,
+        min_sql_ms: int = 300,
+    ) -> None:
+        if budget_ms <= 0:
+            raise ValueError("budget_ms must be > 0")
+
+        self.budget_ms = int(budget_ms)
+        self.min_llm_ms = int(min_llm_ms)
+        self.min_sql_ms = int(min_sql_ms)
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + self.budget_ms / 1000
+        self.exhausted_stage: Optional[str] = None
+
+    @classmethod
+    def from_env(
+        cls,
+        override_ms: Optional[int] = None,
+        *,
+        default_ms: Optional[int] = None,
+        cap_ms: Optional[int] = None,
+    ) -> "Deadline":
+        """default_ms / cap_ms replace REQUEST_DEADLINE_MS / REQUEST_DEADLINE_MAX_MS (background jobs)."""
+        if not default_ms:
+            default_ms = int(os.getenv("REQUEST_DEADLINE_MS", "60000"))
+        budget_ms = override_ms if override_ms and override_ms > 0 else default_ms
+        # never allow a client to ask for more than the server-side cap
+        if not cap_ms:
+            cap_ms = int(os.getenv("REQUEST_DEADLINE_MAX_MS", "180000"))
+        return cls(
+            min(int(budget_ms), cap_ms),
+            min_llm_ms=int(os.getenv("DEADLINE_MIN_LLM_MS", "1500")),
+            min_sql_ms=int(os.getenv("DEADLINE_MIN_SQL_MS", "300")),
+        )
+
+    def elapsed_ms(self) -> int:
+        return int((time.monotonic() - self.started_at) * 1000)
+
+    def remaining_s(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def remaining_ms(self) -> int:
+        return int(self.remaining_s() * 1000)
+
+    def expired(self) -> bool:
+        return self.remaining_s() <= 0
+
+    def has_budget(self, min_ms: int) -> bool:
+        return self.remaining_ms() >= min_ms
+
+    def clamp_ms(self, timeout_ms: int) -> int:
+        """Clamp a per-stage timeout so it never outlives the request."""
+        return max(0, min(int(timeout_ms), self.remaining_ms()))
+
+    def exhaust(self, stage: str) -> None:
+        # keep the first stage that ran out; later stages only inherit the shortage
+        if self.exhausted_stage is None:
+            self.exhausted_stage = stage
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "budget_ms": self.budget_ms,
+            "elapsed_ms": self.elapsed_ms(),
+            "remaining_ms": self.remaining_ms(),
+            "exhausted_stage": self.exhausted_stage,
+        }
@@ -26,32 +26,73 @@ Typical usage (in main.py):
 Events emitted:
 - step:    {"stage": "...", "message": "...", ...}
 - sql:     {"sql": "...", "params": {...}}
-- rows:    {"columns": [...], "rows": [...], "chunk_index": n, "row_count": k}
+- rows:    {"columns": [...], "rows": [{column: value}, ...], "chunk_index": n, "row_count": k, "flush_reason": "..."}
+           with row_format="columnar" (request field or SSE_ROW_FORMAT):
+           {"columns": [...], "types": [...], "data": [[value, ...], ...], "chunk_index": n, "row_count": k}
 - answer:  {"markdown": "..."}
 - error:   {"error_code": "...", "message": "...", "retryable": bool}
-- done:    {"trace_id": "...", "status": "success"|"fail"}
+- `: heartbeat` SSE comment lines while a query runs without producing rows (SSE_HEARTBEAT_MS)
+- done:    {"trace_id": "...", "status": "success"|"fail", "deadline": {..., "exhausted_stage": ...},
+            "timings_ms": {"domain_guard": ..., "text_to_sql": ..., ..., "request_total": ...},
+            "usage": {"total": {tokens, cost_usd, ...}, "by_stage": {...}},
+            "model_route": {"route": "fast"|"strong", "reason": ..., "score": n, ..., "escalated": bool}}
+           (model_route only for routed requests, orchestration/model_router.py)
+
+Prometheus metrics for the same stages are exposed via orchestration.metrics.
+
+Pass a CancelToken (orchestration/cancellation.py) and cancel it when the
+client disconnects: in-flight LLM calls are cancelled, a running MariaDB
+statement is killed and the generator ends without further events.
 """
 
+from contextlib import nullcontext
+from dataclasses import dataclass
 from typing import Dict, Any, Iterator, List, Optional
 import os
-import json
 import time
 import uuid
+import threading
 
-from decimal import Decimal
-from datetime import date, datetime
-from uuid import UUID
 from sqlalchemy import create_engine, text as sql_text
 
 from agentic_ai_system.agents.text_to_sql.agent import TextToSQLAgent
 from agentic_ai_system.agents.composer.agent import ComposerAgent
-from agentic_ai_system.validators.sql_hygiene import validate_sql
+from agentic_ai_system.validators.sql_hygiene import validate_sql, sql_fingerprint
 from agentic_ai_system.validators.domain_guard import check_in_domain
 # from agentic_ai_system.validators.llm_domain_guard import check_in_domain
 from agentic_ai_system.memory.store import store
+from agentic_ai_system.memory.summary import summary_enabled, summary_updater
+from agentic_ai_system.memory.result_cache import refine_enabled, result_cache, run_refinement
+from agentic_ai_system.memory.examples import example_store, fewshot_enabled
+from agentic_ai_system.orchestration.cancellation import (
+    ABANDONED,
+    CANCELLED_WORK,
+    CancelToken,
+    RequestCancelled,
+)
+from agentic_ai_system.orchestration.deadline import Deadline, DeadlineExceeded
+from agentic_ai_system.orchestration.model_router import model_router
+from agentic_ai_system.orchestration.limits import ConcurrencyLimit
+from agentic_ai_system.orchestration.metrics import (
+    DB_POOL,
+    ERRORS,
+    INFLIGHT_STREAMS,
+    REQUESTS,
+    RETRIES,
+    StageTimings,
+)
+from agentic_ai_system.orchestration.usage import RequestUsage
+from agentic_ai_system.orchestration.result_frame import ROW_FORMATS, ResultFrame
+from agentic_ai_system.orchestration.result_stats import compute_result_stats
+from agentic_ai_system.orchestration.row_stream import ChunkPolicy, RowSink, stream_rows
+from agentic_ai_system.orchestration.tracing import Span, tracer
+from agentic_ai_system.utils.fast_json import dumps_bytes, to_jsonable
 
 
 def _db_url() -> str:
+    # DATABASE_URL (if set) wins, e.g. sqlite:///bench.db for the local benchmark stand-in
+    if os.getenv("DATABASE_URL"):
+        return os.environ["DATABASE_URL"]
     return (
         f"mysql+pymysql://{os.getenv('DB_USER','app')}:"
         f"{os.getenv('DB_PASSWORD','app_pw')}@"
@@ -61,17 +102,162 @@ def _db_url() -> str:
     )
 
 
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def _pool_stats() -> Dict[Any, float]:
+    if _ENGINE is None:
+        return {}
+    pool = _ENGINE.pool
+    checked_out = pool.checkedout() if hasattr(pool, "checkedout") else 0
+    idle = pool.checkedin() if hasattr(pool, "checkedin") else 0
+    size = pool.size() if hasattr(pool, "size") else 0
+    return {
+        (("state", "checked_out"),): checked_out,
+        (("state", "idle"),): idle,
+        (("state", "size"),): size,
+    }
+
+
+def _get_engine():
+    """
+    One pooled engine per process (instead of one engine per query), so
+    connections are reused and pool usage can be reported in metrics.
+    """
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            _ENGINE = create_engine(
+                _db_url(),
+                pool_pre_ping=True,
+                pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+                max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+            )
+            DB_POOL.set_function(_pool_stats)
+        return _ENGINE
+
+
 def _sse(event: str, data: Any) -> bytes:
-    return (
-        f"event: {event}\n"
-        f"data: {json.dumps(data, ensure_ascii=False, default=_json_default)}\n\n"
-    ).encode("utf-8")
+    if event == "error" and isinstance(data, dict):
+        ERRORS.inc(error_code=str(data.get("error_code") or "UNKNOWN"))
+    # one encoding pass straight to UTF-8 bytes (Decimal/datetime/UUID handled by the encoder)
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps_bytes(data) + b"\n\n"
+
+
+def _sse_heartbeat(elapsed_ms: int) -> bytes:
+    # comment line: ignored by EventSource / our parsers, keeps proxies from idling the stream out
+    return f": heartbeat elapsed_ms={elapsed_ms}\n\n".encode("utf-8")
 
 
 def _safe_err(code: str, message: str, retryable: bool = False) -> Dict[str, Any]:
     return {"error_code": code, "message": message, "retryable": retryable}
 
 
+@dataclass
+class PipelineAgents:
+    """Agents built once and shared by many runs (a batch): no per-question LLM client / knowledge file loading."""
+
+    text_to_sql: TextToSQLAgent
+    composer: ComposerAgent
+
+    @classmethod
+    def build(cls, provider: Optional[str] = None, model: Optional[str] = None) -> "PipelineAgents":
+        return cls(TextToSQLAgent(provider=provider, model=model), ComposerAgent(provider=provider, model=model))
+
+
+class _RequestState:
+    """Per-request objects shared by the pipeline helpers (one per stream_sse_pipeline call)."""
+
+    def __init__(
+        self,
+        trace_id: str,
+        conversation_id: str,
+        *,
+        deadline: Deadline,
+        timings: StageTimings,
+        root_span: Span,
+        row_format: str = "records",
+        cancel: Optional[CancelToken] = None,
+        statement_timeout_ms: Optional[int] = None,
+        agents: Optional[PipelineAgents] = None,
+        llm_limit: Optional[ConcurrencyLimit] = None,
+        db_limit: Optional[ConcurrencyLimit] = None,
+        llm_priority: str = "interactive",
+        route_models: bool = False,
+    ) -> None:
+        self.trace_id = trace_id
+        self.conversation_id = conversation_id
+        self.deadline = deadline
+        self.timings = timings
+        self.row_format = row_format
+        self.cancel = cancel or CancelToken()
+        self.statement_timeout_ms = statement_timeout_ms
+        self.agents = agents
+        self.llm_limit = llm_limit
+        self.db_limit = db_limit
+        self.llm_priority = llm_priority
+        self.route_models = route_models
+        self.model_routes: List[Dict[str, Any]] = []  # one per text-to-SQL LLM call
+        self.status: Optional[str] = None
+        self.usage = RequestUsage(trace_id, conversation_id)
+        self.root_span = root_span
+        self.attempt_span: Optional[Span] = None
+
+
+def _model_route(state: _RequestState) -> Dict[str, Any]:
+    first = state.model_routes[0]
+    return {**first, "escalated": first["route"] == "fast" and any(r["route"] == "strong" for r in state.model_routes)}
+
+
+def _done(state: _RequestState, status: str, *, attempt: Optional[int] = None) -> bytes:
+    state.status = status
+    if state.timings.finish():
+        REQUESTS.inc(status=status)
+    state.root_span.set_attribute("pipeline.status", status)
+    if state.deadline.exhausted_stage:
+        state.root_span.set_attribute("deadline.exhausted_stage", state.deadline.exhausted_stage)
+
+    payload: Dict[str, Any] = {"trace_id": state.trace_id}
+    if attempt is not None:
+        payload["attempt"] = attempt
+    payload.update(
+        {
+            "status": status,
+            "deadline": state.deadline.report(),
+            "timings_ms": state.timings.as_dict(),
+            "usage": state.usage.summary(),
+        }
+    )
+    if state.model_routes:
+        payload["model_route"] = _model_route(state)
+    return _sse("done", payload)
+
+
+def _deadline_exhausted(state: _RequestState, attempt: int, stage: str) -> Iterator[bytes]:
+    state.deadline.exhaust(stage)
+    yield _sse(
+        "error",
+        {
+            "trace_id": state.trace_id,
+            "attempt": attempt,
+            **_safe_err("DEADLINE_EXCEEDED", f"Request time budget exhausted during {state.deadline.exhausted_stage}", retryable=True),
+        },
+    )
+    yield _done(state, "fail", attempt=attempt)
+
+
+def _rows_event(state: _RequestState, attempt: int, chunk: Dict[str, Any], frame: ResultFrame) -> Dict[str, Any]:
+    meta = {k: chunk[k] for k in ("chunk_index", "row_count", "rows_sent_total", "elapsed_ms", "flush_reason")}
+    if state.row_format == "columnar":
+        # row tuples are encoded as arrays as they are; column names / types once per chunk
+        return {"trace_id": state.trace_id, "attempt": attempt, "columns": frame.columns,
+                "types": frame.types, "data": chunk["rows"], **meta}
+    cols = frame.columns
+    return {"trace_id": state.trace_id, "attempt": attempt, "columns": cols,
+            "rows": [dict(zip(cols, r)) for r in chunk["rows"]], **meta}
+
+
 def _classify_sql_error(e: Exception) -> tuple[str, str, bool]:
     """
     Best-effort classification for retry logic.
@@ -139,94 +325,236 @@ def _classify_sql_error(e: Exception) -> tuple[str, str, bool]:
     return ("SQL_EXECUTION_FAILED", msg, True)
 
 
+class _QueryKiller:
+    """
+    `KILL QUERY <connection_id>` for the statement of a cancelled request,
+    sent over a separate pooled connection (the query's own connection is
+    blocked in execute / fetch). close() runs before the connection goes
+    back to the pool and waits for a kill in progress, so a late kill can
+    never hit the next statement on that connection.
+    """
+
+    def __init__(self, engine, conn, cancel: CancelToken) -> None:
+        self._engine = engine
+        self._lock = threading.Lock()
+        self._active = True
+        dbapi_conn = conn.connection.dbapi_connection
+        # PyMySQL / mysqlclient know the server thread id from the handshake: no round-trip
+        thread_id = getattr(dbapi_conn, "thread_id", None)
+        self.connection_id = int(thread_id() if callable(thread_id) else conn.execute(sql_text("SELECT CONNECTION_ID()")).scalar())
+        self._remove = cancel.on_cancel(self._on_cancel)
+
+    def _on_cancel(self, reason: str) -> None:
+        # the token is cancelled on the event loop thread: never block it on the database
+        threading.Thread(target=self._kill, name="sql-kill", daemon=True).start()
+
+    def _kill(self) -> None:
+        with self._lock:
+            if not self._active:
+                return
+            try:
+                with self._engine.connect() as kconn:
+                    kconn.execute(sql_text(f"KILL QUERY {self.connection_id}"))
+                CANCELLED_WORK.inc(kind="sql_kill")
+            except Exception:
+                CANCELLED_WORK.inc(kind="sql_kill_failed")
+
+    def close(self) -> None:
+        self._remove()
+        with self._lock:
+            self._active = False
+
+
 def _run_sql_stream(
     sql: str,
     params: Optional[Dict[str, Any]] = None,
     *,
-    chunk_size: int = 50,
+    policy: Optional[ChunkPolicy] = None,
     max_rows: int = 200,
     timeout_ms: int = 5000,
+    trace_id: Optional[str] = None,
+    cancel: Optional[CancelToken] = None,
+    limit: Optional[ConcurrencyLimit] = None,
+    deadline: Optional[Deadline] = None,
 ) -> Iterator[Dict[str, Any]]:
     """
-    Stream rows in chunks using a single DB round-trip.
-    This is sync (SQLAlchemy sync engine). Good enough for demo/proto.
+    Stream rows in byte/time-budgeted chunks (orchestration/row_stream.py) using a single DB round-trip.
+    The query runs on a worker thread (SQLAlchemy sync engine); heartbeat items are yielded while it is silent.
+    trace_id is prepended as an SQL comment so MariaDB slow/general logs can be joined with traces.
+    When cancel fires, a running MariaDB statement is killed (KILL QUERY) and RequestCancelled is raised.
+    With a limit (batch runs), the connection is only taken once a slot is free (heartbeats while waiting).
     """
     params = params or {}
-    engine = create_engine(_db_url())
-
-    sent = 0
-    chunk_index = 0
-    t0 = time.time()
-
-    with engine.connect() as conn:
-        conn.execute(sql_text("SET SESSION max_statement_time = :t"), {"t": int(timeout_ms) / 1000})
-        res = conn.execute(sql_text(sql), params)
-        cols = list(res.keys())
-
-        while sent < max_rows:
-            remaining = max_rows - sent
-            n = min(chunk_size, remaining)
-            rows = res.fetchmany(n)
-            if not rows:
-                break
-
-            out_rows: List[Dict[str, Any]] = []
-            for r in rows:
-                out_rows.append(dict(r._mapping))
-
-            sent += len(out_rows)
-            dt_ms = int((time.time() - t0) * 1000)
-
-            yield {
-                "columns": cols,
-                "rows": out_rows,
-                "chunk_index": chunk_index,
-                "row_count": len(out_rows),
-                "rows_sent_total": sent,
-                "elapsed_ms": dt_ms,
-            }
-            chunk_index += 1
+    policy = policy or ChunkPolicy.from_env()
+    if trace_id and os.getenv("TRACE_SQL_COMMENT", "1") != "0":
+        sql = f"/* trace_id={trace_id} */ {sql}"
+    engine = _get_engine()
+    # server-side cursor: rows reach the client while MariaDB is still sending them
+    stream_results = os.getenv("SQL_STREAM_RESULTS", "0") == "1"
+
+    def produce(sink: RowSink) -> None:
+        slot = limit.slot("sql_execute", deadline=deadline, cancel=cancel) if limit is not None else nullcontext()
+        with slot, engine.connect() as conn:
+            killer = None
+            if engine.dialect.name in ("mysql", "mariadb"):
+                conn.execute(sql_text("SET SESSION max_statement_time = :t"), {"t": int(timeout_ms) / 1000})
+                if cancel is not None:
+                    killer = _QueryKiller(engine, conn, cancel)
+            try:
+                if stream_results:
+                    conn = conn.execution_options(stream_results=True)
+                res = conn.execute(sql_text(sql), params)
+                sink.columns(list(res.keys()))
+
+                fetched = 0
+                while fetched < max_rows:
+                    rows = res.fetchmany(min(policy.fetch_rows, max_rows - fetched))
+                    if not rows:
+                        break
+                    fetched += len(rows)
+                    # plain tuples: the caller appends them to a ResultFrame column by column
+                    if not sink.rows([tuple(r) for r in rows]):
+                        break
+            finally:
+                if killer is not None:
+                    killer.close()
+
+    return stream_rows(produce, policy, thread_name="sql-stream", cancel=cancel)
 
 def stream_sse_pipeline(
     user_prompt: str,
     conversation_id: Optional[str] = None,
     provider: Optional[str] = None,
     model: Optional[str] = None,
+    deadline_ms: Optional[int] = None,
+    row_format: Optional[str] = None,
+    cancel: Optional[CancelToken] = None,
+    trace_id: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+    statement_timeout_ms: Optional[int] = None,
+    agents: Optional[PipelineAgents] = None,
+    llm_limit: Optional[ConcurrencyLimit] = None,
+    db_limit: Optional[ConcurrencyLimit] = None,
+    llm_priority: str = "interactive",
+    route_models: bool = False,
 ) -> Iterator[bytes]:
 # def stream_sse_pipeline(user_prompt: str, conversation_id: Optional[str] = None) -> Iterator[bytes]:
     """
     Streaming version of orchestration/executor.run_pipeline.
     It yields SSE bytes so the client can update UI in realtime.
+    cancel: cancelled by the web layer when the client disconnects.
+    trace_id: given by the caller when it needs the id before the first event (resumable streams).
+    deadline / statement_timeout_ms: budgets other than the request defaults (background jobs).
+    agents / llm_limit / db_limit: shared by the questions of a batch (orchestration/batch.py).
+    llm_priority: admission priority of the LLM calls (interactive / background / batch, orchestration/llm_scheduler.py).
+    route_models: pick fast / strong model by question complexity (no model named; orchestration/model_router.py).
     """
-    trace_id = str(uuid.uuid4())
+    trace_id = trace_id or str(uuid.uuid4())
 
     # Ensure conversation_id always exists for memory store
     if not conversation_id:
         conversation_id = trace_id
+
+    # old clients keep dict rows unless they (or SSE_ROW_FORMAT) ask for columnar
+    row_format = (row_format or os.getenv("SSE_ROW_FORMAT", "records")).lower()
+    if row_format not in ROW_FORMATS:
+        row_format = "records"
+
+    state = _RequestState(
+        trace_id,
+        conversation_id,
+        deadline=deadline or Deadline.from_env(override_ms=deadline_ms),
+        timings=StageTimings(),
+        root_span=tracer.start_span(
+            "pipeline",
+            trace_id=trace_id,
+            attributes={
+                "pipeline.trace_id": trace_id,
+                "conversation.id": conversation_id,
+                "gen_ai.system": provider,
+                "gen_ai.request.model": model,
+            },
+        ),
+        row_format=row_format,
+        cancel=cancel,
+        statement_timeout_ms=statement_timeout_ms,
+        agents=agents,
+        llm_limit=llm_limit,
+        db_limit=db_limit,
+        llm_priority=llm_priority,
+        route_models=route_models,
+    )
+    cancelled_stage = "stream"  # disconnect noticed between stages / while sending
+    INFLIGHT_STREAMS.inc()
+    try:
+        yield from _stream_pipeline(state, user_prompt, provider=provider, model=model)
+    except RequestCancelled as e:
+        # the client is gone: nothing left to send
+        cancelled_stage = e.stage or cancelled_stage
+    finally:
+        INFLIGHT_STREAMS.dec()
+        if state.timings.finish():
+            if state.cancel.cancelled:
+                ABANDONED.inc(stage=cancelled_stage)
+                REQUESTS.inc(status="abandoned")
+                state.root_span.set_attribute("pipeline.status", "abandoned")
+                state.root_span.set_attribute("pipeline.cancelled_stage", cancelled_stage)
+            else:
+                # paths that end without a done event (fallback answers)
+                REQUESTS.inc(status="incomplete")
+                state.root_span.set_attribute("pipeline.status", "incomplete")
+        if state.model_routes:
+            status = state.status or ("cancelled" if state.cancel.cancelled else "incomplete")
+            model_router.observe(state.model_routes[0]["route"], status, state.timings.since_start())
+        if state.attempt_span is not None:
+            state.attempt_span.end()
+        state.root_span.end()
+
+
+def _stream_pipeline(
+    state: _RequestState,
+    user_prompt: str,
+    *,
+    provider: Optional[str],
+    model: Optional[str],
+) -> Iterator[bytes]:
+    trace_id = state.trace_id
+    conversation_id = state.conversation_id
+    deadline = state.deadline
+    timings = state.timings
+    usage = state.usage
+    root_span = state.root_span
     history = store.get_history_dicts(conversation_id)
+    summary = store.get_summary(conversation_id) if (history and summary_enabled()) else None
+    # only a complete previous result can answer refinements; sampled ones go to the database
+    cached = result_cache.get(conversation_id) if (history and refine_enabled()) else None
+    refinable = cached if (cached is not None and cached.row_count and not cached.is_sampled) else None
 
     # config knobs
     max_rows = int(os.getenv("SQL_MAX_ROWS", "200"))
-    chunk_size = int(os.getenv("SQL_STREAM_CHUNK_SIZE", "50"))
-    timeout_ms = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "5000"))
+    # names repeat in every row of the records format, so they count against the byte budget
+    chunk_policy = ChunkPolicy.from_env(repeat_names=state.row_format == "records")
+    timeout_ms = state.statement_timeout_ms or int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "5000"))
     max_exec_retries = int(os.getenv("SQL_EXEC_MAX_RETRIES", "2"))
 
     # 1) Domain guard (optional / currently disabled)
     yield _sse("step", {"trace_id": trace_id, "stage": "domain_guard", "message": "Checking your question…"})
-    dg = check_in_domain(user_prompt)
+    with timings.stage("domain_guard"), tracer.span("domain_guard", parent=root_span) as dg_span:
+        dg = check_in_domain(user_prompt)
+        dg_span.set_attribute("domain_guard.allowed", dg.allowed)
     if not dg.allowed:
         # yield _sse("error", _safe_err("OUT_OF_DOMAIN", dg.message, retryable=False))
         # yield _sse("done", {"trace_id": trace_id, "status": "fail"})
         yield _sse("error", _safe_err("OUT_OF_DOMAIN", "Question is outside supported domain", retryable=False))
         yield _sse("answer", {"trace_id": trace_id, "markdown": dg.message})
-        yield _sse("done", {"trace_id": trace_id, "status": "fail"})
+        yield _done(state, "fail")
 
         return
     yield _sse("step", {"trace_id": trace_id, "stage": "domain_guard", "message": "Looks good. Generating SQL…", "status": "ok"})
 
     # 2-4) Text-to-SQL + Validate + Execute (with retry loop)
     # t2s = TextToSQLAgent()
-    t2s = TextToSQLAgent(provider=provider, model=model)
+    t2s = state.agents.text_to_sql if state.agents is not None else TextToSQLAgent(provider=provider, model=model)
 
     # 1) Domain guard (LLM)
      # 1) Domain guard (LLM)
@@ -264,15 +592,38 @@ def stream_sse_pipeline(
 
     final_statement = ""
     final_params: Dict[str, Any] = {}
-    all_rows: List[Dict[str, Any]] = []
-    cols: List[str] = []
+    final_refined = False
+    frame = ResultFrame()
 
     while attempt <= max_exec_retries:
+        # one span per outer attempt; the previous one (if any) ends here
+        if state.attempt_span is not None:
+            state.attempt_span.end()
+        attempt_span = state.attempt_span = tracer.start_span(
+            "attempt", parent=root_span, attributes={"pipeline.attempt": attempt}
+        )
+
         # 2) Text-to-SQL (LLM)
+        if not deadline.has_budget(deadline.min_llm_ms):
+            yield from _deadline_exhausted(state, attempt, "text_to_sql")
+            return
+
         msg = "Drafting SQL…" if attempt == 0 else f"Revising SQL… (attempt {attempt+1}/{max_exec_retries+1})"
         yield _sse("step", {"trace_id": trace_id, "attempt": attempt, "stage": "text_to_sql", "message": msg})
 
-        t2s_payload: Dict[str, Any] = {"raw_user_prompt": user_prompt, "history": history}
+        t2s_payload: Dict[str, Any] = {
+            "raw_user_prompt": user_prompt,
+            "history": history,
+            "summary": summary,
+            "previous_result": refinable,
+            "deadline": deadline,
+            "timings": timings,
+            "usage": usage,
+            "cancel": state.cancel,
+            "llm_limit": state.llm_limit,
+            "llm_priority": state.llm_priority,
+            "route_models": state.route_models,
+        }
         if attempt > 0 and attempt_traces:
             prev = attempt_traces[-1]
             t2s_payload.update(
@@ -284,8 +635,26 @@ def stream_sse_pipeline(
                 }
             )
 
-        sql_res = t2s.invoke(t2s_payload)
+        with timings.stage("text_to_sql"), tracer.span("text_to_sql", parent=attempt_span) as t2s_span:
+            t2s_payload["span"] = t2s_span
+            sql_res = t2s.invoke(t2s_payload)
+            state.model_routes.extend(sql_res.get("model_routes") or [])
+            if sql_res.get("status") != "success":
+                t2s_span.set_error(
+                    (sql_res.get("error") or {}).get("message", ""),
+                    error_code=(sql_res.get("error") or {}).get("error_code"),
+                )
         if sql_res.get("status") != "success":
+            attempt_span.set_error("text_to_sql failed", error_code=(sql_res.get("error") or {}).get("error_code"))
+            if (sql_res.get("error") or {}).get("error_code") == "DEADLINE_EXCEEDED":
+                yield from _deadline_exhausted(state, attempt, "text_to_sql")
+                return
+            if (sql_res.get("error") or {}).get("error_code") == "LLM_OVERLOADED":
+                # not admitted by the LLM scheduler: fail fast, the client retries after retry_after_ms
+                yield _sse("error", {"trace_id": trace_id, "attempt": attempt, **sql_res["error"]})
+                yield _done(state, "fail", attempt=attempt)
+                return
+
             err = sql_res.get("error") or _safe_err("TEXT_TO_SQL_FAILED", "LLM failed to generate SQL", retryable=True)
             err = {"trace_id": trace_id, "attempt": attempt, **err}
             yield _sse("error", err)
@@ -305,13 +674,29 @@ def stream_sse_pipeline(
         cmd = (sql_res.get("result") or {}).get("command") or {}
         statement = (cmd.get("statement") or "").strip()
         params = cmd.get("params") or {}
+        refine = refinable is not None and bool((sql_res.get("result") or {}).get("refine_previous"))
 
-        yield _sse("sql", {"trace_id": trace_id, "attempt": attempt, "sql": statement, "params": params})
+        yield _sse(
+            "sql",
+            {
+                "trace_id": trace_id,
+                "attempt": attempt,
+                "sql": statement,
+                "params": params,
+                "source": "previous_result" if refine else "database",
+            },
+        )
 
         # 3) Validate SQL
         yield _sse("step", {"trace_id": trace_id, "attempt": attempt, "stage": "sql_validate", "message": "Validating SQL…"})
-        ok, reason = validate_sql(statement, dialect="mysql")
+        fingerprint = sql_fingerprint(statement) if statement else ""
+        attempt_span.set_attribute("db.statement_fingerprint", fingerprint)
+        with timings.stage("sql_validate"), tracer.span("sql_validate", parent=attempt_span) as v_span:
+            ok, reason = validate_sql(statement, dialect="mysql")
+            if not ok:
+                v_span.set_error(reason, error_code="SQL_VALIDATION_FAILED")
         if not ok:
+            attempt_span.set_error(reason, error_code="SQL_VALIDATION_FAILED")
             attempt_traces.append({
                 "sql": statement,
                 "params": params,
@@ -319,13 +704,17 @@ def stream_sse_pipeline(
             })
             yield _sse("error", {"trace_id": trace_id, "attempt": attempt, **_safe_err("SQL_VALIDATION_FAILED", reason, retryable=True)})
 
-            if attempt < max_exec_retries:
+            if attempt < max_exec_retries and deadline.has_budget(deadline.min_llm_ms):
                 yield _sse("step", {"trace_id": trace_id, "attempt": attempt, "stage": "sql_validate",
                                     "message": f"SQL failed validation — revising… (next attempt {attempt+2}/{max_exec_retries+1})"})
+                RETRIES.inc(kind="validation")
                 attempt += 1
                 continue
 
-            yield _sse("done", {"trace_id": trace_id, "attempt": attempt, "status": "fail"})
+            if attempt < max_exec_retries:
+                # a retry was still allowed, only the time budget was missing
+                deadline.exhaust("text_to_sql")
+            yield _done(state, "fail", attempt=attempt)
             return
         # if not ok:
         #     yield _sse(
@@ -347,27 +736,60 @@ def stream_sse_pipeline(
         )
 
         # 4) Execute SQL (stream rows)
-        yield _sse("step", {"trace_id": trace_id, "attempt": attempt, "stage": "sql_execute", "message": "Query running…"})
+        if not deadline.has_budget(deadline.min_sql_ms):
+            yield from _deadline_exhausted(state, attempt, "sql_execute")
+            return
+
+        exec_msg = "Refining the previous result (no database query)…" if refine else "Query running…"
+        yield _sse("step", {"trace_id": trace_id, "attempt": attempt, "stage": "sql_execute", "message": exec_msg})
 
         # reset buffers per attempt (important: do not mix partial rows from failed attempts)
-        all_rows = []
-        cols = []
+        frame = ResultFrame()
+        stmt_timeout_ms = deadline.clamp_ms(timeout_ms)
+        exec_t0 = time.perf_counter()
+        exec_span = tracer.start_span(
+            "sql_execute",
+            parent=attempt_span,
+            attributes={
+                "db.system": "sqlite" if refine else "mariadb",
+                "db.statement_fingerprint": fingerprint,
+                "db.statement_timeout_ms": stmt_timeout_ms,
+                "result.refined_locally": refine,
+            },
+        )
 
         try:
-            for chunk in _run_sql_stream(
-                statement,
-                params,
-                chunk_size=chunk_size,
-                max_rows=max_rows,
-                timeout_ms=timeout_ms,
-            ):
-                cols = chunk["columns"]
-                all_rows.extend(chunk["rows"])
-                yield _sse("rows", {"trace_id": trace_id, "attempt": attempt, **chunk})
+            if refine:
+                chunks = run_refinement(refinable, statement, policy=chunk_policy, max_rows=max_rows, cancel=state.cancel)
+            else:
+                chunks = _run_sql_stream(
+                    statement,
+                    params,
+                    policy=chunk_policy,
+                    max_rows=max_rows,
+                    timeout_ms=stmt_timeout_ms,
+                    trace_id=trace_id,
+                    cancel=state.cancel,
+                    limit=state.db_limit,
+                    deadline=deadline,
+                )
+            for chunk in chunks:
+                if chunk.get("heartbeat"):
+                    yield _sse_heartbeat(chunk["elapsed_ms"])
+                    continue
+                if chunk["chunk_index"] == 0:
+                    timings.record("sql_first_row", time.perf_counter() - exec_t0)
+                    frame = ResultFrame(chunk["columns"])
+                frame.extend(chunk["rows"])
+                yield _sse("rows", _rows_event(state, attempt, chunk, frame))
+
+            timings.record("sql_execute", time.perf_counter() - exec_t0)
+            exec_span.set_attribute("db.row_count", len(frame))
 
             # success: capture final sql/params
             final_statement = statement
             final_params = params
+            final_refined = refine
 
             yield _sse(
                 "step",
@@ -375,14 +797,36 @@ def stream_sse_pipeline(
                     "trace_id": trace_id,
                     "attempt": attempt,
                     "stage": "sql_execute",
-                    "message": f"Got {len(all_rows)} rows (sample). Composing answer…",
+                    "message": f"Got {len(frame)} rows (sample). Composing answer…",
                     "status": "ok",
                 },
             )
             break
 
+        except RequestCancelled as e:
+            exec_span.set_error(str(e), error_code="REQUEST_CANCELLED")
+            raise
+
+        except DeadlineExceeded as e:
+            # the budget ran out while waiting for a database slot (batch runs): not an SQL error
+            timings.record("sql_execute", time.perf_counter() - exec_t0)
+            exec_span.set_error(str(e), error_code="DEADLINE_EXCEEDED")
+            yield from _deadline_exhausted(state, attempt, "sql_execute")
+            return
+
         except Exception as e:
+            timings.record("sql_execute", time.perf_counter() - exec_t0)
             code, msg_err, retryable = _classify_sql_error(e)
+            if refine:
+                # the cached result cannot answer this; next attempt queries the database
+                refinable = None
+                code, retryable = "LOCAL_REFINE_FAILED", True
+                msg_err = f"{msg_err} (the previous result lacks what this question needs; query the database tables instead of prev_result)"
+            exec_span.set_error(msg_err, error_code=code)
+            attempt_span.set_error(msg_err, error_code=code)
+            if code == "SQL_TIMEOUT" and stmt_timeout_ms < timeout_ms:
+                # the statement timeout was clamped by the request budget
+                deadline.exhaust("sql_execute")
 
             err_payload = _safe_err(code, msg_err, retryable=retryable)
             # keep trace for LLM repair
@@ -396,6 +840,10 @@ def stream_sse_pipeline(
 
             yield _sse("error", {"trace_id": trace_id, "attempt": attempt, **err_payload})
 
+            if retryable and attempt < max_exec_retries and not deadline.has_budget(deadline.min_llm_ms):
+                yield from _deadline_exhausted(state, attempt, "text_to_sql")
+                return
+
             if retryable and attempt < max_exec_retries:
                 yield _sse(
                     "step",
@@ -406,6 +854,7 @@ def stream_sse_pipeline(
                         "message": f"Query failed — revising SQL… (next attempt {attempt+2}/{max_exec_retries+1})",
                     },
                 )
+                RETRIES.inc(kind="refine_fallback" if code == "LOCAL_REFINE_FAILED" else "execution")
                 attempt += 1
                 continue
 
@@ -420,8 +869,16 @@ def stream_sse_pipeline(
             )
             yield _sse("answer", {"trace_id": trace_id, "attempt": attempt, "markdown": fallback_md})
             # yield _sse("done", {"trace_id": trace_id, "attempt": attempt, "status": "fail"})
+            if deadline.exhausted_stage:
+                yield _done(state, "fail", attempt=attempt)
             return
 
+        finally:
+            exec_span.end()
+
+    if state.attempt_span is not None:
+        state.attempt_span.end()
+
     # Safety: if loop ended without break (shouldn't happen), fail fast
     if not final_statement:
         # OPTIONAL: send a human-friendly markdown answer too
@@ -437,43 +894,66 @@ def stream_sse_pipeline(
         return
 
     # 5) Composer (LLM -> markdown answer)
-    composer = ComposerAgent()
-    composer = ComposerAgent(provider=provider, model=model)
+    composer = state.agents.composer if state.agents is not None else ComposerAgent(provider=provider, model=model)
 
     yield _sse("step", {"trace_id": trace_id, "attempt": attempt, "stage": "compose", "message": "Writing the answer…"})
 
     try:
-        rows_sample_safe = _to_jsonable(all_rows)
-        params_safe = _to_jsonable(final_params)
+        column_stats = None
+        if os.getenv("RESULT_STATS", "1") != "0":
+            # over every fetched row, so the composer does not infer totals/trends from the sample
+            with timings.stage("result_stats"):
+                column_stats = compute_result_stats(frame)
+
+        params_safe = to_jsonable(final_params)
 
         attempt_count = attempt + 1
         meta = {
             "attempt_count": attempt_count,
             "max_rows_limit": max_rows,
-            "is_sampled": (len(all_rows) >= max_rows),
+            "is_sampled": (len(frame) >= max_rows),
             "timeout_ms": timeout_ms,
+            "refined_from_previous": final_refined,
         }
 
-        compose_res = composer.invoke(
-            {
-                "trace_id": trace_id,
-                "user_prompt": user_prompt,
-                "history": history,
-                "sql": final_statement,
-                "params": params_safe,
-                "result": {
-                    "columns": cols,
-                    "rows_sample": rows_sample_safe,
-                    "row_count": len(all_rows),
-                },
-                "meta": meta,
-            }
-        )
+        with timings.stage("compose"), tracer.span("compose", parent=root_span) as compose_span:
+            compose_res = composer.invoke(
+                {
+                    "trace_id": trace_id,
+                    "user_prompt": user_prompt,
+                    "history": history,
+                    "summary": summary,
+                    "sql": final_statement,
+                    "params": params_safe,
+                    "result": {
+                        "frame": frame,
+                        "row_count": len(frame),
+                        "column_stats": column_stats,
+                    },
+                    "meta": meta,
+                    "deadline": deadline,
+                    "timings": timings,
+                    "usage": usage,
+                    "span": compose_span,
+                    "cancel": state.cancel,
+                    "llm_limit": state.llm_limit,
+                    "llm_priority": state.llm_priority,
+                    # the summary follows the question's own route, not the repair escalation
+                    "model_route": state.model_routes[0] if state.model_routes else None,
+                }
+            )
     except Exception as e:
         yield _sse("error", {"trace_id": trace_id, "attempt": attempt, **_safe_err("COMPOSER_FAILED", str(e), retryable=True)})
-        yield _sse("done", {"trace_id": trace_id, "attempt": attempt, "status": "fail"})
+        yield _done(state, "fail", attempt=attempt)
         return
 
+    if (compose_res.get("error") or {}).get("error_code") == "DEADLINE_EXCEEDED":
+        # rows were already streamed; answer with the fallback instead of failing the request
+        yield _sse("error", {"trace_id": trace_id, "attempt": attempt, **_safe_err("DEADLINE_EXCEEDED", "Request time budget exhausted during composer", retryable=True)})
+    elif (compose_res.get("error") or {}).get("error_code") == "LLM_OVERLOADED":
+        # same: the rows are there, the summary is the fallback
+        yield _sse("error", {"trace_id": trace_id, "attempt": attempt, **compose_res["error"]})
+
     if compose_res.get("status") == "success":
         markdown = ((compose_res.get("result") or {}).get("markdown")) or ""
     else:
@@ -487,22 +967,27 @@ def stream_sse_pipeline(
 
     store.append(conversation_id, "user", user_prompt)
     store.append(conversation_id, "assistant", markdown)
+    result_cache.put(
+        conversation_id,
+        sql=final_statement,
+        frame=frame,
+        is_sampled=(len(frame) >= max_rows),
+    )
+    if fewshot_enabled() and len(frame) and not final_refined:
+        # executed and returned rows: a verified example for later prompts
+        # (prev_result refinements are not reusable, empty results are often wrong filters);
+        # written off the request path like the summary below
+        example_store.submit(user_prompt, final_statement)
+    if summary_enabled():
+        # off the request path; the next follow-up reads summary + last turn
+        summary_updater.submit(
+            store,
+            conversation_id,
+            question=user_prompt,
+            sql=final_statement,
+            columns=frame.columns,
+            row_count=len(frame),
+        )
 
-    yield _sse("done", {"trace_id": trace_id, "attempt": attempt, "status": "success"})
-
-
-def _json_default(o: Any):
-    if isinstance(o, Decimal):
-        return str(o)
-    if isinstance(o, (datetime, date)):
-        return o.isoformat()
-    if isinstance(o, UUID):
-        return str(o)
-    if isinstance(o, (bytes, bytearray)):
-        return o.decode("utf-8", errors="replace")
-    return str(o)
-
+    yield _done(state, "success", attempt=attempt)
 
-def _to_jsonable(obj: Any) -> Any:
-    # แปลง nested dict/list ที่มี Decimal/datetime/UUID ให้กลายเป็นของที่ JSON ได้
-    return json.loads(json.dumps(obj, ensure_ascii=False, default=_json_default))
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+"""
+Deterministic LLM stand-ins for offline benchmarking.
+
+- FakeChatModel (provider "fake" / "replay")
+  Returns responses recorded in a cassette, keyed by a hash of the prompt
+  messages. On a cassette miss, "fake" answers with a canned response
+  (valid text-to-SQL JSON or a composer markdown answer) while "replay"
+  raises, so a benchmark never silently diverges from recorded traffic.
+  Artificial latency: FAKE_LLM_LATENCY_MS + output_tokens / FAKE_LLM_TOKENS_PER_S,
+  or the recorded wall time with FAKE_LLM_LATENCY_MODE=recorded.
+
+- RecordingChatModel
+  Wraps a real provider model and appends every call to a cassette
+  (enabled in get_llm with LLM_RECORD_CASSETTE=/path/cassette.jsonl).
+
+Cassette format: JSONL, one call per line
+  {"key": "...", "provider": "...", "model": "...", "response": "...",
+   "usage": {"input_tokens": n, "output_tokens": n}, "latency_ms": n, "prompt_preview": "..."}
+Repeated keys are replayed in recording order (then the last one repeats),
+so internal retries replay deterministically.
+
+Scripted entries use a wildcard key "*:<kind>" (kind = text_to_sql |
+domain_guard | composer) and answer any prompt of that kind that has no
+exact entry; the benchmark suite writes them to script repair scenarios
+(e.g. a bad SQL first, then a good one).
+"""
+
+from threading import RLock
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import os
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+def prompt_key(messages: List[BaseMessage]) -> str:
+    h = hashlib.sha256()
+    for m in messages:
+        h.update(m.type.encode("utf-8"))
+        h.update(b"\x00")
+        content = m.content if isinstance(m.content, str) else json.dumps(m.content, ensure_ascii=False, sort_keys=True)
+        h.update(content.strip().encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()[:32]
+
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 chars/token for English, Thai is denser; good enough for fake usage numbers
+    return max(1, len(text or "") // 4)
+
+
+class Cassette:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = RLock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self.load()
+
+    def load(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._cursor.clear()
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    rec = json.loads(line)
+                    self._entries.setdefault(rec["key"], []).append(rec)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(v) for v in self._entries.values())
+
+    def next(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            recs = self._entries.get(key)
+            if not recs:
+                return None
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            return recs[min(i, len(recs) - 1)]
+
+    def rewind(self) -> None:
+        with self._lock:
+            self._cursor.clear()
+
+    def append(self, rec: Dict[str, Any]) -> None:
+        with self._lock:
+            d = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(d, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._entries.setdefault(rec["key"], []).append(rec)
+
+
+_CASSETTES: Dict[str, Cassette] = {}
+_CASSETTES_LOCK = RLock()
+
+
+def get_cassette(path: str) -> Cassette:
+    path = os.path.abspath(path)
+    with _CASSETTES_LOCK:
+        if path not in _CASSETTES:
+            _CASSETTES[path] = Cassette(path)
+        return _CASSETTES[path]
+
+
+DEFAULT_FAKE_SQL = "SELECT COUNT(*) AS total FROM b100_disaster_area;"
+
+
+def prompt_kind(messages: List[BaseMessage]) -> str:
+    system = " ".join(m.content for m in messages if m.type == "system" and isinstance(m.content, str))
+    if "Text-to-SQL" in system:
+        return "text_to_sql"
+    if "domain guard" in system:
+        return "domain_guard"
+    return "composer"
+
+
+def _canned_response(messages: List[BaseMessage]) -> str:
+    kind = prompt_kind(messages)
+    if kind == "text_to_sql":
+        return json.dumps(
+            {
+                "sql": os.getenv("FAKE_LLM_SQL", DEFAULT_FAKE_SQL),
+                "params": {},
+                "assumptions": ["fake LLM response"],
+                "expected_columns": [],
+            },
+            ensure_ascii=False,
+        )
+    if kind == "domain_guard":
+        return json.dumps({"decision": "ALLOW", "confidence": 0.9, "reason": "fake", "questions": []})
+    return (
+        "### คำตอบ\n- (fake LLM) ดูผลลัพธ์จากตารางหลักฐาน\n\n"
+        "### วิเคราะห์/อินไซต์\n- ไม่มีการวิเคราะห์ (fake LLM)\n\n"
+        "### ความมั่นใจ\n**50% (กลาง)**\n- คำตอบจาก fake LLM\n\n"
+        "### หลักฐาน\n- ดูตารางผลลัพธ์\n\n"
+        "### ข้อจำกัด\n- คำตอบนี้สร้างจาก fake LLM สำหรับการทดสอบประสิทธิภาพ\n"
+    )
+
+
+def _ai_message(text: str, usage: Dict[str, int]) -> AIMessage:
+    inp = int(usage.get("input_tokens") or 0)
+    out = int(usage.get("output_tokens") or 0)
+    return AIMessage(
+        content=text,
+        usage_metadata={"input_tokens": inp, "output_tokens": out, "total_tokens": inp + out},
+    )
+
+
+class FakeChatModel(BaseChatModel):
+    """LangChain chat model that replays cassettes / canned answers with artificial latency."""
+
+    model_name: str = "fake-model"
+    cassette_path: Optional[str] = None
+    strict: bool = False  # True for provider "replay": cassette miss -> error
+    latency_ms: float = 0.0
+    tokens_per_s: float = 0.0  # 0 -> no per-token delay
+    latency_mode: str = "fixed"  # fixed | recorded
+
+    @classmethod
+    def from_env(cls, model: Optional[str] = None, strict: bool = False) -> "FakeChatModel":
+        return cls(
+            model_name=model or "fake-model",
+            cassette_path=os.getenv("FAKE_LLM_CASSETTE") or None,
+            strict=strict,
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")),
+            tokens_per_s=float(os.getenv("FAKE_LLM_TOKENS_PER_S", "0")),
+            latency_mode=os.getenv("FAKE_LLM_LATENCY_MODE", "fixed"),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-replay" if self.strict else "fake"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "cassette_path": self.cassette_path}
+
+    def _sleep(self, out_tokens: int, recorded_ms: Optional[float]) -> None:
+        if self.latency_mode == "recorded" and recorded_ms is not None:
+            delay = recorded_ms / 1000
+        else:
+            delay = self.latency_ms / 1000
+            if self.tokens_per_s > 0:
+                delay += out_tokens / self.tokens_per_s
+        if delay > 0:
+            time.sleep(delay)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        key = prompt_key(messages)
+        rec = None
+        if self.cassette_path:
+            cassette = get_cassette(self.cassette_path)
+            rec = cassette.next(key) or cassette.next(f"*:{prompt_kind(messages)}")
+
+        if rec is None:
+            if self.strict:
+                raise KeyError(f"replay cassette miss for prompt key {key}")
+            text = _canned_response(messages)
+            usage = {
+                "input_tokens": sum(_estimate_tokens(m.content) for m in messages if isinstance(m.content, str)),
+                "output_tokens": _estimate_tokens(text),
+            }
+            recorded_ms = None
+        else:
+            text = rec.get("response") or ""
+            usage = rec.get("usage") or {"input_tokens": 0, "output_tokens": _estimate_tokens(text)}
+            recorded_ms = rec.get("latency_ms")
+
+        self._sleep(int(usage.get("output_tokens") or 0), recorded_ms)
+        return ChatResult(generations=[ChatGeneration(message=_ai_message(text, usage))])
+
+
+class RecordingChatModel(BaseChatModel):
+    """Pass-through wrapper around a real chat model that appends each call to a cassette."""
+
+    inner: Any
+    cassette_path: str
+    provider: str = ""
+    model_name: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        t0 = time.perf_counter()
+        resp = self.inner.invoke(messages, stop=stop, **kwargs)
+        latency_ms = int((time.perf_counter() - t0) * 1000)
+
+        text = getattr(resp, "content", "") or ""
+        um = getattr(resp, "usage_metadata", None) or {}
+        get_cassette(self.cassette_path).append(
+            {
+                "key": prompt_key(messages),
+                "provider": self.provider,
+                "model": self.model_name,
+                "response": text,
+                "usage": {
+                    "input_tokens": int(um.get("input_tokens") or 0),
+                    "output_tokens": int(um.get("output_tokens") or 0),
+                },
+                "latency_ms": latency_ms,
+                "prompt_preview": (messages[-1].content if messages and isinstance(messages[-1].content, str) else "")[:200],
+                "ts": time.time(),
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=resp)])
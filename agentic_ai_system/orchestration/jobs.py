@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+"""
+Background query jobs.
+
+Some analytical questions legitimately take minutes; holding an SSE
+response (and a threadpool slot) open for that long is fragile. A job is
+the same pipeline run, queued on a bounded pool of job workers:
+
+- `POST /query/jobs` enqueues and returns the job id at once (429 when
+  JOB_QUEUE_MAX jobs are already waiting)
+- JOB_WORKERS threads run the jobs, with their own budgets
+  (JOB_DEADLINE_MS / JOB_DEADLINE_MAX_MS, JOB_SQL_STATEMENT_TIMEOUT_MS)
+- status and result (SQL, rows, answer, timings) are kept in the job store
+  (memory/job_store.py) for JOB_RESULT_TTL_S: `GET /query/jobs/{id}`
+- progress is the usual SSE event stream, buffered like a resumable stream
+  (orchestration/stream_runs.py): `GET /query/jobs/{id}/events` replays
+  from Last-Event-ID and follows the run; the job keeps running when no
+  one is listening
+- `DELETE /query/jobs/{id}` cancels a queued or running job
+
+    job = job_runner.submit({"user_prompt": "...", ...})   # JobQueueFull when the queue is full
+    job_runner.get(job["job_id"])
+"""
+
+from queue import Full, Queue
+from threading import Lock, Thread
+from time import monotonic
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import uuid
+
+from agentic_ai_system.memory.event_replay import replay_buffer
+from agentic_ai_system.memory.job_store import SqliteJobStore, create_job_store_from_env
+from agentic_ai_system.orchestration.cancellation import CancelToken
+from agentic_ai_system.orchestration.deadline import Deadline
+from agentic_ai_system.orchestration.executor_stream import stream_sse_pipeline
+from agentic_ai_system.orchestration.metrics import registry
+from agentic_ai_system.orchestration.outcome import PipelineOutcome, parse_sse_event
+from agentic_ai_system.orchestration.stream_runs import Follower, StreamRun, follow, register_run
+
+
+logger = logging.getLogger(__name__)
+
+JOBS = registry.counter(
+    "text2sql_jobs_total", "Background query jobs by outcome (succeeded / failed / cancelled / rejected)."
+)
+JOB_STATE = registry.gauge("text2sql_jobs", "Background query jobs of this process (queued / running).")
+JOB_QUEUE_WAIT = registry.histogram(
+    "text2sql_job_queue_wait_seconds",
+    "Time jobs waited for a job worker.",
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900),
+)
+
+
+class JobQueueFull(Exception):
+    """JOB_QUEUE_MAX jobs are already waiting for a worker."""
+
+
+class _Job:
+    __slots__ = ("job_id", "request", "cancel", "run", "outcome", "queued_at", "started")
+
+    def __init__(self, job_id: str, request: Dict[str, Any]) -> None:
+        self.job_id = job_id
+        self.request = request
+        self.cancel = CancelToken()
+        self.outcome = PipelineOutcome()
+        self.queued_at = monotonic()
+        self.run: Optional[StreamRun] = None
+        self.started = False
+
+
+class JobRunner:
+    def __init__(self, workers: int = 2, max_queued: int = 100) -> None:
+        if workers <= 0:
+            raise ValueError("workers must be > 0")
+        self.workers = workers
+        self._queue: "Queue[_Job]" = Queue(maxsize=max(1, max_queued))
+        self._jobs: Dict[str, _Job] = {}  # queued / running in this process
+        self._running = 0
+        self._lock = Lock()
+        self._threads: List[Thread] = []
+        self._store: Optional[SqliteJobStore] = None
+        JOB_STATE.set_function(self._metric_values)
+
+    def _metric_values(self) -> Dict[Any, float]:
+        with self._lock:
+            running = self._running
+            queued = len(self._jobs) - running
+        return {(("state", "queued"),): queued, (("state", "running"),): running}
+
+    def store(self) -> SqliteJobStore:
+        # created on first use, so importing the app does not touch ./data
+        with self._lock:
+            if self._store is None:
+                self._store = create_job_store_from_env()
+            return self._store
+
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            while len(self._threads) < self.workers:
+                t = Thread(target=self._work, name=f"query-job-{len(self._threads)}", daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def submit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        job = _Job(str(uuid.uuid4()), request)
+        # followable before it starts: /events waits for the first event of a queued job
+        job.run = register_run(
+            StreamRun(job.job_id, self._events(job), job.cancel, buffer=replay_buffer, grace_ms=None)
+        )
+        store = self.store()
+        store.create(job.job_id, request)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        try:
+            self._queue.put_nowait(job)
+        except Full:
+            with self._lock:
+                del self._jobs[job.job_id]
+            store.delete(job.job_id)
+            job.cancel.cancel("job_rejected")
+            job.run.drive()  # nothing runs: closes its (empty) event stream and forgets it
+            JOBS.inc(status="rejected")
+            raise JobQueueFull(f"{self._queue.maxsize} jobs are already queued")
+        self._ensure_workers()
+        return store.get(job.job_id) or {"job_id": job.job_id, "status": "queued"}
+
+    def _events(self, job: _Job):
+        if job.cancel.cancelled:
+            return  # cancelled while queued
+        req = job.request
+        events = stream_sse_pipeline(
+            user_prompt=req["user_prompt"],
+            conversation_id=req.get("conversation_id"),
+            provider=req.get("provider"),
+            model=req.get("model"),
+            row_format=req.get("row_format"),
+            cancel=job.cancel,
+            trace_id=job.job_id,
+            deadline=Deadline.from_env(
+                override_ms=req.get("deadline_ms"),
+                default_ms=int(os.getenv("JOB_DEADLINE_MS", "600000")),
+                cap_ms=int(os.getenv("JOB_DEADLINE_MAX_MS", "1800000")),
+            ),
+            statement_timeout_ms=int(os.getenv("JOB_SQL_STATEMENT_TIMEOUT_MS", "120000")),
+            llm_priority="background",  # interactive requests are admitted first (orchestration/llm_scheduler.py)
+            route_models=bool(req.get("route_models")),
+        )
+        for chunk in events:
+            parsed = parse_sse_event(chunk)
+            if parsed is not None:
+                job.outcome.feed(*parsed)
+            yield chunk
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            JOB_QUEUE_WAIT.observe(monotonic() - job.queued_at)
+            with self._lock:
+                self._running += 1
+                job.started = True
+            try:
+                self._run(job)
+            except Exception:
+                logger.exception("job %s failed", job.job_id)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._jobs.pop(job.job_id, None)
+
+    def _run(self, job: _Job) -> None:
+        store = self.store()
+        if not job.cancel.cancelled:
+            store.mark_running(job.job_id)
+        job.run.drive()
+
+        result = job.outcome.result()
+        if job.cancel.cancelled:
+            status = "cancelled"
+            result["error"] = {"error_code": "JOB_CANCELLED", "message": "The job was cancelled", "retryable": True}
+        elif job.run.error is not None:
+            status = "failed"
+            result["error"] = {"error_code": "INTERNAL_SERVER_ERROR", "message": job.run.error, "retryable": False}
+        else:
+            # fallback answers end without a done event: there is no result to show
+            status = "succeeded" if result["status"] == "success" else "failed"
+        store.finish(job.job_id, status, result)
+        JOBS.inc(status=status)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store().get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a job of this process; None when unknown. A job of another worker is returned unchanged."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            queued = job is not None and not job.started
+        if job is not None and job.cancel.cancel("job_cancelled") and queued:
+            # shown at once; the worker that dequeues it only closes its event stream
+            self.store().finish(job_id, "cancelled", {"status": "fail", "error": {
+                "error_code": "JOB_CANCELLED", "message": "The job was cancelled", "retryable": True}})
+        return self.get(job_id)
+
+    def is_local(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._jobs
+
+    def events(self, job_id: str, after_id: int = 0) -> Optional[Follower]:
+        return follow(job_id, after_id)
+
+
+def create_job_runner_from_env() -> JobRunner:
+    return JobRunner(
+        workers=int(os.getenv("JOB_WORKERS", "2")),
+        max_queued=int(os.getenv("JOB_QUEUE_MAX", "100")),
+    )
+
+
+job_runner = create_job_runner_from_env()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+"""
+Concurrency limits shared by a group of pipeline runs.
+
+A batch (orchestration/batch.py) runs many questions at once; without a
+bound they would all hit the LLM provider and MariaDB together. A
+ConcurrencyLimit is handed down like the CancelToken (agent payload
+"llm_limit" -> invoke_llm, request state -> SQL execution) and every call
+takes a slot first. Waiting for a slot respects the request deadline and
+cancellation, so a queued call never outlives its request.
+
+    llm = ConcurrencyLimit("batch_llm", 4)
+    with llm.slot("text_to_sql", deadline=deadline, cancel=cancel):
+        ...   # at most 4 of these at a time
+"""
+
+from contextlib import contextmanager
+from threading import Condition
+from time import monotonic
+from typing import Iterator, Optional
+
+from agentic_ai_system.orchestration.cancellation import CancelToken
+from agentic_ai_system.orchestration.deadline import Deadline, DeadlineExceeded
+from agentic_ai_system.orchestration.metrics import registry
+
+
+LIMIT_WAIT = registry.histogram(
+    "text2sql_concurrency_wait_seconds",
+    "Time calls waited for a concurrency limit slot, by limit.",
+    buckets=(0.005, 0.05, 0.25, 1, 2.5, 5, 15, 60),
+)
+
+
+class ConcurrencyLimit:
+    def __init__(self, name: str, limit: int) -> None:
+        if limit <= 0:
+            raise ValueError("limit must be > 0")
+        self.name = name
+        self.limit = limit
+        self._cond = Condition()
+        self._in_use = 0
+
+    def _wake(self, _reason: str = "") -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def acquire(self, stage: str, *, deadline: Optional[Deadline] = None, cancel: Optional[CancelToken] = None) -> None:
+        """Take a slot; DeadlineExceeded / RequestCancelled when the request ends while waiting."""
+        t0 = monotonic()
+        remove = cancel.on_cancel(self._wake) if cancel is not None else (lambda: None)
+        try:
+            with self._cond:
+                while self._in_use >= self.limit:
+                    if cancel is not None:
+                        cancel.check(stage)
+                    timeout = deadline.remaining_s() if deadline is not None else None
+                    if timeout is not None and timeout <= 0:
+                        deadline.exhaust(stage)
+                        raise DeadlineExceeded(stage)
+                    self._cond.wait(timeout)
+                self._in_use += 1
+        finally:
+            remove()
+        LIMIT_WAIT.observe(monotonic() - t0, limit=self.name)
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_use -= 1
+            # all waiters re-check: one of them may have been cancelled meanwhile
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, stage: str, *, deadline: Optional[Deadline] = None, cancel: Optional[CancelToken] = None) -> Iterator[None]:
+        self.acquire(stage, deadline=deadline, cancel=cancel)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def in_use(self) -> int:
+        return self._in_use
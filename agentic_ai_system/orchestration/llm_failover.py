@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+"""
+Hedged LLM calls and provider failover.
+
+Tail latency is dominated by the occasional slow provider response, and a
+provider having a bad hour fails every request that uses it. With
+LLM_FALLBACK_MODELS set (ordered "provider/model" entries of the ALLOWED
+table, e.g. "gemini/gemini-1.5-flash,openai/gpt-4o-mini"):
+
+- hedging: an interactive call still running after the LLM_HEDGE_PERCENTILE
+  latency of its provider/model (last LLM_HEDGE_WINDOW calls, at least
+  LLM_HEDGE_MIN_MS) gets a duplicate on the first healthy fallback; the
+  first answer wins and the other call is cancelled (invoke_llm). The
+  duplicate is admitted by the fallback's own scheduler lane and is skipped
+  when that lane is busy (orchestration/llm_scheduler.py)
+- circuit breaker: a provider/model whose error rate over the last
+  LLM_BREAKER_WINDOW calls reaches LLM_BREAKER_ERROR_RATE is skipped for
+  LLM_BREAKER_OPEN_MS; its calls fail over to the first healthy fallback,
+  then one probe call decides whether it is closed again
+
+    target = llm_failover.route(provider, model)        # failover when the breaker is open
+    chain = llm_failover.rebind(prompt | llm, *target)  # same prompt, other model
+"""
+
+from collections import deque
+from threading import Lock
+from time import monotonic
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import logging
+import math
+import os
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import RunnableSequence
+
+from agentic_ai_system.orchestration.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+Target = Tuple[str, str]
+
+LLM_HEDGES = registry.counter(
+    "text2sql_llm_hedges_total",
+    "Interactive LLM calls by hedging result (not_needed / primary_won / hedge_won / skipped), by lane. "
+    "Hedge rate = (primary_won + hedge_won) / all, win rate = hedge_won / (primary_won + hedge_won).",
+)
+LLM_FAILOVERS = registry.counter(
+    "text2sql_llm_failovers_total", "LLM calls sent to a fallback model because the lane's circuit breaker is open."
+)
+LLM_CIRCUIT = registry.gauge("text2sql_llm_circuit_open", "1 while a lane's circuit breaker is open (0 closed / probing).")
+
+
+class CircuitBreaker:
+    def __init__(self, window: int, min_calls: int, error_rate: float, open_s: float) -> None:
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.open_s = open_s
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, window))
+        self._opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None
+        self._lock = Lock()
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None and monotonic() - self._opened_at < self.open_s
+
+    def _half_open(self, now: float) -> bool:
+        # open_s has passed and no probe is out (one that never reports back expires)
+        return (
+            self._opened_at is not None
+            and now - self._opened_at >= self.open_s
+            and (self._probe_at is None or now - self._probe_at >= self.open_s)
+        )
+
+    def available(self) -> bool:
+        """Closed, or half-open with no probe out; claims nothing (claim_probe() when the call is sent)."""
+        with self._lock:
+            return self._opened_at is None or self._half_open(monotonic())
+
+    def claim_probe(self) -> bool:
+        """Half-open: the call being sent now becomes the probe (True). Closed / open / probe out: False."""
+        now = monotonic()
+        with self._lock:
+            if not self._half_open(now):
+                return False
+            self._probe_at = now
+            return True
+
+    def release_probe(self) -> None:
+        """The claimed probe did not run to an outcome (not sent / cut off): the next call may probe."""
+        with self._lock:
+            if self._opened_at is not None:
+                self._probe_at = None
+
+    def record(self, ok: bool) -> bool:
+        """Outcome of a call; True when this one opened the breaker."""
+        with self._lock:
+            if self._opened_at is not None:
+                # only the probe decides; calls started before the breaker opened do not count
+                if self._probe_at is not None:
+                    if ok:
+                        self._opened_at = self._probe_at = None
+                        self._outcomes.clear()
+                    else:
+                        self._opened_at, self._probe_at = monotonic(), None
+                return False
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+                self._opened_at = monotonic()
+                return True
+            return False
+
+
+class LatencyWindow:
+    def __init__(self, size: int) -> None:
+        self._samples: Deque[float] = deque(maxlen=max(1, size))
+        self._lock = Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def _parse_targets(raw: str) -> List[Target]:
+    # read on first use: llm_models imports this module
+    from agentic_ai_system.orchestration.llm_models import parse_target
+
+    targets: List[Target] = []
+    for item in (x.strip() for x in raw.split(",")):
+        if not item:
+            continue
+        target = parse_target(item)
+        if target is None:
+            logger.warning("LLM_FALLBACK_MODELS: %s is not in ALLOWED; ignored", item)
+            continue
+        targets.append(target)
+    return targets
+
+
+class LLMFailover:
+    def __init__(self) -> None:
+        self._fallbacks: Optional[List[Target]] = None
+        self.hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))  # 0: no hedging
+        self.hedge_min_s = int(os.getenv("LLM_HEDGE_MIN_MS", "1000")) / 1000
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self._window = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+        self._breaker_args = (
+            int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+            int(os.getenv("LLM_BREAKER_MIN_CALLS", "10")),
+            float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+            int(os.getenv("LLM_BREAKER_OPEN_MS", "30000")) / 1000,
+        )
+        self._breakers: Dict[Target, CircuitBreaker] = {}
+        self._latency: Dict[Target, LatencyWindow] = {}
+        self._lock = Lock()
+        LLM_CIRCUIT.set_function(self._metric_values)
+
+    def _metric_values(self) -> Dict[Any, float]:
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {(("lane", f"{p}/{m}"),): float(b.is_open()) for (p, m), b in breakers}
+
+    @property
+    def fallbacks(self) -> List[Target]:
+        if self._fallbacks is None:
+            # read on first use: main.py adds the offline providers to ALLOWED after import
+            self._fallbacks = _parse_targets(os.getenv("LLM_FALLBACK_MODELS", ""))
+        return self._fallbacks
+
+    def enabled(self) -> bool:
+        return bool(self.fallbacks)
+
+    def breaker(self, provider: str, model: str) -> CircuitBreaker:
+        key = (provider, model)
+        with self._lock:
+            b = self._breakers.get(key)
+            if b is None:
+                b = self._breakers[key] = CircuitBreaker(*self._breaker_args)
+            return b
+
+    def _latency_window(self, provider: str, model: str) -> LatencyWindow:
+        key = (provider, model)
+        with self._lock:
+            w = self._latency.get(key)
+            if w is None:
+                w = self._latency[key] = LatencyWindow(self._window)
+            return w
+
+    def record(self, provider: str, model: str, *, ok: Optional[bool], seconds: float) -> None:
+        """ok None: the call was cut off (hedge loser / cancelled); only its elapsed time is a sample."""
+        if not self.enabled():
+            return
+        if ok is not False:  # fast failures would pull the percentile down
+            self._latency_window(provider, model).add(seconds)
+        if ok is not None and self.breaker(provider, model).record(ok):
+            logger.warning("LLM %s/%s: error rate over threshold, circuit open", provider, model)
+
+    def claim_probe(self, provider: str, model: str) -> bool:
+        """Called as a call to provider/model is submitted; True when it is its breaker's probe."""
+        return self.enabled() and self.breaker(provider, model).claim_probe()
+
+    def release_probe(self, provider: str, model: str) -> None:
+        self.breaker(provider, model).release_probe()
+
+    def secondary(self, provider: str, model: str) -> Optional[Target]:
+        """First fallback other than provider/model whose breaker lets calls through (nothing claimed)."""
+        for target in self.fallbacks:
+            if target != (provider, model) and self.breaker(*target).available():
+                return target
+        return None
+
+    def route(self, provider: str, model: str) -> Target:
+        """provider/model, or a fallback while its breaker is open (no healthy fallback: provider/model anyway)."""
+        if not self.enabled() or self.breaker(provider, model).available():
+            return provider, model
+        target = self.secondary(provider, model)
+        if target is None:
+            return provider, model
+        LLM_FAILOVERS.inc(from_lane=f"{provider}/{model}", to_lane=f"{target[0]}/{target[1]}")
+        return target
+
+    def hedge_delay_s(self, provider: str, model: str) -> Optional[float]:
+        """How long to wait before hedging a call to provider/model; None: no hedging (off / too few samples)."""
+        if not self.enabled() or self.hedge_percentile <= 0:
+            return None
+        p = self._latency_window(provider, model).percentile(self.hedge_percentile, self.hedge_min_samples)
+        return max(p, self.hedge_min_s) if p is not None else None
+
+    def rebind(self, runnable: Any, provider: str, model: str) -> Optional[Any]:
+        """The same chain ending in provider/model's chat model; None when runnable is not `prompt | llm` / an llm."""
+        from agentic_ai_system.orchestration.llm_models import cached_llm
+
+        if isinstance(runnable, BaseLanguageModel):
+            return cached_llm(provider, model)
+        if isinstance(runnable, RunnableSequence) and isinstance(runnable.last, BaseLanguageModel):
+            return RunnableSequence(*runnable.steps[:-1], cached_llm(provider, model))
+        return None
+
+
+llm_failover = LLMFailover()
@@ -1,16 +1,107 @@
+import asyncio
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+
+from langchain_core.messages import BaseMessage
+
+from agentic_ai_system.orchestration.cancellation import CANCELLED_WORK, CancelToken, RequestCancelled
+from agentic_ai_system.orchestration.deadline import Deadline, DeadlineExceeded
+from agentic_ai_system.orchestration.limits import ConcurrencyLimit
+from agentic_ai_system.orchestration.llm_failover import LLM_HEDGES, llm_failover
+from agentic_ai_system.orchestration.llm_scheduler import LLMOverloaded, estimate_tokens, llm_scheduler
+from agentic_ai_system.orchestration.metrics import LLM_CALL_SECONDS, StageTimings
+from agentic_ai_system.orchestration.usage import RequestUsage, extract_usage
+from agentic_ai_system.orchestration.tracing import Span, tracer
+
+DEFAULT_MODELS = {
+    "openai": "gpt-4o-mini",
+    "openrouter": "openai/gpt-4o-mini",
+    "gemini": "gemini-1.5-flash",
+    "fake": "fake-model",
+    "replay": "replay",
+}
+
+# provider/model pairs a request may ask for (main.py, which adds the offline providers with
+# ENABLE_FAKE_LLM=1) and fallbacks / model routes may use (llm_failover.py, model_router.py)
+ALLOWED = {
+    "openai": {"gpt-4o", "gpt-4o-mini"},
+    "openrouter": {
+      "openai/gpt-4o",
+      "openai/gpt-4o-mini",
+      "openai/gpt-4.1-nano",
+      "openai/gpt-5-mini",
+      "openai/gpt-5.1-codex-mini",
+      "anthropic/claude-3.5-sonnet",
+      "google/gemini-2.5-flash"
+    },
+    "gemini": {"gemini-1.5-pro", "gemini-1.5-flash"},
+}
+
+
+def parse_target(raw: str, allowed: dict[str, set[str]] | None = None) -> tuple[str, str] | None:
+    """"provider/model" from config -> (provider, model); None when empty or not in ALLOWED."""
+    provider, _, model = (raw or "").strip().partition("/")  # openrouter models contain "/" themselves
+    provider = provider.lower()
+    if not model or model not in (ALLOWED if allowed is None else allowed).get(provider, ()):
+        return None
+    return provider, model
+
+
+def resolve_llm_target(provider: str | None = None, model: str | None = None) -> tuple[str, str]:
+    """(provider, model) exactly as get_llm would pick them; used for usage/metrics labels."""
+    provider = (provider or os.getenv("LLM_PROVIDER", "openai")).lower()
+    model = model or os.getenv("MODEL") or DEFAULT_MODELS.get(provider, "")
+    return provider, model
+
 
 def get_llm(provider: str | None = None, model: str | None = None, temperature: float | None = None):
     provider = (provider or os.getenv("LLM_PROVIDER", "openai")).lower()
     model = model or os.getenv("MODEL")
     temperature = float(temperature if temperature is not None else os.getenv("TEMPERATURE", "0.0"))
 
+    # offline providers: cassette replay / canned answers (see orchestration/fake_llm.py)
+    if provider in ("fake", "replay"):
+        from agentic_ai_system.orchestration.fake_llm import FakeChatModel
+        return FakeChatModel.from_env(model=model or DEFAULT_MODELS[provider], strict=(provider == "replay"))
+
+    llm = _provider_llm(provider, model, temperature)
+
+    # record real traffic for later replay
+    cassette = os.getenv("LLM_RECORD_CASSETTE")
+    if cassette:
+        from agentic_ai_system.orchestration.fake_llm import RecordingChatModel
+        _, resolved_model = resolve_llm_target(provider, model)
+        return RecordingChatModel(inner=llm, cassette_path=cassette, provider=provider, model_name=resolved_model)
+    return llm
+
+
+_LLM_CACHE: dict[tuple[str, str], object] = {}
+_LLM_CACHE_LOCK = threading.Lock()
+
+
+def cached_llm(provider: str, model: str):
+    """get_llm(provider, model) built once per process (model routes / fallbacks; default temperature)."""
+    key = (provider, model)
+    with _LLM_CACHE_LOCK:
+        llm = _LLM_CACHE.get(key)
+    if llm is None:
+        llm = get_llm(provider=provider, model=model)
+        with _LLM_CACHE_LOCK:
+            llm = _LLM_CACHE.setdefault(key, llm)
+    return llm
+
+
+def _provider_llm(provider: str, model: str | None, temperature: float):
     if provider == "openai":
         from langchain_openai import ChatOpenAI
         return ChatOpenAI(
             model=model or "gpt-4o-mini",
             temperature=temperature,
             api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=_client_retries(),
         )
 
     if provider == "openrouter":
@@ -20,6 +111,7 @@ def get_llm(provider: str | None = None, model: str | None = None, temperature:
             temperature=temperature,
             api_key=os.getenv("OPENROUTER_API_KEY"),
             base_url="https://openrouter.ai/api/v1",
+            max_retries=_client_retries(),
         )
 
     if provider == "gemini":
@@ -28,6 +120,312 @@ def get_llm(provider: str | None = None, model: str | None = None, temperature:
             model=model or "gemini-1.5-flash",
             temperature=temperature,
             google_api_key=os.getenv("GOOGLE_API_KEY"),
+            max_retries=_client_retries(),
         )
 
     raise ValueError(f"Unsupported LLM provider: {provider}")
+
+
+def _client_retries() -> int:
+    # 429 / 5xx are retried by the scheduler (backoff + re-admission), not blindly by the client
+    return int(os.getenv("LLM_CLIENT_MAX_RETRIES", "0"))
+
+
+# Shared pool for deadline-bounded LLM calls. Workers are only used when a
+# deadline is given, so the pool stays small.
+_LLM_POOL = None
+_LLM_POOL_LOCK = threading.Lock()
+
+
+def _llm_pool() -> ThreadPoolExecutor:
+    global _LLM_POOL
+    with _LLM_POOL_LOCK:
+        if _LLM_POOL is None:
+            _LLM_POOL = ThreadPoolExecutor(
+                max_workers=int(os.getenv("LLM_CALL_WORKERS", "16")),
+                thread_name_prefix="llm-call",
+            )
+        return _LLM_POOL
+
+
+# Event loop thread for cancellable calls: cancelling the ainvoke task closes
+# the provider HTTP request, while a sync invoke in the pool can only be abandoned.
+_LLM_LOOP = None
+
+
+def _llm_loop() -> asyncio.AbstractEventLoop:
+    global _LLM_LOOP
+    with _LLM_POOL_LOCK:
+        if _LLM_LOOP is None:
+            _LLM_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LLM_LOOP.run_forever, name="llm-async", daemon=True).start()
+        return _LLM_LOOP
+
+
+def _submit(runnable, input, cancel: CancelToken | None) -> Future:
+    if cancel is not None and os.getenv("LLM_ASYNC_CANCEL", "1") != "0":
+        return asyncio.run_coroutine_threadsafe(runnable.ainvoke(input), _llm_loop())
+    return _llm_pool().submit(runnable.invoke, input)
+
+
+def _wait_first(
+    futs: list[Future],
+    deadline: Deadline | None,
+    cancel: CancelToken | None,
+    stage: str,
+    timeout_s: float | None = None,
+) -> Future | None:
+    """
+    First of futs to finish, unless the deadline passes or the request is cancelled first
+    (then all of them are cancelled). None when timeout_s passes before any finishes.
+    """
+    wake = threading.Event()
+    for fut in futs:
+        fut.add_done_callback(lambda _: wake.set())
+    remove = cancel.on_cancel(lambda _: wake.set()) if cancel is not None else (lambda: None)
+    wait_s = deadline.remaining_s() if deadline is not None else None
+    timed = timeout_s is not None and (wait_s is None or timeout_s < wait_s)
+    try:
+        wake.wait(timeout=timeout_s if timed else wait_s)
+    finally:
+        remove()
+    for fut in futs:
+        if fut.done() and not fut.cancelled():
+            return fut
+    if timed and not (cancel is not None and cancel.cancelled):
+        return None
+    # queued calls never start; running async calls are cancelled, sync ones abandoned
+    stopped = all([fut.cancel() for fut in futs])
+    if cancel is not None and cancel.cancelled:
+        CANCELLED_WORK.inc(kind="llm_call" if stopped else "llm_call_abandoned")
+        raise RequestCancelled(stage, cancel.reason or "")
+    if deadline is not None:
+        deadline.exhaust(stage)
+    raise DeadlineExceeded(stage)
+
+
+def _wait(fut: Future, deadline: Deadline | None, cancel: CancelToken | None, stage: str):
+    """Result of fut, unless the deadline passes or the request is cancelled first."""
+    return _wait_first([fut], deadline, cancel, stage).result()
+
+
+def _track(runnable, input, cancel, target: tuple[str, str], on_done=None) -> Future:
+    """
+    Submit the call and feed its outcome / latency to the circuit breaker and hedge percentile
+    of its provider/model. A half-open breaker's probe is claimed here, when the call is really
+    sent, and given back when the call is not sent or is cut off before an outcome.
+    """
+    probe = llm_failover.claim_probe(*target)
+    try:
+        fut = _submit(runnable, input, cancel)
+    except BaseException:
+        if probe:
+            llm_failover.release_probe(*target)
+        raise
+    t0 = time.perf_counter()
+
+    def done(f: Future) -> None:
+        ok = None if f.cancelled() else f.exception() is None
+        llm_failover.record(*target, ok=ok, seconds=time.perf_counter() - t0)
+        if ok is None and probe:
+            llm_failover.release_probe(*target)
+        if on_done is not None:
+            on_done(f if ok else None)
+
+    fut.add_done_callback(done)
+    return fut
+
+
+def _call_provider(runnable, input, *, target, deadline, cancel, stage, priority, est_tokens):
+    """
+    One call on the async loop / pool, as (response, provider/model that answered).
+    Interactive calls still running after their lane's latency percentile are hedged: the same
+    prompt goes to the first healthy fallback too and the first answer wins (orchestration/llm_failover.py).
+    """
+    primary = _track(runnable, input, cancel, target)
+    delay = llm_failover.hedge_delay_s(*target) if priority == "interactive" else None
+    if delay is None:
+        return _wait(primary, deadline, cancel, stage), target
+
+    lane_label = f"{target[0]}/{target[1]}"
+    if _wait_first([primary], deadline, cancel, stage, timeout_s=delay) is not None:
+        LLM_HEDGES.inc(lane=lane_label, result="not_needed")
+        return primary.result(), target
+
+    second = llm_failover.secondary(*target)
+    hedge_runnable = llm_failover.rebind(runnable, *second) if second is not None else None
+    lane = llm_scheduler.lane(*second) if hedge_runnable is not None else None
+    if lane is None or not lane.try_acquire(priority, est_tokens):
+        LLM_HEDGES.inc(lane=lane_label, result="skipped")
+        return _wait(primary, deadline, cancel, stage), target
+
+    try:
+        hedge = _track(
+            hedge_runnable,
+            input,
+            cancel,
+            second,
+            on_done=lambda f: lane.release(est_tokens, _used_tokens(f.result()) if f is not None else None),
+        )
+    except BaseException:
+        lane.release(est_tokens, None)
+        raise
+    pending = [primary, hedge]
+    while True:
+        first = _wait_first(pending, deadline, cancel, stage)
+        pending.remove(first)
+        if first.exception() is None or not pending:
+            break  # a failed call waits for the other one
+    for fut in pending:
+        fut.cancel()  # the slower call: cancelled (async) / abandoned (pool)
+    LLM_HEDGES.inc(lane=lane_label, result="primary_won" if first is primary else "hedge_won")
+    return first.result(), (target if first is primary else second)
+
+
+def invoke_llm(
+    runnable,
+    input,
+    *,
+    deadline: Deadline | None = None,
+    stage: str = "llm",
+    timings: StageTimings | None = None,
+    usage: RequestUsage | None = None,
+    provider: str = "",
+    model: str = "",
+    span_parent: Span | None = None,
+    cancel: CancelToken | None = None,
+    limit: ConcurrencyLimit | None = None,
+    priority: str = "interactive",
+):
+    """
+    Invoke a LangChain runnable (prompt | llm) within the request deadline.
+    - deadline and cancel None -> waits for the call without a limit (still hedged / breaker-tracked)
+    - not enough budget left -> DeadlineExceeded before the call is made
+    - call outlives the budget -> DeadlineExceeded
+    - request cancelled (client disconnect) -> RequestCancelled
+    In both cases the provider call is cancelled (abandoned with LLM_ASYNC_CANCEL=0).
+    With a limit (batch runs), the call waits for a slot first, within the same deadline / cancel.
+    Then the provider/model lane of the LLM scheduler admits it (orchestration/llm_scheduler.py):
+    LLMOverloaded when it cannot be admitted, 429 / 5xx retried with backoff.
+    With LLM_FALLBACK_MODELS (orchestration/llm_failover.py) a provider/model whose circuit
+    breaker is open is replaced by a fallback, and slow interactive calls are hedged; usage is
+    recorded for the provider/model that answered.
+    Wall time is recorded per calling stage (metrics + per-request timings);
+    token usage is recorded when a RequestUsage handle is given, and an
+    `llm.<stage>` span is emitted under span_parent.
+    """
+    span = None
+    if span_parent is not None:
+        span = tracer.start_span(
+            f"llm.{stage}",
+            parent=span_parent,
+            attributes={"gen_ai.system": provider, "gen_ai.request.model": model},
+        )
+
+    target = llm_failover.route(provider, model)
+    if target != (provider, model):
+        rebound = llm_failover.rebind(runnable, *target)
+        if rebound is None:
+            target = (provider, model)
+        else:
+            runnable = rebound
+            if span is not None:
+                span.set_attribute("llm.failover_to", f"{target[0]}/{target[1]}")
+    served = target
+    est_tokens = estimate_tokens(_prompt_chars(input))
+
+    t0 = time.perf_counter()
+    started = False
+
+    def call():
+        nonlocal t0, started, served
+        if not started:
+            # call time without the waits for a slot / admission (text2sql_*_wait_seconds); retries included
+            t0, started = time.perf_counter(), True
+        if cancel is not None:
+            cancel.check(stage)
+        if deadline is not None and not deadline.has_budget(deadline.min_llm_ms):
+            deadline.exhaust(stage)
+            raise DeadlineExceeded(stage)
+        resp, served = _call_provider(
+            runnable, input, target=target, deadline=deadline, cancel=cancel,
+            stage=stage, priority=priority, est_tokens=est_tokens,
+        )
+        return resp
+
+    try:
+        with limit.slot(stage, deadline=deadline, cancel=cancel) if limit is not None else nullcontext():
+            resp = llm_scheduler.call(
+                call,
+                provider=target[0],
+                model=target[1],
+                stage=stage,
+                priority=priority,
+                est_tokens=est_tokens,
+                used_tokens=_used_tokens,
+                deadline=deadline,
+                cancel=cancel,
+            )
+
+        if span is not None and served != (provider, model):
+            span.set_attribute("gen_ai.response.model", f"{served[0]}/{served[1]}")
+        if usage is not None:
+            rec = usage.record(
+                resp,
+                stage=stage,
+                provider=served[0],
+                model=served[1],
+                wall_ms=int((time.perf_counter() - t0) * 1000),
+                prompt_chars=_prompt_chars(input),
+            )
+            if span is not None:
+                span.set_attributes(
+                    {
+                        "gen_ai.usage.input_tokens": rec.input_tokens,
+                        "gen_ai.usage.output_tokens": rec.output_tokens,
+                        "gen_ai.usage.cached_tokens": rec.cached_tokens,
+                        "llm.cost_usd": rec.cost_usd,
+                    }
+                )
+        return resp
+    except DeadlineExceeded as e:
+        if span is not None:
+            span.set_error(str(e), error_code="DEADLINE_EXCEEDED")
+        raise
+    except RequestCancelled as e:
+        if span is not None:
+            span.set_error(str(e), error_code="REQUEST_CANCELLED")
+        raise
+    except LLMOverloaded as e:
+        if span is not None:
+            span.set_error(str(e), error_code="LLM_OVERLOADED")
+        raise
+    except Exception as e:
+        if span is not None:
+            span.set_error(str(e), error_code="LLM_CALL_FAILED")
+        raise
+    finally:
+        if span is not None:
+            span.set_attribute("llm.prompt_chars", _prompt_chars(input))
+            span.end()
+        dt = time.perf_counter() - t0
+        LLM_CALL_SECONDS.observe(dt, stage=stage)
+        if timings is not None:
+            timings.record(f"llm.{stage}", dt)
+
+
+def _used_tokens(resp) -> int | None:
+    u = extract_usage(resp)
+    total = u["input_tokens"] + u["output_tokens"]
+    return total or None  # provider reported nothing: keep the estimate
+
+
+def _prompt_chars(input) -> int:
+    if isinstance(input, dict):
+        return sum(len(v) for v in input.values() if isinstance(v, str))
+    if isinstance(input, str):
+        return len(input)
+    if isinstance(input, (list, tuple)):
+        # chat model called with messages directly (validators/llm_domain_guard.py)
+        return sum(len(m.content) for m in input if isinstance(m, BaseMessage) and isinstance(m.content, str))
+    return 0
@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+"""
+Admission control and rate limiting for LLM calls.
+
+Every LLM call (text_to_sql, composer, the LLM domain guard) goes through
+one process-wide scheduler before it reaches the provider. Calls are
+grouped in lanes, one per provider/model (or per provider, see LLM_LIMITS),
+and a lane admits a call only when
+
+- fewer than `concurrency` calls of the lane are in flight
+- the request bucket (`rpm`) and the token bucket (`tpm`, estimated from
+  the prompt, corrected with the reported usage afterwards) have room
+- the lane is not cooling down after a 429 from the provider
+
+Waiting calls are served by priority (interactive before background jobs
+before batch questions), first come first served within a priority. A
+call is rejected at once with LLMOverloaded (retryable) when
+`queue_max` calls of its priority already wait, and after `queue_timeout_ms`
+of waiting; the request deadline and cancellation end the wait as well.
+
+429 / 5xx / connection errors are retried with exponential backoff and
+full jitter (LLM_MAX_RETRIES, LLM_BACKOFF_BASE_MS, LLM_BACKOFF_MAX_MS),
+honouring Retry-After; each retry is admitted again. The provider
+clients' own retries are off (LLM_CLIENT_MAX_RETRIES) so a failure is not
+retried blindly twice.
+
+    resp = llm_scheduler.call(lambda: chain.invoke(x), provider="openai", model="gpt-4o-mini",
+                              priority="interactive", est_tokens=1200, deadline=deadline, cancel=cancel)
+
+Limits (env defaults, per lane):
+    LLM_MAX_CONCURRENCY, LLM_RPM, LLM_TPM (0 = unlimited), LLM_QUEUE_MAX,
+    LLM_QUEUE_TIMEOUT_MS (interactive), LLM_BACKGROUND_QUEUE_TIMEOUT_MS (jobs / batch)
+    LLM_LIMITS='{"openai/gpt-4o": {"rpm": 500, "tpm": 200000}, "gemini": {"concurrency": 4}}'
+"""
+
+from dataclasses import dataclass, replace
+from threading import Condition, Event, Lock
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+
+from agentic_ai_system.orchestration.cancellation import CancelToken, RequestCancelled
+from agentic_ai_system.orchestration.deadline import Deadline, DeadlineExceeded
+from agentic_ai_system.orchestration.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"interactive": 0, "background": 1, "batch": 2}
+
+LLM_QUEUE_WAIT = registry.histogram(
+    "text2sql_llm_queue_wait_seconds",
+    "Time LLM calls waited for admission, by lane and priority.",
+    buckets=(0.001, 0.01, 0.05, 0.25, 1, 2.5, 5, 15, 60),
+)
+LLM_ADMISSIONS = registry.counter(
+    "text2sql_llm_admissions_total",
+    "LLM call admission decisions by lane and result (admitted / queue_full / queue_timeout / deadline / cancelled).",
+)
+LLM_BACKOFFS = registry.counter(
+    "text2sql_llm_backoff_retries_total", "LLM calls retried after a provider error, by lane and reason (429 / 5xx / connection)."
+)
+LLM_LANE = registry.gauge("text2sql_llm_lane_calls", "LLM calls per lane (in_flight / queued).")
+
+
+class LLMOverloaded(Exception):
+    """The call was not admitted (queue full / waited too long); retrying later may succeed."""
+
+    def __init__(self, lane: str, reason: str, retry_after_ms: int) -> None:
+        super().__init__(f"LLM {lane} is overloaded ({reason}); retry in {retry_after_ms} ms")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after_ms = retry_after_ms
+
+
+@dataclass(frozen=True)
+class LaneLimits:
+    concurrency: int = 8
+    rpm: float = 0.0  # 0: unlimited
+    tpm: float = 0.0
+    queue_max: int = 64  # waiting calls per priority
+    queue_timeout_ms: int = 5000
+    background_queue_timeout_ms: int = 120000
+
+
+def _limits_from_env() -> Tuple[LaneLimits, Dict[str, LaneLimits]]:
+    default = LaneLimits(
+        concurrency=max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "8"))),
+        rpm=float(os.getenv("LLM_RPM", "0")),
+        tpm=float(os.getenv("LLM_TPM", "0")),
+        queue_max=max(0, int(os.getenv("LLM_QUEUE_MAX", "64"))),
+        queue_timeout_ms=int(os.getenv("LLM_QUEUE_TIMEOUT_MS", "5000")),
+        background_queue_timeout_ms=int(os.getenv("LLM_BACKGROUND_QUEUE_TIMEOUT_MS", "120000")),
+    )
+    overrides: Dict[str, LaneLimits] = {}
+    raw = os.getenv("LLM_LIMITS", "").strip()
+    if raw:
+        try:
+            for key, values in json.loads(raw).items():
+                overrides[key.lower()] = replace(default, **values)
+        except (ValueError, TypeError, AttributeError):
+            logger.exception("LLM_LIMITS is not valid; using the LLM_* defaults for every lane")
+    return default, overrides
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously; the burst is one minute's worth. May go into debt."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self._t = monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._t) * self.rate)
+        self._t = now
+
+    def wait_s(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0: now)."""
+        self._refill(now)
+        need = min(amount, self.capacity) - self.level
+        return need / self.rate if need > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def give_back(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens")
+
+    def __init__(self, priority: int, tokens: int) -> None:
+        self.priority = priority
+        self.tokens = tokens
+
+
+class Lane:
+    def __init__(self, name: str, limits: LaneLimits) -> None:
+        self.name = name
+        self.limits = limits
+        self._cond = Condition()
+        self._in_flight = 0
+        self._heap: List[Tuple[int, int, _Waiter]] = []
+        self._queued = [0] * len(PRIORITIES)
+        self._seq = itertools.count()
+        self._requests = TokenBucket(limits.rpm) if limits.rpm > 0 else None
+        self._tokens = TokenBucket(limits.tpm) if limits.tpm > 0 else None
+        self._cooldown_until = 0.0
+
+    def _wake(self, _reason: str = "") -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _ready_in(self, w: _Waiter, now: float) -> Optional[float]:
+        """Seconds until w may start (0: now); None while every slot is taken."""
+        if self._in_flight >= self.limits.concurrency:
+            return None
+        wait = max(0.0, self._cooldown_until - now)
+        if self._requests is not None:
+            wait = max(wait, self._requests.wait_s(1, now))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait_s(w.tokens, now))
+        return wait
+
+    def _drop(self, w: _Waiter) -> None:
+        self._heap = [e for e in self._heap if e[2] is not w]
+        heapq.heapify(self._heap)
+        self._queued[w.priority] -= 1
+        self._cond.notify_all()  # the next waiter may be at the head now
+
+    def _reject(self, w: _Waiter, reason: str, now: float) -> LLMOverloaded:
+        self._drop(w)
+        LLM_ADMISSIONS.inc(lane=self.name, result=reason)
+        retry_ms = max(1000, int((self._cooldown_until - now) * 1000))
+        return LLMOverloaded(self.name, reason, retry_ms)
+
+    def acquire(
+        self,
+        priority: str,
+        tokens: int,
+        *,
+        stage: str,
+        deadline: Optional[Deadline] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> None:
+        prio = PRIORITIES.get(priority, PRIORITIES["interactive"])
+        timeout_ms = self.limits.queue_timeout_ms if prio == 0 else self.limits.background_queue_timeout_ms
+        t0 = monotonic()
+        give_up_at = t0 + timeout_ms / 1000
+        w = _Waiter(prio, tokens)
+        remove = cancel.on_cancel(self._wake) if cancel is not None else (lambda: None)
+        try:
+            with self._cond:
+                # a full queue still lets a call through that could start right away
+                if self._queued[prio] >= self.limits.queue_max and (self._heap or self._ready_in(w, t0) != 0):
+                    LLM_ADMISSIONS.inc(lane=self.name, result="queue_full")
+                    raise LLMOverloaded(self.name, "queue_full", max(1000, timeout_ms))
+                heapq.heappush(self._heap, (prio, next(self._seq), w))
+                self._queued[prio] += 1
+                while True:
+                    now = monotonic()
+                    if cancel is not None and cancel.cancelled:
+                        self._drop(w)
+                        LLM_ADMISSIONS.inc(lane=self.name, result="cancelled")
+                        raise RequestCancelled(stage, cancel.reason or "")
+                    ready_in = self._ready_in(w, now) if self._heap[0][2] is w else None
+                    if ready_in == 0:
+                        heapq.heappop(self._heap)
+                        self._queued[prio] -= 1
+                        self._start(tokens)
+                        self._cond.notify_all()  # the new head may be able to start too
+                        break
+                    # sleep until the buckets / cooldown allow the head, or something changes
+                    timeout = give_up_at - now
+                    if ready_in is not None:
+                        if now + ready_in > give_up_at:
+                            raise self._reject(w, "queue_timeout", now)
+                        timeout = min(timeout, ready_in)
+                    if deadline is not None:
+                        left = deadline.remaining_s()
+                        if left <= 0:
+                            self._drop(w)
+                            LLM_ADMISSIONS.inc(lane=self.name, result="deadline")
+                            deadline.exhaust(stage)
+                            raise DeadlineExceeded(stage)
+                        timeout = min(timeout, left)
+                    if timeout <= 0:
+                        raise self._reject(w, "queue_timeout", now)
+                    self._cond.wait(timeout)
+        finally:
+            remove()
+        LLM_ADMISSIONS.inc(lane=self.name, result="admitted")
+        LLM_QUEUE_WAIT.observe(monotonic() - t0, lane=self.name, priority=priority)
+
+    def _start(self, tokens: int) -> None:
+        self._in_flight += 1
+        if self._requests is not None:
+            self._requests.take(1)
+        if self._tokens is not None:
+            self._tokens.take(tokens)
+
+    def try_acquire(self, priority: str, tokens: int) -> bool:
+        """Admit now or not at all (hedged duplicates never queue behind other calls); release() afterwards."""
+        w = _Waiter(PRIORITIES.get(priority, PRIORITIES["interactive"]), tokens)
+        with self._cond:
+            if self._heap or self._ready_in(w, monotonic()) != 0:
+                return False
+            self._start(tokens)
+        LLM_ADMISSIONS.inc(lane=self.name, result="admitted")
+        return True
+
+    def release(self, estimated_tokens: int, used_tokens: Optional[int]) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if self._tokens is not None and used_tokens is not None:
+                # settle the estimate against the reported usage
+                delta = estimated_tokens - used_tokens
+                if delta > 0:
+                    self._tokens.give_back(delta)
+                else:
+                    self._tokens.take(-delta)
+            self._cond.notify_all()
+
+    def cool_down(self, seconds: float) -> None:
+        """Provider said 429: admit nothing new for `seconds`."""
+        with self._cond:
+            self._cooldown_until = max(self._cooldown_until, monotonic() + seconds)
+
+    def counts(self) -> Tuple[int, int]:
+        return self._in_flight, sum(self._queued)
+
+
+def _status_code(e: BaseException) -> Optional[int]:
+    for obj in (e, getattr(e, "response", None)):
+        code = getattr(obj, "status_code", None)
+        if isinstance(code, int):
+            return code
+    code = getattr(e, "code", None)  # google.api_core exceptions
+    return code if isinstance(code, int) else None
+
+
+def retry_reason(e: BaseException) -> Optional[str]:
+    """'429' / '5xx' / 'connection' for provider errors worth retrying, else None."""
+    if isinstance(e, (DeadlineExceeded, LLMOverloaded)):
+        return None
+    code = _status_code(e)
+    name = type(e).__name__
+    if code == 429 or "RateLimit" in name or "ResourceExhausted" in name:
+        return "429"
+    if (code is not None and code >= 500) or name in ("InternalServerError", "ServiceUnavailable", "BadGateway"):
+        return "5xx"
+    if name in ("APIConnectionError", "APITimeoutError", "ConnectionError", "ConnectTimeout", "ReadTimeout"):
+        return "connection"
+    return None
+
+
+def _retry_after_s(e: BaseException) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None  # HTTP-date form: use the computed backoff
+
+
+class LLMScheduler:
+    def __init__(self) -> None:
+        self._default, self._overrides = _limits_from_env()
+        self._lanes: Dict[str, Lane] = {}
+        self._lock = Lock()
+        self.max_retries = max(0, int(os.getenv("LLM_MAX_RETRIES", "2")))
+        self.backoff_base_s = int(os.getenv("LLM_BACKOFF_BASE_MS", "500")) / 1000
+        self.backoff_max_s = int(os.getenv("LLM_BACKOFF_MAX_MS", "8000")) / 1000
+        LLM_LANE.set_function(self._metric_values)
+
+    def _metric_values(self) -> Dict[Any, float]:
+        with self._lock:
+            lanes = list(self._lanes.values())
+        out: Dict[Any, float] = {}
+        for lane in lanes:
+            in_flight, queued = lane.counts()
+            out[(("lane", lane.name), ("state", "in_flight"))] = in_flight
+            out[(("lane", lane.name), ("state", "queued"))] = queued
+        return out
+
+    def lane(self, provider: str, model: str) -> Lane:
+        """provider/model entry of LLM_LIMITS, else the provider entry (one lane for all its models), else the defaults."""
+        provider, model = (provider or "").lower(), (model or "").lower()
+        key = f"{provider}/{model}"
+        if key in self._overrides:
+            name, limits = key, self._overrides[key]
+        elif provider in self._overrides:
+            name, limits = provider, self._overrides[provider]
+        else:
+            name, limits = key, self._default
+        with self._lock:
+            lane = self._lanes.get(name)
+            if lane is None:
+                lane = self._lanes[name] = Lane(name, limits)
+            return lane
+
+    def backoff_s(self, attempt: int) -> float:
+        # full jitter: uniform in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt)))
+
+    def call(
+        self,
+        fn: Callable[[], Any],
+        *,
+        provider: str,
+        model: str,
+        stage: str = "llm",
+        priority: str = "interactive",
+        est_tokens: int = 0,
+        used_tokens: Optional[Callable[[Any], Optional[int]]] = None,
+        deadline: Optional[Deadline] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> Any:
+        """
+        fn() once admitted by the provider/model lane; provider 429 / 5xx are retried with backoff.
+        LLMOverloaded when not admitted; DeadlineExceeded / RequestCancelled when the request ends first.
+        """
+        lane = self.lane(provider, model)
+        attempt = 0
+        while True:
+            lane.acquire(priority, est_tokens, stage=stage, deadline=deadline, cancel=cancel)
+            used: Optional[int] = None
+            try:
+                resp = fn()
+                used = used_tokens(resp) if used_tokens is not None else None
+                return resp
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_s(attempt)
+                retry_after = _retry_after_s(e)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if reason == "429":
+                    lane.cool_down(delay)
+                if deadline is not None and deadline.remaining_s() < delay + deadline.min_llm_ms / 1000:
+                    raise  # no budget left for another try
+                LLM_BACKOFFS.inc(lane=lane.name, reason=reason)
+                logger.warning("%s: LLM %s failed (%s), retry %d in %.2fs", stage, lane.name, reason, attempt + 1, delay)
+            finally:
+                lane.release(est_tokens, used)
+            _sleep(delay, stage, cancel)
+            attempt += 1
+
+
+def _sleep(seconds: float, stage: str, cancel: Optional[CancelToken]) -> None:
+    if cancel is None:
+        Event().wait(seconds)
+        return
+    wake = Event()
+    remove = cancel.on_cancel(lambda _: wake.set())
+    try:
+        wake.wait(seconds)
+    finally:
+        remove()
+    cancel.check(stage)
+
+
+def estimate_tokens(prompt_chars: int) -> int:
+    """Tokens charged against the lane's tpm before the call: prompt (~3 chars/token for Thai/SQL) + expected output."""
+    return prompt_chars // 3 + int(os.getenv("LLM_EST_OUTPUT_TOKENS", "512"))
+
+
+llm_scheduler = LLMScheduler()
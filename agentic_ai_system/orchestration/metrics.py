@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+No client library / network dependency: metrics live in a module-level
+registry and `registry.render()` produces the text format served at
+`/metrics`.
+
+    from agentic_ai_system.orchestration.metrics import STAGE_SECONDS
+    STAGE_SECONDS.observe(0.42, stage="compose")
+
+Per-request stage timings are collected with StageTimings, which feeds the
+stage histogram and also returns a dict for the SSE `done` event.
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from threading import RLock
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import bisect
+import time
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self._lock = RLock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        ...
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Settable gauge; optionally backed by a callback evaluated at render time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Optional[Callable[[], Dict[LabelKey, float]]] = None) -> None:
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self._fn = fn
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def set_function(self, fn: Callable[[], Dict[LabelKey, float]]) -> None:
+        self._fn = fn
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self._fn is not None:
+            try:
+                values.update(self._fn())
+            except Exception:
+                # a broken callback must never break /metrics
+                pass
+        return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelKey, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[idx] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(_label_key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        out: List[str] = []
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                out.append(f"{self.name}_bucket{_fmt_labels(key, ('le', _fmt_value(bound)))} {cumulative}")
+            out.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(key)} {cumulative}")
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = RLock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"metric {metric.name} already registered as {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._register(Gauge(name, help_text))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ---- pipeline metrics ----
+STAGE_SECONDS = registry.histogram(
+    "text2sql_stage_duration_seconds", "Duration of each stream_sse_pipeline stage."
+)
+LLM_CALL_SECONDS = registry.histogram(
+    "text2sql_llm_call_duration_seconds", "Wall time of individual LLM calls by calling stage."
+)
+RETRIES = registry.counter(
+    "text2sql_retries_total", "Retry attempts by kind (text2sql_internal / validation / execution)."
+)
+ERRORS = registry.counter(
+    "text2sql_errors_total", "Error events sent to clients by error_code."
+)
+CACHE_REQUESTS = registry.counter(
+    "text2sql_cache_requests_total", "Cache lookups by cache name and result (hit / miss)."
+)
+REQUESTS = registry.counter(
+    "text2sql_requests_total", "Pipeline runs by final status."
+)
+INFLIGHT_STREAMS = registry.gauge(
+    "text2sql_inflight_streams", "SSE pipeline streams currently running."
+)
+DB_POOL = registry.gauge(
+    "text2sql_db_pool_connections", "SQLAlchemy pool connections by state (checked_out / idle / size)."
+)
+
+
+class StageTimings:
+    """
+    Collects per-request stage durations.
+    - stage(): context manager that times a block
+    - record(): add a measured duration (e.g. time-to-first-row)
+    Repeated stages (retries) are summed in as_dict() and observed individually.
+    """
+
+    def __init__(self) -> None:
+        self._lock = RLock()
+        self._ms: Dict[str, float] = {}
+        self._t0 = time.perf_counter()
+        self._finished = False
+
+    def record(self, stage: str, seconds: float) -> None:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        with self._lock:
+            self._ms[stage] = self._ms.get(stage, 0.0) + seconds * 1000
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def since_start(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def finish(self) -> bool:
+        """Record request_total once; returns False if already finished."""
+        with self._lock:
+            if self._finished:
+                return False
+            self._finished = True
+        self.record("request_total", self.since_start())
+        return True
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {k: int(round(v)) for k, v in self._ms.items()}
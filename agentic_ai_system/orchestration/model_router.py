@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+"""
+Complexity-based model routing.
+
+Most questions ("how many disaster areas today") are answered correctly by
+a small model; multi-table, grouped, time-series questions need a strong
+one. With LLM_ROUTE_FAST and LLM_ROUTE_STRONG set ("provider/model" from
+the ALLOWED table) a request that does not name a model is routed:
+
+- the question gets a complexity score from the tables schema retrieval
+  matched, the joins between them in the FK graph, aggregation and time
+  keywords, and the conversation depth (Complexity.signals)
+- score >= LLM_ROUTE_STRONG_SCORE goes to the strong model, below to the
+  fast one
+- repair attempts (SQL that failed to execute / parse / validate) always
+  use the strong model
+
+    route = model_router.route(model_router.estimate(question, retrieved, history=h, summary=s))
+    route = model_router.route(c, repair=True)   # -> strong
+
+Decisions and per-route outcome / latency are exported as metrics and the
+`done` event carries the route of the request.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import os
+import re
+
+from agentic_ai_system.orchestration.llm_models import parse_target
+from agentic_ai_system.orchestration.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+ROUTE_DECISIONS = registry.counter(
+    "text2sql_model_route_decisions_total",
+    "Text-to-SQL model routing decisions by route (fast / strong) and reason (simple / complex / repair).",
+)
+ROUTE_REQUESTS = registry.counter(
+    "text2sql_model_route_requests_total", "Routed requests by initial route and final status (success / fail / cancelled / incomplete)."
+)
+ROUTE_SECONDS = registry.histogram(
+    "text2sql_model_route_request_duration_seconds",
+    "End-to-end latency of routed requests by initial route.",
+    buckets=(0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+)
+
+_AGGREGATION = re.compile(
+    r"(รวม|ทั้งหมดกี่|เฉลี่ย|สูงสุด|ต่ำสุด|มากที่สุด|น้อยที่สุด|แยกตาม|แยก|จัดอันดับ|อันดับ|เปรียบเทียบ|ร้อยละ|สัดส่วน|"
+    r"\bsum\b|\bavg\b|average|\bmax\b|\bmin\b|group by|\bper\b|top\s*\d+|\brank|compare|ratio|percent)",
+    re.IGNORECASE,
+)
+_TIME = re.compile(
+    r"(รายวัน|รายสัปดาห์|รายเดือน|รายไตรมาส|รายปี|ตั้งแต่|ระหว่าง|ช่วง|ย้อนหลัง|แนวโน้ม|เทียบกับ|ปีที่แล้ว|เดือนที่แล้ว|"
+    r"daily|weekly|monthly|quarterly|yearly|between|since|trend|year over year|last (?:month|year))",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Complexity:
+    score: int
+    signals: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str  # fast | strong
+    provider: str
+    model: str
+    reason: str  # simple | complex | repair
+    score: int = 0
+
+    def report(self) -> Dict[str, Any]:
+        return {"route": self.name, "provider": self.provider, "model": self.model, "reason": self.reason, "score": self.score}
+
+
+def _target(env: str) -> Optional[Tuple[str, str]]:
+    raw = os.getenv(env, "").strip()
+    target = parse_target(raw) if raw else None
+    if raw and target is None:
+        logger.warning("%s: %s is not in ALLOWED; model routing is off", env, raw)
+    return target
+
+
+def _distinct_hits(pattern: re.Pattern, text: str) -> int:
+    return len({m.group(0).lower() for m in pattern.finditer(text)})
+
+
+def conversation_depth(history: Optional[List[Dict[str, Any]]], summary: Optional[Dict[str, Any]]) -> int:
+    """Earlier user turns of the conversation (the rolling summary counts those no longer in history)."""
+    in_history = sum(1 for m in history or [] if (m.get("role") or "") == "user")
+    return max(in_history, int((summary or {}).get("turns") or 0))
+
+
+class ModelRouter:
+    def __init__(self) -> None:
+        self.strong_score = int(os.getenv("LLM_ROUTE_STRONG_SCORE", "4"))
+        self._targets: Optional[Tuple[Optional[Tuple[str, str]], Optional[Tuple[str, str]]]] = None
+
+    def targets(self) -> Tuple[Optional[Tuple[str, str]], Optional[Tuple[str, str]]]:
+        if self._targets is None:
+            # read on first use: main.py adds the offline providers to ALLOWED after import
+            self._targets = (_target("LLM_ROUTE_FAST"), _target("LLM_ROUTE_STRONG"))
+        return self._targets
+
+    def enabled(self) -> bool:
+        fast, strong = self.targets()
+        return fast is not None and strong is not None
+
+    def estimate(
+        self,
+        question: str,
+        retrieved: Optional[Dict[str, Any]] = None,
+        *,
+        history: Optional[List[Dict[str, Any]]] = None,
+        summary: Optional[Dict[str, Any]] = None,
+    ) -> Complexity:
+        """Score a question; `retrieved` is MariaDBSchemaRetriever.retrieve_relevant() output."""
+        retrieved = retrieved or {}
+        matched = {(t.schema, t.name) for t in retrieved.get("matched") or []}
+        joins = sum(
+            1
+            for fk in retrieved.get("foreign_keys") or []
+            if (fk.src_schema, fk.src_table) in matched and (fk.dst_schema, fk.dst_table) in matched
+        )
+        signals = {
+            "tables": len(matched),
+            "joins": joins,
+            "aggregations": _distinct_hits(_AGGREGATION, question or ""),
+            "time": _distinct_hits(_TIME, question or ""),
+            "depth": conversation_depth(history, summary),
+        }
+        score = (
+            max(0, signals["tables"] - 1)
+            + 2 * signals["joins"]
+            + min(3, signals["aggregations"])
+            + min(2, signals["time"])
+            + min(2, signals["depth"] // 2)
+        )
+        return Complexity(score=score, signals=signals)
+
+    def route(self, complexity: Complexity, *, repair: bool = False) -> Route:
+        fast, strong = self.targets()
+        if fast is None or strong is None:
+            raise RuntimeError("model routing is not configured (LLM_ROUTE_FAST / LLM_ROUTE_STRONG)")
+        if repair:
+            name, reason = "strong", "repair"
+        elif complexity.score >= self.strong_score:
+            name, reason = "strong", "complex"
+        else:
+            name, reason = "fast", "simple"
+        provider, model = strong if name == "strong" else fast
+        ROUTE_DECISIONS.inc(route=name, reason=reason)
+        return Route(name, provider, model, reason, complexity.score)
+
+    @staticmethod
+    def observe(route: str, status: str, seconds: float) -> None:
+        """Outcome of a routed request (route: fast / strong, its first text-to-SQL route)."""
+        ROUTE_REQUESTS.inc(route=route, status=status)
+        ROUTE_SECONDS.observe(seconds, route=route)
+
+
+model_router = ModelRouter()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+"""
+Result of a pipeline run, rebuilt from its SSE events.
+
+Background jobs (orchestration/jobs.py) and batches (orchestration/batch.py)
+run the same event stream as /query/stream but hand their caller one
+result document instead:
+
+    outcome = PipelineOutcome()
+    for chunk in stream_sse_pipeline(...):
+        parsed = parse_sse_event(chunk)
+        if parsed is not None:
+            outcome.feed(*parsed)
+    outcome.result()   # {"status", "sql", "params", "columns", "rows", "answer_markdown", "error", "timings_ms", ...}
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import json
+
+
+def parse_sse_event(chunk: bytes) -> Optional[Tuple[str, Dict[str, Any]]]:
+    # chunks are single `event: X\ndata: {...}\n\n` events as _sse builds them; comments are heartbeats
+    if not chunk.startswith(b"event: "):
+        return None
+    head, _, data = chunk.partition(b"\ndata: ")
+    return head[len(b"event: "):].decode("utf-8"), json.loads(data)
+
+
+class PipelineOutcome:
+    """What a run leaves behind once its events are gone: the final SQL, its rows, the answer and the done summary."""
+
+    def __init__(self) -> None:
+        self.status: Optional[str] = None
+        self.sql: Optional[Dict[str, Any]] = None
+        self.columns: List[str] = []
+        self.rows: List[List[Any]] = []
+        self.answer: Optional[str] = None
+        self.error: Optional[Dict[str, Any]] = None
+        self.done: Dict[str, Any] = {}
+
+    def feed(self, event: str, data: Dict[str, Any]) -> None:
+        if event == "sql":
+            # a new attempt: rows of a failed one do not belong to the result
+            self.sql = {k: data.get(k) for k in ("sql", "params", "source")}
+            self.columns, self.rows = [], []
+        elif event == "rows":
+            self.columns = data.get("columns") or self.columns
+            if "data" in data:
+                self.rows.extend(data["data"])
+            else:
+                self.rows.extend([r.get(c) for c in self.columns] for r in data.get("rows") or [])
+        elif event == "answer":
+            self.answer = data.get("markdown")
+        elif event == "error":
+            self.error = {k: data.get(k) for k in ("error_code", "message", "retryable")}
+        elif event == "done":
+            self.status = data.get("status")
+            self.done = {k: data.get(k) for k in ("deadline", "timings_ms", "usage")}
+
+    def result(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"status": self.status or "fail"}
+        if self.sql is not None:
+            out.update(self.sql)
+            out.update({"columns": self.columns, "rows": self.rows, "row_count": len(self.rows)})
+        out["answer_markdown"] = self.answer
+        if self.error is not None and self.status != "success":
+            out["error"] = self.error
+        out.update(self.done)
+        return out
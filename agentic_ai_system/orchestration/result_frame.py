@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+"""
+Columnar container for one query result.
+
+The executor used to build a dict per row (column names repeated in every
+row), keep them all, round-trip them through json for the composer and
+serialize them again for every SSE chunk. A ResultFrame keeps
+
+- the column names once
+- one list of values per column (`data[j]`)
+- one type tag per column (`types[j]`: int | float | decimal | str | date |
+  datetime | time | bool | bytes | uuid | null | mixed), updated as
+  chunks arrive
+
+The executor appends the row tuples of each fetched chunk; the composer,
+the evidence markdown table, result statistics and the refinement cache
+read columns / row slices from it. Nothing copies the full result into
+dicts: `records()` is only used for the handful of rows a prompt shows.
+
+SSE clients that send `row_format: "columnar"` get rows events as
+{"columns": [...], "types": [...], "data": [[...], ...]}; everyone else
+keeps the `rows: [{column: value}, ...]` shape.
+"""
+
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from agentic_ai_system.utils.fast_json import to_jsonable
+
+
+ROW_FORMATS = ("records", "columnar")
+
+_TAGS = {
+    bool: "bool",
+    int: "int",
+    float: "float",
+    Decimal: "decimal",
+    str: "str",
+    datetime: "datetime",
+    date: "date",
+    dt_time: "time",
+    bytes: "bytes",
+    bytearray: "bytes",
+    UUID: "uuid",
+}
+NUMERIC_TAGS = frozenset(("int", "float", "decimal"))
+TEMPORAL_TAGS = frozenset(("date", "datetime"))
+
+
+def _merge_tag(a: str, b: str) -> str:
+    if a == b or b == "null":
+        return a
+    if a == "null":
+        return b
+    if a in NUMERIC_TAGS and b in NUMERIC_TAGS:
+        # int + decimal stays exact; anything with a float is a float
+        return "float" if "float" in (a, b) else "decimal"
+    if {a, b} == {"date", "datetime"}:
+        return "datetime"
+    return "mixed"
+
+
+def _column_tag(values: Iterable[Any]) -> str:
+    tag = "null"
+    for v in values:
+        if v is not None:
+            tag = _merge_tag(tag, _TAGS.get(type(v), "mixed"))
+            if tag == "mixed":
+                break
+    return tag
+
+
+class ResultFrame:
+    __slots__ = ("columns", "data", "types", "_n")
+
+    def __init__(self, columns: Sequence[str] = ()) -> None:
+        self.columns: List[str] = list(columns)
+        self.data: List[List[Any]] = [[] for _ in self.columns]
+        self.types: List[str] = ["null"] * len(self.columns)
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def extend(self, rows: Sequence[Sequence[Any]]) -> None:
+        """Append row tuples (as fetched) column by column."""
+        if not rows:
+            return
+        width = len(self.columns)
+        for j, col in enumerate(zip(*rows)):
+            if j >= width:
+                raise ValueError(f"row has more than {width} values")
+            self.data[j].extend(col)
+            tag = self.types[j]
+            if tag != "mixed":
+                self.types[j] = _merge_tag(tag, _column_tag(col))
+        self._n += len(rows)
+
+    def column(self, name: str) -> List[Any]:
+        return self.data[self.columns.index(name)]
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        """Row tuples in [start, stop)."""
+        return list(zip(*(c[start:stop] for c in self.data))) if self.data else []
+
+    def records(self, stop: Optional[int] = None, *, jsonable: bool = False) -> List[Dict[str, Any]]:
+        """The first `stop` rows (all when None) as dicts, optionally with JSON-native values."""
+        out = []
+        for r in self.rows(0, stop):
+            if jsonable:
+                r = tuple(to_jsonable(v) for v in r)
+            out.append(dict(zip(self.columns, r)))
+        return out
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+"""
+Per-column statistics over the full fetched result (up to SQL_MAX_ROWS rows).
+
+The composer only gets a few sample rows, so totals, rankings and trends
+it writes about must come from here instead of being guessed from the
+sample:
+
+- every column: kind (numeric | datetime | text | empty), count, nulls
+- numeric: min, max, mean, median, sum
+- datetime: min, max
+- text: distinct count and top-k values; with exactly one measure column
+  (numeric, not an id/year/code) the top-k is ranked by that measure's sum,
+  otherwise by frequency
+- trend: rows (and measure sum) per time bucket (month, or year for long
+  ranges) keyed by the first date column, or by a year column
+
+Values are read column by column from the ResultFrame; a column whose type
+tag is already numeric / date(time) skips the per-value kind scan.
+Column reductions (min/max/mean/median/sum) run on NumPy arrays when NumPy
+is installed and fall back to plain Python otherwise (same output).
+Grouping stays a dict pass: at SQL_MAX_ROWS sizes it beats np.unique on
+object arrays, and converting the row values dominates either way.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+import re
+import statistics
+
+from agentic_ai_system.orchestration.result_frame import NUMERIC_TAGS, TEMPORAL_TAGS, ResultFrame
+
+try:
+    import numpy as np  # optional: vectorized column reductions
+except ImportError:  # pragma: no cover - depends on the deployment
+    np = None
+
+
+TOP_K = 5
+MAX_BUCKETS = 24
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_NOT_A_MEASURE = re.compile(r"year|_id$|^id$|code|ปี|รหัส", re.IGNORECASE)
+_YEAR_COL = re.compile(r"year|ปี", re.IGNORECASE)
+
+
+def _round(x: float) -> float:
+    return round(float(x), 4)
+
+
+def _is_num(v: Any) -> bool:
+    return isinstance(v, (int, float, Decimal)) and not isinstance(v, bool)
+
+
+def _as_date_text(v: Any) -> Optional[str]:
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, str) and _ISO_DATE.match(v):
+        return v
+    return None
+
+
+def _kind(values: Sequence[Any], tag: str = "mixed") -> str:
+    if tag in NUMERIC_TAGS:
+        return "numeric"
+    if tag in TEMPORAL_TAGS:
+        return "datetime"
+    if tag == "null":
+        return "empty"
+    present = [v for v in values if v is not None]
+    if not present:
+        return "empty"
+    if all(_is_num(v) for v in present):
+        return "numeric"
+    if all(_as_date_text(v) is not None for v in present):
+        return "datetime"
+    return "text"
+
+
+def _numeric_summary(vals: List[float]) -> Dict[str, Any]:
+    if np is not None:
+        a = np.asarray(vals, dtype=float)
+        return {
+            "min": _round(a.min()),
+            "max": _round(a.max()),
+            "mean": _round(a.mean()),
+            "median": _round(np.median(a)),
+            "sum": _round(a.sum()),
+        }
+    return {
+        "min": _round(min(vals)),
+        "max": _round(max(vals)),
+        "mean": _round(sum(vals) / len(vals)),
+        "median": _round(statistics.median(vals)),
+        "sum": _round(sum(vals)),
+    }
+
+
+def _group_sum(keys: List[str], weights: Optional[List[float]]) -> Dict[str, float]:
+    """Rows (weights=None) or weight sums per key."""
+    out: Dict[str, float] = {}
+    for i, k in enumerate(keys):
+        out[k] = out.get(k, 0.0) + (1.0 if weights is None else weights[i])
+    return out
+
+
+def _bucket(date_text: str, by_year: bool) -> str:
+    return date_text[:4] if by_year else date_text[:7]
+
+
+def compute_result_stats(frame: ResultFrame) -> Dict[str, Any]:
+    cols = list(frame.columns)
+    values = dict(zip(cols, frame.data))
+    kinds = {c: _kind(values[c], tag) for c, tag in zip(cols, frame.types)}
+
+    measures = [c for c in cols if kinds[c] == "numeric" and not _NOT_A_MEASURE.search(c)]
+    measure = measures[0] if len(measures) == 1 else None
+
+    out_cols: Dict[str, Any] = {}
+    for c in cols:
+        vals = values[c]
+        present_idx = [i for i, v in enumerate(vals) if v is not None]
+        st: Dict[str, Any] = {"kind": kinds[c], "count": len(present_idx), "nulls": len(vals) - len(present_idx)}
+
+        if kinds[c] == "numeric":
+            st.update(_numeric_summary([float(vals[i]) for i in present_idx]))
+        elif kinds[c] == "datetime":
+            texts = [_as_date_text(vals[i]) for i in present_idx]
+            st.update({"min": min(texts), "max": max(texts)})
+        elif kinds[c] == "text":
+            keys = [str(vals[i]) for i in present_idx]
+            if measure is not None:
+                mv = values[measure]
+                w = [float(mv[i] or 0) for i in present_idx]
+                grouped = _group_sum(keys, w)
+                st["top_by"] = measure
+            else:
+                grouped = _group_sum(keys, None)
+                st["top_by"] = "rows"
+            st["distinct"] = len(grouped)
+            ranked = sorted(grouped.items(), key=lambda kv: (-kv[1], kv[0]))[:TOP_K]
+            st["top"] = [{"value": k, st["top_by"]: _round(v)} for k, v in ranked]
+        out_cols[c] = st
+
+    result: Dict[str, Any] = {"row_count": len(frame), "columns": out_cols}
+    if measure is not None:
+        result["measure"] = measure
+
+    trend = _trend(cols, kinds, values, measure, len(frame))
+    if trend:
+        result["trend"] = trend
+    return result
+
+
+def _trend(
+    cols: List[str],
+    kinds: Dict[str, str],
+    values: Dict[str, List[Any]],
+    measure: Optional[str],
+    n_rows: int,
+) -> Optional[Dict[str, Any]]:
+    time_col = next((c for c in cols if kinds[c] == "datetime"), None)
+    if time_col is not None:
+        texts = [_as_date_text(v) for v in values[time_col]]
+        present = [t for t in texts if t]
+        if not present:
+            return None
+        span_years = int(max(present)[:4]) - int(min(present)[:4])
+        by_year = span_years >= 3
+        keys = [_bucket(t, by_year) if t else None for t in texts]
+        granularity = "year" if by_year else "month"
+    else:
+        time_col = next((c for c in cols if kinds[c] == "numeric" and _YEAR_COL.search(c)), None)
+        if time_col is None:
+            return None
+        keys = [str(int(v)) if v is not None else None for v in values[time_col]]
+        granularity = "year"
+
+    idx = [i for i, k in enumerate(keys) if k is not None]
+    if n_rows < 2 or len({keys[i] for i in idx}) < 2:
+        return None
+    bucket_keys = [keys[i] for i in idx]
+    counts = _group_sum(bucket_keys, None)
+    sums = None
+    if measure is not None:
+        sums = _group_sum(bucket_keys, [float(values[measure][i] or 0) for i in idx])
+
+    buckets = []
+    for b in sorted(counts)[-MAX_BUCKETS:]:
+        item: Dict[str, Any] = {"bucket": b, "rows": int(counts[b])}
+        if sums is not None:
+            item[f"{measure}_sum"] = _round(sums[b])
+        buckets.append(item)
+
+    trend: Dict[str, Any] = {"by": time_col, "granularity": granularity, "buckets": buckets}
+    series = [x.get(f"{measure}_sum", x["rows"]) for x in buckets] if measure else [x["rows"] for x in buckets]
+    if series[0]:
+        trend["change_first_to_last_pct"] = _round((series[-1] - series[0]) / abs(series[0]) * 100)
+    return trend
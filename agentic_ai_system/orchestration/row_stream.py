@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+"""
+Byte- and time-budgeted chunking of query rows for SSE.
+
+A fixed row count per chunk makes huge events for wide rows, many tiny
+events for narrow ones, and sends nothing while a slow query trickles rows.
+Here the query runs on a worker thread that hands fetched batches
+(SQL_STREAM_FETCH_ROWS) over a small bounded queue. The first batch is
+sent as soon as it arrives (reason "first", for a quick first paint);
+after that the SSE side flushes a rows chunk when the first of
+
+- bytes:    estimated JSON size of the pending rows >= SQL_STREAM_CHUNK_BYTES
+- rows:     pending rows >= SQL_STREAM_CHUNK_SIZE (upper bound per event)
+- interval: the oldest pending row waited SQL_STREAM_FLUSH_MS
+- end:      the result is complete
+
+is reached. While nothing arrives for SSE_HEARTBEAT_MS (long executions),
+a heartbeat item is yielded so the caller can send an SSE comment and
+proxies / clients do not time the stream out. When the request's
+CancelToken fires (client disconnect), the worker stops fetching and the
+consumer raises RequestCancelled right away instead of waiting for the
+next batch.
+
+Flush reasons, chunk sizes, heartbeats and the active policy are exported
+as metrics.
+
+    def produce(sink: RowSink) -> None:       # runs on the worker thread
+        sink.columns(cols)
+        while (batch := fetch()) and sink.rows(batch):
+            pass
+
+    for item in stream_rows(produce, ChunkPolicy.from_env()):
+        if item.get("heartbeat"): ...          # {"heartbeat": True, "elapsed_ms": n}
+        else: ...                              # chunk shaped like the rows event
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from math import ceil
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+from time import monotonic, perf_counter, sleep
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import os
+
+from agentic_ai_system.orchestration.cancellation import CancelToken, RequestCancelled
+from agentic_ai_system.orchestration.metrics import registry
+
+
+ROW_CHUNKS = registry.counter(
+    "text2sql_sse_row_chunks_total", "SSE rows events by flush reason (first / bytes / rows / interval / end)."
+)
+ROW_CHUNK_BYTES = registry.histogram(
+    "text2sql_sse_row_chunk_bytes",
+    "Estimated JSON bytes of the rows in one SSE rows event.",
+    buckets=(1024, 4096, 16384, 32768, 65536, 131072, 262144),
+)
+ROW_CHUNK_ROWS = registry.histogram(
+    "text2sql_sse_row_chunk_rows",
+    "Rows per SSE rows event.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+HEARTBEATS = registry.counter(
+    "text2sql_sse_heartbeats_total", "SSE heartbeat comments sent while a query produced no rows."
+)
+CHUNK_POLICY = registry.gauge(
+    "text2sql_sse_chunk_policy", "Active SSE row chunk policy (max_bytes / max_rows / flush_ms / heartbeat_ms)."
+)
+
+# rough JSON sizes of non-string values (quotes / separators included)
+_VALUE_BYTES = {type(None): 5, bool: 6, int: 8, float: 12, Decimal: 14, date: 13, datetime: 22}
+
+
+def estimate_row_bytes(row: Sequence[Any], name_bytes: int = 0) -> int:
+    """Approximate JSON size of one row; name_bytes is added when keys repeat per row."""
+    n = name_bytes + 2
+    for v in row:
+        if isinstance(v, str):
+            # Thai is 3 bytes per character in UTF-8
+            n += len(v) + 3 if v.isascii() else len(v.encode("utf-8")) + 3
+        else:
+            n += _VALUE_BYTES.get(type(v), 24)
+    return n
+
+
+def _batch_row_bytes(batch: Sequence[Sequence[Any]], name_bytes: int, samples: int = 8) -> float:
+    """Mean estimated row size from up to `samples` rows spread over the batch."""
+    step = max(1, len(batch) // samples)
+    picked = batch[::step][:samples]
+    return sum(estimate_row_bytes(r, name_bytes) for r in picked) / len(picked)
+
+
+class ChunkPolicy:
+    def __init__(
+        self,
+        *,
+        max_bytes: int = 32768,
+        max_rows: int = 500,
+        flush_ms: int = 250,
+        heartbeat_ms: int = 10000,
+        fetch_rows: int = 100,
+        repeat_names: bool = True,
+    ) -> None:
+        if max_bytes <= 0 or max_rows <= 0 or fetch_rows <= 0:
+            raise ValueError("max_bytes, max_rows and fetch_rows must be > 0")
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.flush_ms = flush_ms
+        self.heartbeat_ms = heartbeat_ms  # <= 0 disables heartbeats
+        self.fetch_rows = fetch_rows
+        self.repeat_names = repeat_names  # records format: column names are in every row
+
+    @classmethod
+    def from_env(cls, *, repeat_names: bool = True) -> "ChunkPolicy":
+        policy = cls(
+            max_bytes=int(os.getenv("SQL_STREAM_CHUNK_BYTES", "32768")),
+            max_rows=int(os.getenv("SQL_STREAM_CHUNK_SIZE", "500")),
+            flush_ms=int(os.getenv("SQL_STREAM_FLUSH_MS", "250")),
+            heartbeat_ms=int(os.getenv("SSE_HEARTBEAT_MS", "10000")),
+            fetch_rows=int(os.getenv("SQL_STREAM_FETCH_ROWS", "100")),
+            repeat_names=repeat_names,
+        )
+        for setting in ("max_bytes", "max_rows", "flush_ms", "heartbeat_ms"):
+            CHUNK_POLICY.set(getattr(policy, setting), setting=setting)
+        return policy
+
+
+class RowSink:
+    """Producer side: the worker thread reports columns and row batches."""
+
+    def __init__(self, queue: "Queue[Tuple[str, Any]]", stop: Event) -> None:
+        self._queue = queue
+        self._stop = stop
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def _put(self, item: Tuple[str, Any]) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                sleep(0)  # hand the GIL to the SSE side instead of fetching on for a full switch interval
+                return True
+            except Full:
+                continue
+        return False
+
+    def columns(self, cols: List[str]) -> bool:
+        return self._put(("columns", list(cols)))
+
+    def rows(self, batch: List[Tuple[Any, ...]]) -> bool:
+        """False when the consumer went away: stop fetching."""
+        return self._put(("rows", batch))
+
+
+def stream_rows(
+    produce: Callable[[RowSink], None],
+    policy: ChunkPolicy,
+    *,
+    thread_name: str = "sql-stream",
+    cancel: Optional[CancelToken] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run produce(sink) on a worker thread and yield budgeted chunks
+    ({"columns", "rows", "chunk_index", "row_count", "rows_sent_total",
+    "elapsed_ms", "flush_reason"}) plus heartbeat items. An exception in
+    produce is re-raised here unchanged; a cancelled request raises
+    RequestCancelled("sql_execute").
+    """
+    queue: "Queue[Tuple[str, Any]]" = Queue(maxsize=4)
+    stop = Event()
+    sink = RowSink(queue, stop)
+
+    def _on_cancel(reason: str) -> None:
+        stop.set()
+        try:
+            queue.put_nowait(("cancel", reason))  # wake the consumer; a full queue wakes it anyway
+        except Full:
+            pass
+
+    remove_cancel = cancel.on_cancel(_on_cancel) if cancel is not None else (lambda: None)
+
+    def _worker() -> None:
+        try:
+            produce(sink)
+        except BaseException as e:  # handed to the consumer
+            sink._put(("error", e))
+        else:
+            sink._put(("end", None))
+
+    t0 = perf_counter()
+    worker = Thread(target=_worker, name=thread_name, daemon=True)
+    worker.start()
+
+    cols: List[str] = []
+    name_bytes = 0
+    pending: List[Tuple[Any, ...]] = []
+    pending_bytes = 0
+    pending_since = 0.0
+    last_item = monotonic()
+    sent = 0
+    chunk_index = 0
+
+    def _flush(reason: str) -> Dict[str, Any]:
+        nonlocal pending, pending_bytes, sent, chunk_index
+        rows, nbytes = pending, pending_bytes
+        pending, pending_bytes = [], 0
+        sent += len(rows)
+        ROW_CHUNKS.inc(reason=reason)
+        ROW_CHUNK_BYTES.observe(nbytes)
+        ROW_CHUNK_ROWS.observe(len(rows))
+        chunk = {
+            "columns": cols,
+            "rows": rows,
+            "chunk_index": chunk_index,
+            "row_count": len(rows),
+            "rows_sent_total": sent,
+            "elapsed_ms": int((perf_counter() - t0) * 1000),
+            "flush_reason": reason,
+        }
+        chunk_index += 1
+        return chunk
+
+    try:
+        while True:
+            if cancel is not None:
+                cancel.check("sql_execute")
+            now = monotonic()
+            waits = []
+            if pending:
+                waits.append(pending_since + policy.flush_ms / 1000 - now)
+            if policy.heartbeat_ms > 0:
+                waits.append(last_item + policy.heartbeat_ms / 1000 - now)
+            timeout = max(0.0, min(waits)) if waits else None
+
+            try:
+                kind, value = queue.get(timeout=timeout)
+            except Empty:
+                now = monotonic()
+                if pending and now - pending_since >= policy.flush_ms / 1000:
+                    yield _flush("interval")
+                    last_item = now
+                elif policy.heartbeat_ms > 0 and now - last_item >= policy.heartbeat_ms / 1000:
+                    HEARTBEATS.inc()
+                    last_item = now
+                    yield {"heartbeat": True, "elapsed_ms": int((perf_counter() - t0) * 1000)}
+                continue
+
+            last_item = monotonic()
+            if kind == "columns":
+                cols = value
+                name_bytes = sum(len(c.encode("utf-8")) + 4 for c in cols) if policy.repeat_names else 0
+            elif kind == "rows":
+                # sliced by the sampled mean row size instead of sizing every row
+                row_bytes = _batch_row_bytes(value, name_bytes)
+                i = 0
+                while i < len(value):
+                    if not pending:
+                        pending_since = monotonic()
+                    room = min(
+                        policy.max_rows - len(pending),
+                        max(1, ceil((policy.max_bytes - pending_bytes) / row_bytes)),
+                    )
+                    take = value[i : i + room]
+                    i += len(take)
+                    pending.extend(take)
+                    pending_bytes += int(len(take) * row_bytes)
+                    if pending_bytes >= policy.max_bytes:
+                        yield _flush("bytes")
+                    elif len(pending) >= policy.max_rows:
+                        yield _flush("rows")
+                if pending and chunk_index == 0:
+                    yield _flush("first")
+                elif pending and monotonic() - pending_since >= policy.flush_ms / 1000:
+                    yield _flush("interval")
+            elif kind == "error":
+                raise value
+            elif kind == "cancel":
+                raise RequestCancelled("sql_execute", value)
+            else:  # end
+                if pending:
+                    yield _flush("end")
+                return
+    finally:
+        # consumer finished or went away (client disconnect): the worker stops fetching
+        remove_cancel()
+        stop.set()
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+"""
+Resumable SSE streams.
+
+A pipeline run used to live exactly as long as its HTTP response: when a
+mobile client behind the ingress lost the connection, reconnecting meant
+asking again (new LLM calls, new query). Now
+
+- each run is driven on its own thread (at most SSE_MAX_LIVE_RUNS per
+  process, including runs waiting for a reconnect; beyond that start_run
+  raises StreamCapacityFull and /query/stream answers 503); every event gets the next id
+  (`id: n`) and is appended to the replay buffer (memory/event_replay.py)
+- HTTP responses are followers: they send the buffered events after a
+  given id and then the live ones until the run is finished
+- when the last follower goes away the run keeps going for
+  SSE_RESUME_GRACE_MS; nobody reconnecting in time cancels it (client
+  disconnect, orchestration/cancellation.py); 0 cancels at once
+- `GET /query/stream/{trace_id}` with `Last-Event-ID` (main.py) attaches
+  a new follower; with SSE_REPLAY_BACKEND=sqlite this also works on
+  another worker of the same host (replay, then polling until the run ends)
+
+    follower = start_run(trace_id, stream_sse_pipeline(..., trace_id=trace_id, cancel=cancel), cancel)
+    follower = follow(trace_id, after_id=last_event_id)   # reconnect; None: unknown / expired
+    while (chunk := follower.next()) is not None: ...
+    follower.close()                                      # response ended / client gone
+
+Background jobs (orchestration/jobs.py) register a run with grace_ms=None
+(never cancelled for lack of followers) and drive it on their own worker.
+"""
+
+from threading import BoundedSemaphore, Lock, Thread, Timer
+from time import monotonic
+from typing import Dict, Iterator, Optional
+import logging
+import os
+
+from agentic_ai_system.memory.event_replay import ReplayBuffer, replay_buffer
+from agentic_ai_system.orchestration.cancellation import CancelToken
+from agentic_ai_system.orchestration.metrics import registry
+from agentic_ai_system.utils.fast_json import dumps_bytes
+
+
+logger = logging.getLogger(__name__)
+
+RESUMES = registry.counter(
+    "text2sql_sse_resumes_total",
+    "Stream resume requests by result (live / replay / gap / not_found).",
+)
+LIVE_RUNS = registry.gauge("text2sql_sse_live_runs", "Pipeline runs driven in this process, by followers attached.")
+RUNS_REJECTED = registry.counter(
+    "text2sql_sse_runs_rejected_total", "Streams refused because SSE_MAX_LIVE_RUNS runs were already live."
+)
+
+# a follower of a run on another worker gives up when its buffer stops changing this long
+_REMOTE_IDLE_S = 120.0
+
+_CANCEL_MESSAGES = {
+    "client_disconnect": "No client reconnected in time; the request was cancelled",
+    "job_cancelled": "The job was cancelled",
+}
+
+
+class StreamCapacityFull(Exception):
+    """SSE_MAX_LIVE_RUNS runs are already live in this process."""
+
+
+def _event(event: str, data: Dict[str, object]) -> bytes:
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps_bytes(data) + b"\n\n"
+
+
+class StreamRun:
+    """One pipeline run, driven on its own thread into the replay buffer."""
+
+    def __init__(
+        self,
+        trace_id: str,
+        events: Iterator[bytes],
+        cancel: CancelToken,
+        *,
+        buffer: ReplayBuffer,
+        grace_ms: Optional[int],
+        slot: Optional[BoundedSemaphore] = None,
+    ) -> None:
+        self.trace_id = trace_id
+        self.cancel = cancel
+        self.finished = False
+        self.error: Optional[str] = None  # set when the pipeline raised
+        self._events = events
+        self._buffer = buffer
+        # None: keep running without followers (background jobs)
+        self._grace_s = grace_ms / 1000 if grace_ms is not None else None
+        self._lock = Lock()
+        self._followers = 0
+        self._timer: Optional[Timer] = None
+        self._slot = slot  # released when the run ends (start_run)
+        self._thread = Thread(target=self.drive, name="sse-run", daemon=True)
+
+    def start(self) -> "StreamRun":
+        self._thread.start()
+        return self
+
+    def drive(self) -> None:
+        """Run the pipeline on the calling thread until it ends (start() does this on a new thread)."""
+        seq = 0
+        try:
+            for chunk in self._events:
+                seq += 1
+                if not chunk.startswith(b":"):
+                    # comments (heartbeats) have no id; resuming after one replays from the previous event
+                    chunk = b"id: %d\n" % seq + chunk
+                self._buffer.append(self.trace_id, seq, chunk)
+            if self.cancel.cancelled:
+                # the pipeline ended silently; a late reconnect learns why the stream stops here
+                seq += 1
+                self._buffer.append(
+                    self.trace_id,
+                    seq,
+                    b"id: %d\n" % seq + _event(
+                        "error",
+                        {"trace_id": self.trace_id, "error_code": "STREAM_CANCELLED",
+                         "message": _CANCEL_MESSAGES.get(self.cancel.reason or "", "The request was cancelled"),
+                         "retryable": True},
+                    ),
+                )
+        except Exception as e:
+            logger.exception("stream run %s failed", self.trace_id)
+            self.error = str(e)
+            seq += 1
+            self._buffer.append(
+                self.trace_id,
+                seq,
+                b"id: %d\n" % seq + _event(
+                    "error",
+                    {"trace_id": self.trace_id, "error_code": "INTERNAL_SERVER_ERROR", "message": str(e), "retryable": False},
+                ),
+            )
+        finally:
+            with self._lock:
+                self.finished = True
+                if self._timer is not None:
+                    self._timer.cancel()
+            self._buffer.close(self.trace_id)
+            _forget(self)
+            if self._slot is not None:
+                self._slot.release()
+
+    def attach(self) -> None:
+        with self._lock:
+            self._followers += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def detach(self) -> None:
+        with self._lock:
+            self._followers -= 1
+            if self._followers > 0 or self.finished or self._grace_s is None:
+                return
+            if self._grace_s <= 0:
+                expire_now = True
+            else:
+                expire_now = False
+                self._timer = Timer(self._grace_s, self._expire)
+                self._timer.daemon = True
+                self._timer.start()
+        if expire_now:
+            self._expire()
+
+    def _expire(self) -> None:
+        with self._lock:
+            if self._followers > 0 or self.finished:
+                return
+        # nobody came back in time: stop LLM calls / the query (counted as abandoned)
+        self.cancel.cancel("client_disconnect")
+
+    def followers(self) -> int:
+        return self._followers
+
+
+class Follower:
+    """Sends the buffered events of a trace after `after_id`, then the live ones."""
+
+    def __init__(self, trace_id: str, after_id: int, run: Optional[StreamRun], buffer: ReplayBuffer) -> None:
+        self.trace_id = trace_id
+        self.last_id = after_id
+        self._run = run
+        self._buffer = buffer
+        self._closed = False
+        self._first = True
+        if run is not None:
+            run.attach()
+
+    def next(self, timeout_s: float = 15.0) -> Optional[bytes]:
+        """Next batch of SSE bytes; None when the run is finished (or the trace expired / was closed)."""
+        idle_since = monotonic()
+        while not self._closed:
+            read = self._buffer.read(self.trace_id, self.last_id)
+            if read is None:
+                if self._run is None or self._run.finished:
+                    return None  # expired / evicted
+                # live run without its first event yet
+                self._buffer.wait(self.trace_id, self.last_id, timeout_s, stop=lambda: self._closed)
+                continue
+            out = []
+            if self._first:
+                self._first = False
+                if self.last_id and read.first_seq > self.last_id + 1:
+                    # the oldest missed events were trimmed from the buffer (SSE_REPLAY_MAX_BYTES)
+                    RESUMES.inc(result="gap")
+                    out.append(_event("error", {
+                        "trace_id": self.trace_id,
+                        "error_code": "RESUME_GAP",
+                        "message": f"events {self.last_id + 1}..{read.first_seq - 1} are no longer buffered",
+                        "retryable": False,
+                    }))
+            if read.entries:
+                self.last_id = read.entries[-1][0]
+                out.extend(data for _, data in read.entries)
+            if out:
+                return b"".join(out)
+            if read.closed:
+                return None
+            if self._run is None and monotonic() - idle_since > _REMOTE_IDLE_S:
+                return None  # the run on another worker stopped writing (worker gone)
+            self._buffer.wait(self.trace_id, self.last_id, timeout_s, stop=lambda: self._closed)
+        return None
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._buffer.wake(self.trace_id)
+        if self._run is not None:
+            self._run.detach()
+
+
+_RUNS: Dict[str, StreamRun] = {}
+_RUNS_LOCK = Lock()
+
+
+def _live_runs() -> Dict[object, float]:
+    with _RUNS_LOCK:
+        runs = list(_RUNS.values())
+    attached = sum(1 for r in runs if r.followers() > 0)
+    return {(("state", "attached"),): attached, (("state", "detached"),): len(runs) - attached}
+
+
+LIVE_RUNS.set_function(_live_runs)
+
+
+def _forget(run: StreamRun) -> None:
+    with _RUNS_LOCK:
+        if _RUNS.get(run.trace_id) is run:
+            del _RUNS[run.trace_id]
+
+
+def resume_grace_ms() -> int:
+    return int(os.getenv("SSE_RESUME_GRACE_MS", "15000"))
+
+
+_MAX_LIVE_RUNS = max(1, int(os.getenv("SSE_MAX_LIVE_RUNS", "64")))
+_RUN_SLOTS = BoundedSemaphore(_MAX_LIVE_RUNS)
+
+
+def register_run(run: StreamRun) -> StreamRun:
+    """Make a run followable (before its first event); it is forgotten when it finishes."""
+    with _RUNS_LOCK:
+        _RUNS[run.trace_id] = run
+    return run
+
+
+def start_run(
+    trace_id: str,
+    events: Iterator[bytes],
+    cancel: CancelToken,
+    *,
+    buffer: Optional[ReplayBuffer] = None,
+) -> Follower:
+    """
+    Start driving `events` and return the first follower (attached before the first event).
+    StreamCapacityFull when SSE_MAX_LIVE_RUNS runs are live: disconnected runs in their
+    grace period count too, so reconnect storms cannot multiply pipeline threads.
+    """
+    if not _RUN_SLOTS.acquire(blocking=False):
+        RUNS_REJECTED.inc()
+        raise StreamCapacityFull(f"{_MAX_LIVE_RUNS} streams are already running")
+    try:
+        run = register_run(StreamRun(
+            trace_id, events, cancel, buffer=buffer or replay_buffer, grace_ms=resume_grace_ms(), slot=_RUN_SLOTS
+        ))
+        follower = Follower(trace_id, 0, run, run._buffer)
+        run.start()
+    except BaseException:
+        _RUN_SLOTS.release()
+        raise
+    return follower
+
+
+def follow(trace_id: str, after_id: int = 0, *, buffer: Optional[ReplayBuffer] = None) -> Optional[Follower]:
+    """Follower for a reconnect, or None when the trace is unknown here / expired."""
+    buffer = buffer or replay_buffer
+    with _RUNS_LOCK:
+        run = _RUNS.get(trace_id)
+    if run is None and buffer.read(trace_id, after_id) is None:
+        RESUMES.inc(result="not_found")
+        return None
+    RESUMES.inc(result="live" if run is not None else "replay")
+    return Follower(trace_id, after_id, run, buffer)
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+"""
+Lightweight OpenTelemetry-compatible tracing keyed by the pipeline trace_id.
+
+Spans use OTel ids (32-hex trace id = the pipeline trace_id without dashes,
+16-hex span ids) and are exported in the OTLP/JSON shape, so they can be
+sent to a local collector or written to a JSONL file for offline analysis.
+No OpenTelemetry SDK / extra dependency is needed.
+
+Config:
+- TRACE_EXPORTER=none|jsonl|otlp   (default none: spans are created but dropped)
+- TRACE_JSONL_PATH=./traces.jsonl  (jsonl exporter; one span per line)
+- OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318  (otlp exporter, HTTP/JSON)
+- OTEL_SERVICE_NAME=text-to-sql
+
+Usage:
+
+    root = tracer.start_span("pipeline", trace_id=trace_id)
+    with tracer.span("sql_execute", parent=root, attributes={"db.statement_fingerprint": fp}) as sp:
+        ...
+        sp.set_attribute("db.row_count", n)
+    root.end()
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from queue import Queue, Empty, Full
+from threading import Lock, Thread
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import os
+import secrets
+import time
+import urllib.request
+
+
+def _otel_trace_id(trace_id: str) -> str:
+    tid = (trace_id or "").replace("-", "").lower()
+    if len(tid) == 32:
+        return tid
+    return secrets.token_hex(16)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status", "status_message", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], attributes: Optional[Dict[str, Any]]) -> None:
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "UNSET"
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attrs: Dict[str, Any]) -> None:
+        for k, v in attrs.items():
+            self.set_attribute(k, v)
+
+    def set_error(self, message: str, error_code: Optional[str] = None) -> None:
+        self.status = "ERROR"
+        self.status_message = (message or "")[:500]
+        if error_code:
+            self.attributes["error.code"] = error_code
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.status == "UNSET":
+            self.status = "OK"
+        self._tracer._export(self)
+
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat form used by the JSONL exporter."""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms(), 3),
+            "status": self.status,
+            "status_message": self.status_message,
+            "attributes": self.attributes,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2 if self.status == "ERROR" else 1, "message": self.status_message},
+        }
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: List[Span]) -> None:
+        ...
+
+
+class JsonlSpanExporter(SpanExporter):
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n" for s in spans)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """OTLP/HTTP with JSON encoding (POST {endpoint}/v1/traces) using only the stdlib."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout_s: float = 3.0) -> None:
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout_s = timeout_s
+
+    def export(self, spans: List[Span]) -> None:
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "agentic_ai_system"},
+                            "spans": [s.to_otlp() for s in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(body, default=str).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout_s):
+            pass
+
+
+class _BatchProcessor:
+    """Exports finished spans from a background thread so request threads never block on I/O."""
+
+    def __init__(self, exporter: SpanExporter, max_queue: int = 10000, batch_size: int = 256, interval_s: float = 1.0) -> None:
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval_s = interval_s
+        self.dropped = 0
+        self._q: "Queue[Span]" = Queue(maxsize=max_queue)
+        self._thread = Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: Span) -> None:
+        try:
+            self._q.put_nowait(span)
+        except Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Span] = []
+            try:
+                batch.append(self._q.get(timeout=self.interval_s))
+                while len(batch) < self.batch_size:
+                    batch.append(self._q.get_nowait())
+            except Empty:
+                pass
+            if not batch:
+                continue
+            try:
+                self.exporter.export(batch)
+            except Exception:
+                # tracing must never affect requests; drop the batch
+                self.dropped += len(batch)
+
+    def flush(self, timeout_s: float = 5.0) -> None:
+        t_end = time.monotonic() + timeout_s
+        while not self._q.empty() and time.monotonic() < t_end:
+            time.sleep(0.05)
+
+
+class Tracer:
+    def __init__(self, processor: Optional[_BatchProcessor] = None) -> None:
+        self.processor = processor
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        kind = os.getenv("TRACE_EXPORTER", "none").strip().lower()
+        if kind == "jsonl":
+            exporter: SpanExporter = JsonlSpanExporter(os.getenv("TRACE_JSONL_PATH", "./traces.jsonl"))
+        elif kind == "otlp":
+            exporter = OtlpHttpSpanExporter(
+                os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"),
+                service_name=os.getenv("OTEL_SERVICE_NAME", "text-to-sql"),
+            )
+        else:
+            return cls(None)
+        return cls(_BatchProcessor(exporter))
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def start_span(
+        self,
+        name: str,
+        *,
+        trace_id: Optional[str] = None,
+        parent: Optional[Span] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Span:
+        if parent is not None:
+            return Span(self, name, parent.trace_id, parent.span_id, attributes)
+        return Span(self, name, _otel_trace_id(trace_id or ""), None, attributes)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        *,
+        trace_id: Optional[str] = None,
+        parent: Optional[Span] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Span]:
+        sp = self.start_span(name, trace_id=trace_id, parent=parent, attributes=attributes)
+        try:
+            yield sp
+        except BaseException as e:
+            if sp.status != "ERROR":
+                sp.set_error(str(e) or type(e).__name__)
+            sp.set_attribute("exception.type", type(e).__name__)
+            raise
+        finally:
+            sp.end()
+
+    def _export(self, span: Span) -> None:
+        if self.processor is not None:
+            self.processor.submit(span)
+
+
+# Simple singleton for easy import everywhere
+tracer = Tracer.from_env()
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+"""
+LLM token usage and cost accounting.
+
+Every LLM call made through llm_models.invoke_llm can be recorded as a
+UsageRecord (tokens, wall time, cost). Records are aggregated:
+- per trace (one pipeline run)       -> SSE `done` event
+- per conversation                   -> /usage/report?conversation_id=...
+- per provider/model and per stage   -> /usage/report and Prometheus metrics
+
+Prices are USD per 1M tokens. Override the defaults with LLM_PRICE_TABLE
+(inline JSON) or LLM_PRICE_TABLE_PATH (JSON file), e.g.
+
+    {"openai/gpt-4o-mini": {"input": 0.15, "output": 0.6, "cached_input": 0.075}}
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, field
+from threading import RLock
+from time import time
+from typing import Any, Dict, List, Optional
+import json
+import os
+
+from agentic_ai_system.orchestration.metrics import registry
+
+
+LLM_TOKENS = registry.counter(
+    "text2sql_llm_tokens_total", "LLM tokens by provider, model, stage and kind (input / output / cached)."
+)
+LLM_COST = registry.counter(
+    "text2sql_llm_cost_usd_total", "Estimated LLM cost in USD by provider and model."
+)
+
+
+# USD per 1M tokens (list prices; adjust via LLM_PRICE_TABLE)
+DEFAULT_PRICES: Dict[str, Dict[str, float]] = {
+    "gpt-4o": {"input": 2.50, "output": 10.00, "cached_input": 1.25},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60, "cached_input": 0.075},
+    "gpt-4.1-nano": {"input": 0.10, "output": 0.40, "cached_input": 0.025},
+    "gpt-5-mini": {"input": 0.25, "output": 2.00, "cached_input": 0.025},
+    "gpt-5.1-codex-mini": {"input": 0.25, "output": 2.00, "cached_input": 0.025},
+    "claude-3.5-sonnet": {"input": 3.00, "output": 15.00, "cached_input": 0.30},
+    "gemini-2.5-flash": {"input": 0.30, "output": 2.50, "cached_input": 0.075},
+    "gemini-1.5-flash": {"input": 0.075, "output": 0.30, "cached_input": 0.01875},
+    "gemini-1.5-pro": {"input": 1.25, "output": 5.00, "cached_input": 0.3125},
+}
+
+
+class PriceTable:
+    def __init__(self, prices: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        self.prices: Dict[str, Dict[str, float]] = dict(DEFAULT_PRICES)
+        if prices:
+            self.prices.update(prices)
+
+    @classmethod
+    def from_env(cls) -> "PriceTable":
+        prices: Dict[str, Dict[str, float]] = {}
+        path = os.getenv("LLM_PRICE_TABLE_PATH")
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                prices.update(json.load(f))
+        inline = os.getenv("LLM_PRICE_TABLE")
+        if inline:
+            prices.update(json.loads(inline))
+        return cls(prices)
+
+    def lookup(self, provider: str, model: str) -> Optional[Dict[str, float]]:
+        # "openrouter:openai/gpt-4o" -> "openai/gpt-4o" -> "gpt-4o"
+        for key in (f"{provider}:{model}", model, model.rsplit("/", 1)[-1]):
+            if key in self.prices:
+                return self.prices[key]
+        return None
+
+    def cost(self, provider: str, model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+        p = self.lookup(provider, model)
+        if not p:
+            return 0.0
+        uncached = max(0, input_tokens - cached_tokens)
+        cached_rate = p.get("cached_input", p.get("input", 0.0))
+        return (
+            uncached * p.get("input", 0.0)
+            + cached_tokens * cached_rate
+            + output_tokens * p.get("output", 0.0)
+        ) / 1_000_000
+
+
+def extract_usage(resp: Any) -> Dict[str, int]:
+    """
+    Token counts from a LangChain AIMessage.
+    Prefers the standard `usage_metadata`; falls back to provider-specific
+    `response_metadata` (OpenAI token_usage / Gemini usage_metadata).
+    """
+    out = {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+
+    um = getattr(resp, "usage_metadata", None)
+    if isinstance(um, dict) and um:
+        out["input_tokens"] = int(um.get("input_tokens") or 0)
+        out["output_tokens"] = int(um.get("output_tokens") or 0)
+        details = um.get("input_token_details") or {}
+        out["cached_tokens"] = int(details.get("cache_read") or 0)
+        return out
+
+    rm = getattr(resp, "response_metadata", None) or {}
+    tu = rm.get("token_usage") or {}
+    if tu:
+        out["input_tokens"] = int(tu.get("prompt_tokens") or 0)
+        out["output_tokens"] = int(tu.get("completion_tokens") or 0)
+        details = tu.get("prompt_tokens_details") or {}
+        out["cached_tokens"] = int(details.get("cached_tokens") or 0)
+        return out
+
+    gu = rm.get("usage_metadata") or {}
+    if gu:
+        out["input_tokens"] = int(gu.get("prompt_token_count") or 0)
+        out["output_tokens"] = int(gu.get("candidates_token_count") or 0)
+        out["cached_tokens"] = int(gu.get("cached_content_token_count") or 0)
+    return out
+
+
+@dataclass
+class UsageRecord:
+    trace_id: str
+    conversation_id: str
+    stage: str
+    provider: str
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    prompt_chars: int = 0
+    wall_ms: int = 0
+    cost_usd: float = 0.0
+    ts: float = field(default_factory=time)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cached_tokens": 0,
+        "prompt_chars": 0,
+        "wall_ms": 0,
+        "cost_usd": 0.0,
+    }
+
+
+def _add(tot: Dict[str, Any], r: UsageRecord) -> None:
+    tot["calls"] += 1
+    tot["input_tokens"] += r.input_tokens
+    tot["output_tokens"] += r.output_tokens
+    tot["cached_tokens"] += r.cached_tokens
+    tot["prompt_chars"] += r.prompt_chars
+    tot["wall_ms"] += r.wall_ms
+    tot["cost_usd"] = round(tot["cost_usd"] + r.cost_usd, 8)
+
+
+class UsageLedger:
+    """
+    Thread-safe in-memory usage aggregation.
+    - keeps the last `max_traces` traces / `max_conversations` conversations (LRU)
+    - provider/model and stage totals are kept for the process lifetime
+    """
+
+    def __init__(
+        self,
+        prices: Optional[PriceTable] = None,
+        max_traces: int = 5000,
+        max_conversations: int = 5000,
+    ) -> None:
+        self.prices = prices or PriceTable.from_env()
+        self.max_traces = max_traces
+        self.max_conversations = max_conversations
+
+        self._lock = RLock()
+        self._traces: "OrderedDict[str, List[UsageRecord]]" = OrderedDict()
+        self._conversations: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_model: Dict[str, Dict[str, Any]] = {}
+        self._by_stage: Dict[str, Dict[str, Any]] = {}
+
+    def record(
+        self,
+        resp: Any,
+        *,
+        trace_id: str,
+        conversation_id: str,
+        stage: str,
+        provider: str,
+        model: str,
+        wall_ms: int,
+        prompt_chars: int = 0,
+    ) -> UsageRecord:
+        tokens = extract_usage(resp)
+        rec = UsageRecord(
+            trace_id=trace_id,
+            conversation_id=conversation_id,
+            stage=stage,
+            provider=provider,
+            model=model,
+            prompt_chars=prompt_chars,
+            wall_ms=wall_ms,
+            cost_usd=self.prices.cost(provider, model, **tokens),
+            **tokens,
+        )
+
+        LLM_TOKENS.inc(rec.input_tokens, provider=provider, model=model, stage=stage, kind="input")
+        LLM_TOKENS.inc(rec.output_tokens, provider=provider, model=model, stage=stage, kind="output")
+        LLM_TOKENS.inc(rec.cached_tokens, provider=provider, model=model, stage=stage, kind="cached")
+        LLM_COST.inc(rec.cost_usd, provider=provider, model=model)
+
+        with self._lock:
+            self._traces.setdefault(trace_id, []).append(rec)
+            self._traces.move_to_end(trace_id)
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+
+            conv = self._conversations.get(conversation_id)
+            if conv is None:
+                conv = self._conversations[conversation_id] = _empty_totals()
+            _add(conv, rec)
+            self._conversations.move_to_end(conversation_id)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+
+            _add(self._by_model.setdefault(f"{provider}:{model}", _empty_totals()), rec)
+            _add(self._by_stage.setdefault(stage, _empty_totals()), rec)
+        return rec
+
+    def trace_summary(self, trace_id: str) -> Dict[str, Any]:
+        with self._lock:
+            records = list(self._traces.get(trace_id) or [])
+        total = _empty_totals()
+        by_stage: Dict[str, Dict[str, Any]] = {}
+        for r in records:
+            _add(total, r)
+            _add(by_stage.setdefault(r.stage, _empty_totals()), r)
+        return {"total": total, "by_stage": by_stage, "calls": [r.to_dict() for r in records]}
+
+    def conversation_summary(self, conversation_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._conversations.get(conversation_id) or _empty_totals())
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "by_model": {k: dict(v) for k, v in self._by_model.items()},
+                "by_stage": {k: dict(v) for k, v in self._by_stage.items()},
+                "tracked_traces": len(self._traces),
+                "tracked_conversations": len(self._conversations),
+            }
+
+
+class RequestUsage:
+    """Per-request handle passed to agents (like StageTimings); records into the ledger."""
+
+    def __init__(self, trace_id: str, conversation_id: str, ledger: Optional[UsageLedger] = None) -> None:
+        self.trace_id = trace_id
+        self.conversation_id = conversation_id
+        self.ledger = ledger or usage_ledger
+
+    def record(self, resp: Any, *, stage: str, provider: str, model: str, wall_ms: int, prompt_chars: int = 0) -> UsageRecord:
+        return self.ledger.record(
+            resp,
+            trace_id=self.trace_id,
+            conversation_id=self.conversation_id,
+            stage=stage,
+            provider=provider,
+            model=model,
+            wall_ms=wall_ms,
+            prompt_chars=prompt_chars,
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        s = self.ledger.trace_summary(self.trace_id)
+        # the per-call list is available via /usage/report; keep the SSE event compact
+        return {"total": s["total"], "by_stage": s["by_stage"]}
+
+
+# Simple singleton for easy import everywhere
+usage_ledger = UsageLedger()
@@ -24,13 +24,18 @@ where messages = [{"role":"system","content":...},{"role":"user","content":...}]
 
 from __future__ import annotations
 
+import asyncio
 import json
+import os
 import re
 from dataclasses import dataclass, field
 from typing import Any, Callable, Dict, List, Optional, Union
 import inspect
 from langchain_core.messages import SystemMessage, HumanMessage
 
+from agentic_ai_system.orchestration.llm_models import invoke_llm
+from agentic_ai_system.orchestration.llm_scheduler import LLMOverloaded
+
 
 Decision = str  # "ALLOW" | "ASK" | "DENY"
 
@@ -224,10 +229,11 @@ def _fallback_heuristic(question: str) -> DomainGuardResult:
         reason=reason,
     )
 
-async def _call_llm_async(llm, messages, model: str) -> str:
+async def _call_llm_async(llm, messages, model: str, provider: Optional[str] = None, priority: str = "interactive") -> str:
     """
     Supports:
-    - LangChain chat model: .invoke(list[BaseMessage]) or .ainvoke(...)
+    - LangChain chat model: .invoke(list[BaseMessage]), admitted by the LLM scheduler
+      (orchestration/llm_scheduler.py) like the other agents' calls
     - async llm(messages=..., model=...) -> str
     - sync llm(messages=..., model=...) -> str
     - llm(messages, model) positional
@@ -244,11 +250,16 @@ async def _call_llm_async(llm, messages, model: str) -> str:
             else:
                 lc_msgs.append(HumanMessage(content=content))
 
-        # prefer async if available
-        if hasattr(llm, "ainvoke") and callable(getattr(llm, "ainvoke")):
-            resp = await llm.ainvoke(lc_msgs)
-        else:
-            resp = llm.invoke(lc_msgs)
+        # admission may wait (concurrency / rate limits): off the event loop
+        resp = await asyncio.to_thread(
+            invoke_llm,
+            llm,
+            lc_msgs,
+            stage="domain_guard",
+            provider=(provider or os.getenv("LLM_PROVIDER", "openai")).lower(),
+            model=model,
+            priority=priority,
+        )
 
         return getattr(resp, "content", "") or str(resp)
 
@@ -278,12 +289,15 @@ async def llm_domain_guard(
     llm: Optional[Callable[..., Any]] = None,
     model: str = "gpt-4.1-mini",
     confidence_ask_threshold: float = 0.60,
+    provider: Optional[str] = None,
+    priority: str = "interactive",
 ) -> DomainGuardResult:
     """
     Main LLM guard. Returns DomainGuardResult.
 
     - If llm is None -> fallback heuristic
     - If LLM returns bad JSON -> fallback heuristic
+    - If the LLM scheduler does not admit the call (LLMOverloaded) -> fallback heuristic
     - If confidence < threshold -> force ASK (to reduce false reject)
     """
     if not llm:
@@ -294,7 +308,10 @@ async def llm_domain_guard(
         {"role": "user", "content": USER_PROMPT_TEMPLATE.format(question=user_question)},
     ]
 
-    raw = await _call_llm_async(llm, messages, model=model)
+    try:
+        raw = await _call_llm_async(llm, messages, model=model, provider=provider, priority=priority)
+    except LLMOverloaded:
+        return _fallback_heuristic(user_question)
     obj = _extract_first_json(raw)
     if not obj:
         return _fallback_heuristic(user_question)
@@ -352,6 +369,8 @@ def check_in_domain(
     llm: Optional[Callable[..., Any]] = None,
     model: str = "gpt-4.1-mini",
     confidence_ask_threshold: float = 0.60,
+    provider: Optional[str] = None,
+    priority: str = "interactive",
 ) -> DomainGuardResult:
     """
     Sync wrapper (so you can keep your current code style).
@@ -362,8 +381,6 @@ def check_in_domain(
 
     # If llm is async, run it in a simple event loop
     if inspect.iscoroutinefunction(llm):
-        import asyncio
-
         try:
             loop = asyncio.get_event_loop()
             if loop.is_running():
@@ -379,17 +396,19 @@ def check_in_domain(
                 llm=llm,
                 model=model,
                 confidence_ask_threshold=confidence_ask_threshold,
+                provider=provider,
+                priority=priority,
             )
         )
 
     # llm is sync: still call async function via asyncio.run
-    import asyncio
-
     return asyncio.run(
         llm_domain_guard(
             user_question,
             llm=llm,
             model=model,
             confidence_ask_threshold=confidence_ask_threshold,
+            provider=provider,
+            priority=priority,
         )
     )
\ No newline at end of file
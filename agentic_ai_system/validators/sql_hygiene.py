@@ -1,4 +1,5 @@
 import re
+import hashlib
 from typing import Tuple, Optional
 import sqlglot
 
@@ -52,4 +53,25 @@ def validate_sql(sql: str, dialect: str = "mysql"):
     except Exception as e:
         return False, f"SQL parse error: {e}"
 
-    return True, "ok"
\ No newline at end of file
+    return True, "ok"
+
+
+_FP_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_FP_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_FP_PARAM_RE = re.compile(r":\w+|%\(\w+\)s|\?")
+_FP_PUNCT_RE = re.compile(r"\s*([=<>!,()])\s*")
+_FP_IN_LIST_RE = re.compile(r"\(\?(?:,\?)+\)")
+
+def sql_fingerprint(sql: str) -> str:
+    """
+    Stable id for a query shape (literals/params -> ?), like pt-fingerprint.
+    Used to group slow attempts in traces and match MariaDB slow log digests.
+    """
+    s = normalize_sql(sql).rstrip(";").lower()
+    s = _FP_STRING_RE.sub("?", s)
+    s = _FP_NUMBER_RE.sub("?", s)
+    s = _FP_PARAM_RE.sub("?", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    s = _FP_PUNCT_RE.sub(r"\1", s)
+    s = _FP_IN_LIST_RE.sub("(?+)", s)
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from agentic_ai_system.memory import kv_store, sqlite_store
+from agentic_ai_system.memory.kv_store import KeyValueConversationStore
+from agentic_ai_system.memory.sqlite_store import SqliteConversationStore
+from agentic_ai_system.memory.store import ConversationStore
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeListServer:
+    """In-memory ListBackend with Redis list semantics and key expiry on the test clock."""
+
+    def __init__(self, clock: Clock) -> None:
+        self.clock = clock
+        self.data: Dict[str, Any] = {}
+        self.expires: Dict[str, float] = {}
+
+    def _live(self, key: str) -> None:
+        if key in self.expires and self.clock() >= self.expires[key]:
+            self.delete(key)
+
+    def _list(self, key: str) -> List[str]:
+        self._live(key)
+        return self.data.get(key, [])
+
+    @staticmethod
+    def _range(n: int, start: int, stop: int) -> slice:
+        start = max(0, n + start) if start < 0 else start
+        stop = n + stop if stop < 0 else stop
+        return slice(start, stop + 1)
+
+    def rpush(self, key: str, *values: str) -> int:
+        self.data[key] = self._list(key) + list(values)
+        return len(self.data[key])
+
+    def ltrim(self, key: str, start: int, stop: int) -> None:
+        items = self._list(key)
+        self.data[key] = items[self._range(len(items), start, stop)]
+
+    def lrange(self, key: str, start: int, stop: int) -> List[str]:
+        items = self._list(key)
+        return items[self._range(len(items), start, stop)]
+
+    def expire(self, key: str, seconds: int) -> None:
+        self.expires[key] = self.clock() + seconds
+
+    def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+        self.expires.pop(key, None)
+
+    def llen(self, key: str) -> int:
+        return len(self._list(key))
+
+    def get(self, key: str) -> Any:
+        self._live(key)
+        return self.data.get(key)
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expire(key, ex)
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    c = Clock()
+    monkeypatch.setattr(sqlite_store, "time", c)
+    monkeypatch.setattr(kv_store, "time", c)
+    return c
+
+
+@pytest.fixture(params=["sqlite", "kv"])
+def make_store(request: pytest.FixtureRequest, tmp_path, clock: Clock):
+    def make(**kw) -> ConversationStore:
+        if request.param == "sqlite":
+            return SqliteConversationStore(str(tmp_path / "conv.db"), **kw)
+        return KeyValueConversationStore(FakeListServer(clock), **kw)
+
+    return make
+
+
+def test_trims_to_max_messages(make_store) -> None:
+    s = make_store(max_messages=3)
+    for i in range(5):
+        s.append("a", "user", f"m{i}")
+
+    assert [m.content for m in s.get_history("a")] == ["m2", "m3", "m4"]
+    assert s.size("a") == 3
+    assert s.get_history("b") == []
+
+
+def test_trims_long_messages(make_store) -> None:
+    s = make_store(max_chars_per_message=5)
+    s.append("a", "assistant", "0123456789")
+    assert s.get_history("a")[0].content == "01234"
+
+
+def test_idle_conversation_expires(make_store, clock: Clock) -> None:
+    s = make_store(idle_ttl_s=60)
+    s.append("a", "user", "hi")
+    s.set_summary("a", {"turns": 1})
+    clock.now += 30
+    s.append("b", "user", "hi")
+    clock.now += 45  # a idle for 75 s, b for 45 s
+
+    assert s.get_history("a") == []
+    assert s.get_summary("a") is None
+    assert [m.content for m in s.get_history("b")] == ["hi"]
+
+
+def test_summary_round_trip(make_store) -> None:
+    s = make_store()
+    s.append("a", "user", "จำนวนพื้นที่ประสบภัย")
+    summary = {"turns": 1, "tables": ["disaster_areas"], "entities": ["เชียงใหม่"]}
+    s.set_summary("a", summary)
+
+    assert s.get_summary("a") == summary
+    s.clear("a")
+    assert s.get_summary("a") is None
+    assert s.size("a") == 0
+
+
+def test_set_summary_ignores_unknown_conversation(make_store) -> None:
+    s = make_store()
+    s.set_summary("unknown", {"turns": 1})
+    assert s.get_summary("unknown") is None
+
+
+def test_sqlite_sweep_expires_idle_then_trims_lru(tmp_path, clock: Clock) -> None:
+    s = SqliteConversationStore(str(tmp_path / "conv.db"), max_conversations=2, idle_ttl_s=60, sweep_every=1000)
+    s.append("idle", "user", "hi")
+    clock.now += 61
+    for cid in ("a", "b", "c"):
+        clock.now += 1
+        s.append(cid, "user", "hi")
+
+    assert s.sweep() == 2  # idle by TTL, then a as the least recently used
+    assert s.stats()["conversations"] == 2
+    assert s.size("a") == 0
+    assert s.size("b") == s.size("c") == 1
+
+
+def test_sqlite_sweeps_every_n_appends(tmp_path, clock: Clock) -> None:
+    s = SqliteConversationStore(str(tmp_path / "conv.db"), max_conversations=2, idle_ttl_s=0, sweep_every=3)
+    for cid in ("a", "b", "c"):
+        clock.now += 1
+        s.append(cid, "user", "hi")  # the third append sweeps
+
+    assert s.stats()["conversations"] == 2
+    assert s.size("a") == 0
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import re
+from threading import Event
+from typing import Iterator, List
+
+import pytest
+
+from agentic_ai_system.memory import event_replay
+from agentic_ai_system.memory.event_replay import InMemoryReplayBuffer, ReplayBuffer, SqliteReplayBuffer
+from agentic_ai_system.orchestration.cancellation import CancelToken
+from agentic_ai_system.orchestration.stream_runs import Follower, follow, start_run
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    c = Clock()
+    monkeypatch.setattr(event_replay, "time", c)
+    return c
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_buffer(request: pytest.FixtureRequest, tmp_path):
+    def make(**kw) -> ReplayBuffer:
+        if request.param == "sqlite":
+            return SqliteReplayBuffer(str(tmp_path / "replay.db"), **kw)
+        return InMemoryReplayBuffer(**kw)
+
+    return make
+
+
+def _sweep(buf: ReplayBuffer) -> None:
+    # sqlite sweeps every `sweep_every` appends; the in-memory buffer on each append
+    if isinstance(buf, SqliteReplayBuffer):
+        buf.sweep()
+
+
+def _ids(data: bytes) -> List[int]:
+    return [int(m) for m in re.findall(rb"^id: (\d+)$", data, re.MULTILINE)]
+
+
+def test_read_after_seq(make_buffer) -> None:
+    buf = make_buffer()
+    for seq in range(1, 6):
+        buf.append("t", seq, b"e%d" % seq)
+
+    read = buf.read("t", 2)
+    assert [s for s, _ in read.entries] == [3, 4, 5]
+    assert read.entries[0][1] == b"e3"
+    assert read.first_seq == 1
+    assert not read.closed
+    assert buf.read("t", 5).entries == []
+    assert buf.read("unknown", 0) is None
+
+    buf.close("t")
+    assert buf.read("t", 5).closed
+
+
+def test_trim_by_byte_limit(make_buffer) -> None:
+    buf = make_buffer(max_bytes=10)
+    for seq in range(1, 4):
+        buf.append("t", seq, b"xxxx")  # 12 bytes > 10: the oldest entry goes
+
+    read = buf.read("t", 0)
+    assert [s for s, _ in read.entries] == [2, 3]
+    assert read.first_seq == 2
+
+
+def test_trim_keeps_newest_entry(make_buffer) -> None:
+    buf = make_buffer(max_bytes=4)
+    buf.append("t", 1, b"xx")
+    buf.append("t", 2, b"y" * 20)
+
+    assert [s for s, _ in buf.read("t", 0).entries] == [2]
+
+
+def test_ttl_eviction_of_closed_traces(make_buffer, clock: Clock) -> None:
+    buf = make_buffer(ttl_s=60)
+    buf.append("old", 1, b"e1")
+    buf.close("old")
+    clock.now += 61
+    buf.append("new", 1, b"e1")
+    _sweep(buf)
+
+    assert buf.read("old", 0) is None
+    assert buf.read("new", 0) is not None
+
+
+def test_lru_eviction(make_buffer, clock: Clock) -> None:
+    buf = make_buffer(max_traces=2)
+    for trace_id in ("a", "b", "c"):
+        clock.now += 1
+        buf.append(trace_id, 1, b"e1")
+        buf.close(trace_id)
+    _sweep(buf)
+
+    assert buf.read("a", 0) is None
+    assert buf.read("b", 0) is not None
+    assert buf.read("c", 0) is not None
+
+
+def test_follower_reports_resume_gap(make_buffer) -> None:
+    buf = make_buffer(max_bytes=10)
+    for seq in range(1, 5):
+        buf.append("t", seq, b"id: %d\n\n" % seq)  # 7 bytes each: only the newest survives
+    buf.close("t")
+
+    f = Follower("t", 1, None, buf)
+    out = f.next(timeout_s=0.1)
+    assert out.startswith(b"event: error")
+    assert b"RESUME_GAP" in out
+    assert _ids(out) == [4]
+    assert f.next(timeout_s=0.1) is None
+
+
+def test_follower_without_gap(make_buffer) -> None:
+    buf = make_buffer()
+    for seq in range(1, 4):
+        buf.append("t", seq, b"id: %d\n\n" % seq)
+    buf.close("t")
+
+    out = Follower("t", 1, None, buf).next(timeout_s=0.1)
+    assert b"RESUME_GAP" not in out
+    assert _ids(out) == [2, 3]
+
+
+def test_follower_resumes_live_run_from_last_event_id(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SSE_RESUME_GRACE_MS", "60000")
+    buf = InMemoryReplayBuffer()
+    gate = Event()
+
+    def events() -> Iterator[bytes]:
+        yield b"event: step\ndata: {}\n\n"
+        yield b"event: sql\ndata: {}\n\n"
+        gate.wait(5)
+        yield b"event: answer\ndata: {}\n\n"
+        yield b"event: done\ndata: {}\n\n"
+
+    cancel = CancelToken()
+    first = start_run("live-trace", events(), cancel, buffer=buf)
+    seen: List[int] = []
+    while len(seen) < 2:
+        seen += _ids(first.next(timeout_s=1))
+    first.close()  # client dropped after id 2; the run waits for a reconnect
+
+    again = follow("live-trace", after_id=seen[-1], buffer=buf)
+    assert again is not None
+    gate.set()
+    resumed: List[int] = []
+    while (chunk := again.next(timeout_s=1)) is not None:
+        resumed += _ids(chunk)
+    again.close()
+
+    assert seen == [1, 2]
+    assert resumed == [3, 4]
+    assert not cancel.cancelled
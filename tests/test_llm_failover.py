@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Iterator, List
+
+import pytest
+from langchain_core.prompts import ChatPromptTemplate
+
+from agentic_ai_system.orchestration import llm_failover as failover_module
+from agentic_ai_system.orchestration import llm_models
+from agentic_ai_system.orchestration.cancellation import CancelToken
+from agentic_ai_system.orchestration.deadline import Deadline
+from agentic_ai_system.orchestration.fake_llm import FakeChatModel
+from agentic_ai_system.orchestration.llm_failover import CircuitBreaker, LLMFailover
+from agentic_ai_system.orchestration.llm_models import ALLOWED, invoke_llm
+from agentic_ai_system.orchestration.llm_scheduler import llm_scheduler
+
+
+CALLS: List[str] = []
+
+
+class Model(FakeChatModel):
+    """Fake chat model that logs which model answered and can be switched to failing."""
+
+    fail: bool = False
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        CALLS.append(self.model_name)
+        if self.fail:
+            raise RuntimeError(f"{self.model_name} is down")
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+PROMPT = ChatPromptTemplate.from_messages([("human", "{q}")])
+
+
+@pytest.fixture
+def failover(monkeypatch: pytest.MonkeyPatch) -> Iterator[LLMFailover]:
+    for key, value in {
+        "LLM_FALLBACK_MODELS": "fake/fast",
+        "LLM_BREAKER_WINDOW": "10",
+        "LLM_BREAKER_MIN_CALLS": "3",
+        "LLM_BREAKER_ERROR_RATE": "0.5",
+        "LLM_BREAKER_OPEN_MS": "200",
+        "LLM_HEDGE_PERCENTILE": "90",
+        "LLM_HEDGE_MIN_MS": "50",
+        "LLM_HEDGE_MIN_SAMPLES": "3",
+    }.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setitem(ALLOWED, "fake", {"fake-model", "fast"})
+    fo = LLMFailover()
+    monkeypatch.setattr(llm_models, "llm_failover", fo)
+    CALLS.clear()
+    yield fo
+    failover_module.LLM_CIRCUIT.set_function(failover_module.llm_failover._metric_values)
+
+
+@pytest.fixture
+def fallback(monkeypatch: pytest.MonkeyPatch) -> Model:
+    m = Model(model_name="fast")
+    monkeypatch.setitem(llm_models._LLM_CACHE, ("fake", "fast"), m)
+    return m
+
+
+def _invoke(llm: Model, priority: str = "interactive") -> Any:
+    return invoke_llm(
+        PROMPT | llm,
+        {"q": "SELECT please"},
+        deadline=Deadline(budget_ms=10000),
+        cancel=CancelToken(),
+        stage="text_to_sql",
+        provider="fake",
+        model="fake-model",
+        priority=priority,
+    )
+
+
+def _seed_latency(fo: LLMFailover, seconds: float = 0.01) -> None:
+    for _ in range(fo.hedge_min_samples):
+        fo.record("fake", "fake-model", ok=True, seconds=seconds)
+
+
+def _open(fo: LLMFailover, provider: str, model: str) -> None:
+    for _ in range(3):
+        fo.record(provider, model, ok=False, seconds=0.01)
+    assert not fo.breaker(provider, model).available()
+
+
+def test_breaker_opens_after_failures_and_probe_closes_it() -> None:
+    b = CircuitBreaker(window=10, min_calls=3, error_rate=0.5, open_s=0.05)
+    assert not b.record(False)
+    assert not b.record(False)
+    assert b.record(False)  # third failure opens it
+    assert b.is_open() and not b.available()
+    assert not b.claim_probe()
+
+    time.sleep(0.06)
+    assert b.available()
+    assert b.claim_probe()
+    assert not b.available() and not b.claim_probe()  # one probe at a time
+    b.record(True)
+    assert not b.is_open() and b.available()
+
+
+def test_failed_probe_reopens_breaker() -> None:
+    b = CircuitBreaker(window=10, min_calls=3, error_rate=0.5, open_s=0.05)
+    for _ in range(3):
+        b.record(False)
+    time.sleep(0.06)
+    assert b.claim_probe()
+    b.record(False)
+    assert b.is_open() and not b.available()
+
+
+def test_released_probe_can_be_claimed_again() -> None:
+    b = CircuitBreaker(window=10, min_calls=1, error_rate=0.5, open_s=0.05)
+    b.record(False)
+    time.sleep(0.06)
+    assert b.claim_probe()
+    b.release_probe()
+    assert b.available()
+    assert b.claim_probe()
+
+
+def test_closed_breaker_ignores_min_calls() -> None:
+    b = CircuitBreaker(window=10, min_calls=5, error_rate=0.5, open_s=1)
+    for _ in range(4):
+        assert not b.record(False)
+    assert b.available()
+
+
+def test_open_breaker_fails_over_then_probe_closes(failover: LLMFailover, fallback: Model) -> None:
+    primary = Model(model_name="fake-model", fail=True)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            _invoke(primary, priority="batch")
+    assert failover.breaker("fake", "fake-model").is_open()
+
+    CALLS.clear()
+    _invoke(primary, priority="batch")
+    assert CALLS == ["fast"]  # routed to the fallback while open
+
+    time.sleep(0.21)
+    primary.fail = False
+    CALLS.clear()
+    _invoke(primary, priority="batch")  # the probe
+    assert CALLS == ["fake-model"]
+    assert failover.breaker("fake", "fake-model").available()
+    assert not failover.breaker("fake", "fake-model").is_open()
+
+
+def test_failed_probe_keeps_failing_over(failover: LLMFailover, fallback: Model) -> None:
+    primary = Model(model_name="fake-model", fail=True)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            _invoke(primary, priority="batch")
+    time.sleep(0.21)
+
+    with pytest.raises(RuntimeError):
+        _invoke(primary, priority="batch")  # probe fails: open again
+    CALLS.clear()
+    _invoke(primary, priority="batch")
+    assert CALLS == ["fast"]
+
+
+def test_slow_primary_is_hedged(failover: LLMFailover, fallback: Model) -> None:
+    _seed_latency(failover)
+    slow = Model(model_name="fake-model", latency_ms=1000)
+
+    t0 = time.monotonic()
+    resp = _invoke(slow)
+    assert time.monotonic() - t0 < 0.8
+    assert resp.content
+    assert "fast" in CALLS
+
+
+def test_background_calls_are_not_hedged(failover: LLMFailover, fallback: Model) -> None:
+    _seed_latency(failover)
+    _invoke(Model(model_name="fake-model", latency_ms=200), priority="background")
+    assert CALLS == ["fake-model"]
+
+
+def test_fast_primary_is_not_hedged(failover: LLMFailover, fallback: Model) -> None:
+    _seed_latency(failover, seconds=0.5)  # hedge delay 0.5 s
+    _invoke(Model(model_name="fake-model"))
+    assert CALLS == ["fake-model"]
+
+
+def test_skipped_hedge_does_not_use_up_the_probe(failover: LLMFailover, fallback: Model) -> None:
+    _seed_latency(failover)
+    _open(failover, "fake", "fast")
+    time.sleep(0.21)  # the fallback's breaker is half-open
+
+    lane = llm_scheduler.lane("fake", "fast")
+    held = 0
+    while lane.try_acquire("interactive", 0):  # fallback lane busy: the hedge is skipped
+        held += 1
+    try:
+        _invoke(Model(model_name="fake-model", latency_ms=200))
+    finally:
+        for _ in range(held):
+            lane.release(0, None)
+
+    assert CALLS == ["fake-model"]
+    assert failover.breaker("fake", "fast").available()
+    assert failover.breaker("fake", "fast").claim_probe()
+
+
+def test_cut_off_hedge_gives_its_probe_back(failover: LLMFailover, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(llm_models._LLM_CACHE, ("fake", "fast"), Model(model_name="fast", latency_ms=2000))
+    _seed_latency(failover)
+    _open(failover, "fake", "fast")
+    time.sleep(0.21)
+
+    _invoke(Model(model_name="fake-model", latency_ms=300))  # hedge sent as the probe, primary wins
+    for _ in range(100):
+        if failover.breaker("fake", "fast").available():
+            break
+        time.sleep(0.01)
+    assert CALLS[:2] == ["fake-model", "fast"]
+    assert failover.breaker("fake", "fast").available()
+
+
+def test_calls_without_deadline_feed_the_breaker(failover: LLMFailover, fallback: Model) -> None:
+    # the LLM domain guard calls invoke_llm with neither a deadline nor a cancel token
+    primary = Model(model_name="fake-model", fail=True)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            invoke_llm(primary, "SELECT please", stage="domain_guard", provider="fake", model="fake-model", priority="batch")
+    assert failover.breaker("fake", "fake-model").is_open()
+
+    CALLS.clear()
+    invoke_llm(primary, "SELECT please", stage="domain_guard", provider="fake", model="fake-model", priority="batch")
+    assert CALLS == ["fast"]
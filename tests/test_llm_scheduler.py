@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import time
+from threading import Event, Thread, Timer
+from typing import Any, Callable, List
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from agentic_ai_system.orchestration.cancellation import CancelToken, RequestCancelled
+from agentic_ai_system.orchestration.deadline import Deadline, DeadlineExceeded
+from agentic_ai_system.orchestration.llm_scheduler import (
+    Lane,
+    LaneLimits,
+    LLMOverloaded,
+    LLMScheduler,
+    retry_reason,
+)
+from agentic_ai_system.orchestration.llm_models import _prompt_chars
+
+
+def _hold(lane: Lane) -> Callable[[], None]:
+    """Take the lane's only slot; returns the release."""
+    lane.acquire("interactive", 0, stage="t")
+    return lambda: lane.release(0, None)
+
+
+def _in_thread(fn: Callable[[], Any]) -> Thread:
+    t = Thread(target=fn, daemon=True)
+    t.start()
+    return t
+
+
+def _wait_queued(lane: Lane, n: int) -> None:
+    for _ in range(200):
+        if lane.counts()[1] >= n:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"{n} waiters never queued")
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def scheduler(monkeypatch: pytest.MonkeyPatch) -> LLMScheduler:
+    monkeypatch.setenv("LLM_MAX_RETRIES", "2")
+    monkeypatch.setenv("LLM_BACKOFF_BASE_MS", "1")
+    monkeypatch.setenv("LLM_BACKOFF_MAX_MS", "5")
+    monkeypatch.setenv("LLM_LIMITS", "")
+    return LLMScheduler()
+
+
+def test_queue_full() -> None:
+    lane = Lane("t", LaneLimits(concurrency=1, queue_max=1, queue_timeout_ms=2000))
+    release = _hold(lane)
+    waiter = _in_thread(lambda: lane.acquire("interactive", 0, stage="t"))
+    _wait_queued(lane, 1)
+
+    with pytest.raises(LLMOverloaded) as e:
+        lane.acquire("interactive", 0, stage="t")
+    assert e.value.reason == "queue_full"
+    assert e.value.retry_after_ms >= 1000
+
+    release()
+    waiter.join(1)
+    lane.release(0, None)
+    assert lane.counts() == (0, 0)
+
+
+def test_queue_limit_is_per_priority() -> None:
+    lane = Lane("t", LaneLimits(concurrency=1, queue_max=1, background_queue_timeout_ms=100))
+    release = _hold(lane)
+    _in_thread(lambda: lane.acquire("interactive", 0, stage="t", cancel=CancelToken()))
+    _wait_queued(lane, 1)
+
+    with pytest.raises(LLMOverloaded) as e:
+        lane.acquire("batch", 0, stage="t")  # its own queue is empty: it waits, then times out
+    assert e.value.reason == "queue_timeout"
+    release()
+
+
+def test_queue_timeout() -> None:
+    lane = Lane("t", LaneLimits(concurrency=1, queue_timeout_ms=100))
+    release = _hold(lane)
+
+    t0 = time.monotonic()
+    with pytest.raises(LLMOverloaded) as e:
+        lane.acquire("interactive", 0, stage="t")
+    assert e.value.reason == "queue_timeout"
+    assert 0.08 <= time.monotonic() - t0 < 1
+    assert lane.counts() == (1, 0)
+    release()
+
+
+def test_deadline_ends_the_wait() -> None:
+    lane = Lane("t", LaneLimits(concurrency=1, queue_timeout_ms=5000))
+    release = _hold(lane)
+    deadline = Deadline(budget_ms=100)
+
+    with pytest.raises(DeadlineExceeded):
+        lane.acquire("interactive", 0, stage="text_to_sql", deadline=deadline)
+    assert deadline.exhausted_stage == "text_to_sql"
+    assert lane.counts() == (1, 0)
+    release()
+
+
+def test_cancel_ends_the_wait() -> None:
+    lane = Lane("t", LaneLimits(concurrency=1, queue_timeout_ms=5000))
+    release = _hold(lane)
+    cancel = CancelToken()
+    Timer(0.05, lambda: cancel.cancel("client_disconnect")).start()
+
+    t0 = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        lane.acquire("interactive", 0, stage="t", cancel=cancel)
+    assert time.monotonic() - t0 < 1
+    assert lane.counts() == (1, 0)
+    release()
+
+
+def test_interactive_admitted_before_background_and_batch() -> None:
+    lane = Lane("t", LaneLimits(concurrency=1, queue_timeout_ms=5000, background_queue_timeout_ms=5000))
+    release = _hold(lane)
+    order: List[str] = []
+    threads = []
+    for i, priority in enumerate(["batch", "background", "batch", "interactive"]):
+        def run(priority: str = priority) -> None:
+            lane.acquire(priority, 0, stage="t")
+            order.append(priority)
+            lane.release(0, None)
+        threads.append(_in_thread(run))
+        _wait_queued(lane, i + 1)
+
+    release()
+    for t in threads:
+        t.join(2)
+    assert order == ["interactive", "background", "batch", "batch"]
+
+
+def test_rpm_bucket_delays_admission() -> None:
+    lane = Lane("t", LaneLimits(concurrency=10, rpm=600, queue_timeout_ms=5000))  # burst 600, then 10/s
+    for _ in range(600):
+        lane.acquire("interactive", 0, stage="t")
+        lane.release(0, None)
+
+    t0 = time.monotonic()
+    lane.acquire("interactive", 0, stage="t")
+    assert time.monotonic() - t0 >= 0.05
+    lane.release(0, None)
+
+
+def test_try_acquire_never_queues() -> None:
+    lane = Lane("t", LaneLimits(concurrency=1))
+    assert lane.try_acquire("interactive", 0)
+    assert not lane.try_acquire("interactive", 0)
+    lane.release(0, None)
+    assert lane.try_acquire("interactive", 0)
+    lane.release(0, None)
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_provider_errors(scheduler: LLMScheduler, status: int) -> None:
+    calls = []
+
+    def flaky() -> str:
+        calls.append(1)
+        if len(calls) < 3:
+            raise ProviderError(status)
+        return "ok"
+
+    assert scheduler.call(flaky, provider="t", model=f"retry-{status}") == "ok"
+    assert len(calls) == 3
+    assert scheduler.lane("t", f"retry-{status}").counts() == (0, 0)
+
+
+def test_gives_up_after_max_retries(scheduler: LLMScheduler) -> None:
+    calls = []
+
+    def down() -> None:
+        calls.append(1)
+        raise ProviderError(503)
+
+    with pytest.raises(ProviderError):
+        scheduler.call(down, provider="t", model="down")
+    assert len(calls) == 1 + scheduler.max_retries
+
+
+def test_no_retry_on_other_errors(scheduler: LLMScheduler) -> None:
+    calls = []
+
+    def bad_request() -> None:
+        calls.append(1)
+        raise ProviderError(400)
+
+    with pytest.raises(ProviderError):
+        scheduler.call(bad_request, provider="t", model="bad")
+    with pytest.raises(ValueError):
+        scheduler.call(lambda: calls.append(1) or int("x"), provider="t", model="bad")
+    assert len(calls) == 2
+
+
+def test_retry_reason() -> None:
+    assert retry_reason(ProviderError(429)) == "429"
+    assert retry_reason(ProviderError(502)) == "5xx"
+    assert retry_reason(ProviderError(404)) is None
+    assert retry_reason(ConnectionError()) == "connection"
+    assert retry_reason(LLMOverloaded("t", "queue_full", 1000)) is None
+    assert retry_reason(DeadlineExceeded("t")) is None
+
+
+def test_lanes_from_llm_limits(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("LLM_LIMITS", '{"openai/gpt-4o": {"rpm": 500}, "gemini": {"concurrency": 2}}')
+    s = LLMScheduler()
+    assert s.lane("openai", "gpt-4o").limits.rpm == 500
+    assert s.lane("gemini", "a") is s.lane("Gemini", "b")
+    assert s.lane("gemini", "a").limits.concurrency == 2
+    assert s.lane("openai", "gpt-4o-mini").name == "openai/gpt-4o-mini"
+
+
+def test_cancel_during_backoff(scheduler: LLMScheduler, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(scheduler, "backoff_s", lambda attempt: 5.0)
+    cancel = CancelToken()
+    started = Event()
+
+    def rate_limited() -> None:
+        started.set()
+        raise ProviderError(429)
+
+    Timer(0.05, lambda: cancel.cancel("client_disconnect")).start()
+    t0 = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        scheduler.call(rate_limited, provider="t", model="backoff-cancel", cancel=cancel)
+    assert started.is_set()
+    assert time.monotonic() - t0 < 2
+
+
+def test_prompt_chars_of_message_lists() -> None:
+    # the domain guard calls the chat model with messages; they count toward the tpm estimate
+    assert _prompt_chars([SystemMessage(content="abc"), HumanMessage(content="de")]) == 5
+    assert _prompt_chars({"q": "abcd", "n": 3}) == 4
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import pytest
+
+from agentic_ai_system.memory import store as store_module
+from agentic_ai_system.memory.store import InMemoryConversationStore
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    c = Clock()
+    monkeypatch.setattr(store_module, "monotonic", c)
+    return c
+
+
+def test_one_shot_conversations_stay_bounded() -> None:
+    s = InMemoryConversationStore(max_messages=4, max_conversations=50, idle_ttl_s=0)
+    for i in range(20000):
+        s.append(f"c{i}", "user", "question")
+        s.append(f"c{i}", "assistant", "answer")
+
+    st = s.stats()
+    assert st["conversations"] <= 50
+    assert st["messages"] == 2 * st["conversations"]
+    assert st["evicted"]["lru"] == 20000 - 50
+
+
+def test_lru_keeps_recently_used() -> None:
+    s = InMemoryConversationStore(max_conversations=2, idle_ttl_s=0)
+    s.append("a", "user", "1")
+    s.append("b", "user", "2")
+    s.get_history("a")  # a is now the most recent
+    s.append("c", "user", "3")
+
+    assert s.size("a") == 1
+    assert s.size("b") == 0
+    assert s.stats()["evicted"] == {"lru": 1, "idle_ttl": 0}
+
+
+def test_message_and_byte_counters_follow_trimming() -> None:
+    s = InMemoryConversationStore(max_messages=2, idle_ttl_s=0)
+    for i in range(5):
+        s.append("a", "user", f"m{i}")
+    assert [m.content for m in s.get_history("a")] == ["m3", "m4"]
+    assert s.stats()["messages"] == 2
+
+    s.clear("a")
+    st = s.stats()
+    assert (st["conversations"], st["messages"], st["content_bytes"]) == (0, 0, 0)
+
+
+def test_sweep_expires_idle_conversations(clock: Clock) -> None:
+    s = InMemoryConversationStore(idle_ttl_s=60, sweep_batch=0)
+    for cid in ("a", "b", "c"):
+        s.append(cid, "user", "hi")
+    clock.now += 30
+    s.append("c", "user", "still here")
+    clock.now += 45  # a, b idle for 75 s; c for 45 s
+
+    assert s.stats()["conversations"] == 3  # sweep_batch=0: nothing amortized
+    assert s.sweep() == 2
+    assert s.stats()["conversations"] == 1
+    assert s.stats()["evicted"]["idle_ttl"] == 2
+    assert s.size("c") == 2
+
+
+def test_amortized_sweep_on_append_and_get(clock: Clock) -> None:
+    s = InMemoryConversationStore(idle_ttl_s=60, sweep_batch=2)
+    for i in range(5):
+        s.append(f"old{i}", "user", "hi")
+    clock.now += 61
+
+    s.append("new", "user", "hi")  # sweeps at most sweep_batch idle conversations
+    assert s.stats()["evicted"]["idle_ttl"] == 2
+    s.get_history("new")
+    assert s.stats()["evicted"]["idle_ttl"] == 4
+    s.get_history("new")
+    assert s.stats()["evicted"]["idle_ttl"] == 5
+    assert s.stats()["conversations"] == 1
+
+
+def test_expired_conversation_reads_empty(clock: Clock) -> None:
+    s = InMemoryConversationStore(idle_ttl_s=60, sweep_batch=0)
+    s.append("a", "user", "hi")
+    s.set_summary("a", {"turns": 1})
+    clock.now += 61
+
+    assert s.get_history("a") == []
+    assert s.get_summary("a") is None
+    assert s.stats()["evicted"]["idle_ttl"] == 1